@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Combiner benchmark suite
+Times and memory-profiles OpenAPICombiner, OpenAPIResolver and create_llm_bundle on
+synthetic spec trees (see spec_generator.py) at several multiples of the Unit SDK tree's
+size, and stores the results as JSON so runs can be compared over time.
+
+Usage: python benchmarks/bench_combiners.py [--scales 1,10,100] [--repeat N]
+                                           [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from spec_generator import generate_spec_tree
+
+
+TOOLS = ('combiner', 'combiner-stream', 'resolver', 'llm-bundle')
+DEFAULT_SCALES = '1,10,100'
+DEFAULT_TOLERANCE = 0.25
+
+
+def run_tool(tool: str, tree: Path, output: Path) -> None:
+    """Run one tool on a generated tree, without a parse cache and with its output silenced."""
+    from bundle_openapi import create_llm_bundle
+    from combine_openapi import OpenAPIResolver
+    from openapi_combiner import OpenAPICombiner
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if tool == 'combiner':
+            OpenAPICombiner(str(tree)).combine(str(tree / 'openapi.json'), str(output))
+        elif tool == 'combiner-stream':
+            OpenAPICombiner(str(tree)).combine(str(tree / 'openapi.json'), str(output), stream=True)
+        elif tool == 'resolver':
+            OpenAPIResolver(str(tree)).combine_openapi(str(tree / 'openapi.json'), str(output))
+        elif tool == 'llm-bundle':
+            create_llm_bundle(tree / 'bundle' / 'openapi.json', tree / 'bundle' / 'schemas.json', output)
+        else:
+            raise ValueError(f"Unknown tool: {tool}")
+
+
+def measure_in_subprocess(tool: str, tree: Path, output: Path) -> dict:
+    """
+    Measure one run in a fresh interpreter, so peak memory is not shared between runs.
+
+    Returns:
+        {"seconds", "peak_rss_bytes", "output_bytes"}
+    """
+    result = subprocess.run(
+        [sys.executable, __file__, '--measure', tool, str(tree), str(output)],
+        check=True, capture_output=True, text=True
+    )
+    return json.loads(result.stdout)
+
+
+def measure(tool: str, tree: Path, output: Path) -> None:
+    """Child process side of measure_in_subprocess: run the tool and print the measurements."""
+    start = time.perf_counter()
+    run_tool(tool, tree, output)
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_bytes = peak if sys.platform == 'darwin' else peak * 1024
+    print(json.dumps({'seconds': round(seconds, 4), 'peak_rss_bytes': peak_bytes,
+                      'output_bytes': output.stat().st_size}))
+
+
+def run_suite(scales, repeat: int, work_dir: Path, generator_options: dict) -> dict:
+    """Generate a tree per scale and measure every tool on it; the fastest of repeat runs is kept."""
+    results = []
+    for scale in scales:
+        tree = work_dir / f"scale-{scale:g}"
+        summary = generate_spec_tree(str(tree), scale=scale, **generator_options)
+        print(f"Scale {scale:g}x: {summary['files']} files, {summary['refs']:,} references")
+        for tool in TOOLS:
+            runs = [measure_in_subprocess(tool, tree, work_dir / f"{tool}-{scale:g}.json") for _ in range(repeat)]
+            best = min(runs, key=lambda run: run['seconds'])
+            best['peak_rss_bytes'] = max(run['peak_rss_bytes'] for run in runs)
+            results.append({'tool': tool, 'scale': scale, 'files': summary['files'],
+                            'refs': summary['refs'], **best})
+            print(f"  {tool:16} {best['seconds']:8.3f}s  peak RSS {best['peak_rss_bytes'] / 2**20:8.1f} MB  "
+                  f"output {best['output_bytes'] / 2**20:8.1f} MB")
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'generator': generator_options,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> int:
+    """Print time and memory changes against a baseline report; returns the number of regressions."""
+    previous = {(entry['tool'], entry['scale']): entry for entry in baseline['results']}
+    regressions = 0
+    print(f"\nCompared with {baseline['created']} (tolerance {tolerance:.0%}):")
+    for entry in report['results']:
+        old = previous.get((entry['tool'], entry['scale']))
+        if old is None:
+            continue
+        changes = []
+        for metric in ('seconds', 'peak_rss_bytes'):
+            change = entry[metric] / old[metric] - 1 if old[metric] else 0.0
+            flag = ''
+            if change > tolerance:
+                flag = ' REGRESSION'
+                regressions += 1
+            changes.append(f"{metric} {change:+.0%}{flag}")
+        print(f"  {entry['tool']:16} {entry['scale']:>5g}x  " + '  '.join(changes))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the spec combiners on synthetic spec trees')
+    parser.add_argument('--scales', default=DEFAULT_SCALES,
+                        help=f'Comma-separated sizes relative to the Unit SDK tree (default: {DEFAULT_SCALES})')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per measurement, fastest kept (default: 1)')
+    parser.add_argument('--fanout', type=int, default=4, help='$ref properties per schema (default: 4)')
+    parser.add_argument('--depth', type=int, default=4, help='Schema levels per resource (default: 4)')
+    parser.add_argument('--sharing', type=float, default=0.5,
+                        help='Probability that a reference targets a shared type (default: 0.5)')
+    parser.add_argument('--cycles', type=int, default=2, help='Reference cycles per tree (default: 2)')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/combiners-<timestamp>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='Results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Relative slowdown or memory growth counted as a regression (default: {DEFAULT_TOLERANCE})')
+    parser.add_argument('--measure', nargs=3, metavar=('TOOL', 'TREE', 'OUTPUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        tool, tree, output = args.measure
+        measure(tool, Path(tree), Path(output))
+        return 0
+
+    scales = [float(scale) for scale in args.scales.split(',')]
+    generator_options = {'fanout': args.fanout, 'depth': args.depth, 'sharing': args.sharing,
+                         'cycles': args.cycles}
+    with tempfile.TemporaryDirectory() as work_dir:
+        report = run_suite(scales, args.repeat, Path(work_dir), generator_options)
+
+    output = Path(args.output) if args.output else (
+        BENCH_DIR / 'results' / f"combiners-{datetime.now():%Y%m%d-%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
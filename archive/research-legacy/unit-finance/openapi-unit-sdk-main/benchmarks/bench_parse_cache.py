@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Parse cache benchmark
+Compares loading the Unit SDK tree's spec files through a warm ParseCache with plain
+json.load, for the many small files under schemas/ and the large combined documents
+separately, and exits with status 1 if the cache is slower than json.load for either.
+
+Usage: python benchmarks/bench_parse_cache.py [--repeat N]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from spec_cache import ParseCache
+
+
+def best_time(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def json_load_all(files):
+    for file_path in files:
+        with open(file_path, 'rb') as f:
+            json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark warm ParseCache loads against json.load')
+    parser.add_argument('--repeat', type=int, default=20, help='Timing repetitions (default: 20)')
+    args = parser.parse_args()
+
+    groups = [
+        ('schemas/', sorted((ROOT / 'schemas').rglob('*.json'))),
+        ('combined', [ROOT / 'combined_openapi.json', ROOT / 'schemas.json']),
+    ]
+    slower = False
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ParseCache(cache_dir)
+        for _, files in groups:
+            for file_path in files:
+                cache.load(file_path)
+
+        for name, files in groups:
+            json_time = best_time(lambda: json_load_all(files), args.repeat)
+            cache_time = best_time(lambda: [cache.load(file_path) for file_path in files], args.repeat)
+            print(f"{name:10} {len(files):4} files   json.load {json_time * 1000:7.2f} ms   "
+                  f"warm cache {cache_time * 1000:7.2f} ms   ({json_time / cache_time:.1f}x)")
+            slower = slower or cache_time > json_time
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Traversal benchmark
+Compares the per-node cost of the previous recursive walks with spec_walk.rebuild and
+spec_walk.rewrite_refs on a combined_openapi.json-scale document, and checks that deep
+documents are safe.
+
+Usage: python benchmarks/bench_traversal.py [document.json] [--repeat N]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from spec_walk import rebuild, rewrite_refs
+
+
+def recursive_resolve(data):
+    """The recursive walk OpenAPICombiner.resolve_refs_recursive used before (refs left as-is)."""
+    if isinstance(data, dict):
+        if '$ref' in data:
+            return data
+        return {key: recursive_resolve(value) for key, value in data.items()}
+    elif isinstance(data, list):
+        return [recursive_resolve(item) for item in data]
+    return data
+
+
+def recursive_localize(obj):
+    """The recursive localize_refs walk bundle_openapi.create_llm_bundle used before."""
+    if isinstance(obj, dict):
+        if '$ref' in obj and obj['$ref'].startswith('./schemas.json#/'):
+            obj['$ref'] = obj['$ref'].replace('./schemas.json#/', '#/')
+        return {k: recursive_localize(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [recursive_localize(item) for item in obj]
+    return obj
+
+
+def keep_ref(node, context):
+    return None
+
+
+def keep_ref_value(ref):
+    return None
+
+
+def count_nodes(data) -> int:
+    count = 0
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return count
+
+
+def best_time(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def nested_document(depth: int):
+    root = node = {}
+    for _ in range(depth):
+        child = {'type': 'object'}
+        node['properties'] = {'child': child}
+        node = child
+    return root
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark recursive vs. iterative spec traversal')
+    parser.add_argument(
+        'document',
+        nargs='?',
+        default=str(Path(__file__).resolve().parent.parent / 'combined_openapi.json'),
+        help='JSON document to traverse (default: combined_openapi.json)'
+    )
+    parser.add_argument('--repeat', type=int, default=10, help='Timing repetitions (default: 10)')
+    args = parser.parse_args()
+
+    with open(args.document, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    nodes = count_nodes(document)
+    print(f"Document: {args.document} ({nodes:,} nodes)")
+
+    cases = [
+        ('resolve walk', lambda: recursive_resolve(document), lambda: rebuild(document, None, keep_ref)),
+        ('localize walk', lambda: recursive_localize(document), lambda: rewrite_refs(document, keep_ref_value)),
+    ]
+    for name, recursive, iterative in cases:
+        recursive_time = best_time(recursive, args.repeat)
+        iterative_time = best_time(iterative, args.repeat)
+        print(f"{name:14} recursive {recursive_time / nodes * 1e9:7.1f} ns/node   "
+              f"iterative {iterative_time / nodes * 1e9:7.1f} ns/node   "
+              f"(time saved: {(1 - iterative_time / recursive_time) * 100:+.0f}%)")
+
+    depth = sys.getrecursionlimit() * 10
+    deep = nested_document(depth)
+    try:
+        recursive_resolve(deep)
+        recursive_status = 'ok'
+    except RecursionError:
+        recursive_status = 'RecursionError'
+    rebuild(deep, None, keep_ref)
+    print(f"Depth {depth:,}: recursive {recursive_status}, iterative ok")
+
+
+if __name__ == '__main__':
+    main()
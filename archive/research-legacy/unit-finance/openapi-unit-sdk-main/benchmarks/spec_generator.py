@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Synthetic OpenAPI spec tree generator
+Writes multi-file ref trees shaped like the Unit SDK tree (an openapi.json whose paths and
+schemas point into per-resource files under schemas/) at any size, for benchmarking.
+
+Usage: python benchmarks/spec_generator.py OUTPUT_DIR [--scale N] [--fanout N] [--depth N]
+                                          [--sharing R] [--cycles N] [--seed N]
+"""
+
+import argparse
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict
+
+
+# At scale 1 the tree has about as many files (~100) as the Unit SDK tree
+RESOURCES_PER_SCALE = 50
+SHARED_TYPES = 24
+SCHEMAS_PER_LEVEL = 2
+
+
+def schema_name(resource: int, level: int, index: int) -> str:
+    return f"Resource{resource}L{level}S{index}"
+
+
+def schema_file(resource: int) -> str:
+    return f"schemas/resource{resource}/resource{resource}.json"
+
+
+def generate_spec_tree(output_dir: str, scale: float = 1, fanout: int = 4, depth: int = 4,
+                       sharing: float = 0.5, cycles: int = 2, seed: int = 0) -> Dict[str, Any]:
+    """
+    Write a synthetic spec tree.
+
+    Each resource gets a schema file and a paths file. Its schemas are
+    arranged in depth levels; a schema has fanout $ref properties, each
+    pointing either at one of the shared types in schemas/types.json (with
+    probability sharing) or at a schema one level deeper, in the same
+    resource or a random other one. Deepest-level schemas only have inline
+    properties, except for the given number of cycles: in that many
+    resources, the first schema of each level references the first schema of
+    the next, and the deepest one points back at level 0.
+
+    The same schemas are also written as a bundle (bundle/openapi.json
+    referencing bundle/schemas.json), the input create_llm_bundle expects.
+
+    Args:
+        output_dir: Directory to write the tree to
+        scale: Size relative to the Unit SDK tree (RESOURCES_PER_SCALE resources per unit)
+        fanout: $ref properties per schema
+        depth: Schema levels per resource
+        sharing: Probability that a reference targets a shared type
+        cycles: Number of back-references creating reference cycles
+        seed: Random seed; equal arguments always produce the same tree
+
+    Returns:
+        Summary of the generated tree: parameters, file count and reference count
+    """
+    rng = random.Random(seed)
+    root = Path(output_dir)
+    resources = max(1, round(RESOURCES_PER_SCALE * scale))
+    files: Dict[str, Any] = {}
+    bundle_schemas: Dict[str, Any] = {}
+    bundle_paths: Dict[str, Any] = {}
+    refs = 0
+
+    types = {}
+    for index in range(SHARED_TYPES):
+        types[f"Type{index}"] = {
+            "type": "object",
+            "description": f"Shared type {index}",
+            "properties": {"id": {"type": "string"}, "value": {"type": "integer", "format": "int64"}}
+        }
+    files["schemas/types.json"] = {"components": {"schemas": types}}
+    bundle_schemas.update(types)
+
+    back_edges = set(rng.sample(range(resources), min(cycles, resources)))
+
+    for resource in range(resources):
+        own_file = schema_file(resource)
+        schemas = {}
+        for level in range(depth):
+            for index in range(SCHEMAS_PER_LEVEL):
+                properties: Dict[str, Any] = {
+                    "id": {"type": "string"},
+                    "createdAt": {"type": "string", "format": "date-time"},
+                }
+                bundle_properties = dict(properties)
+                for slot in range(fanout):
+                    if level == depth - 1:
+                        properties[f"field{slot}"] = {"type": "string", "maxLength": 255}
+                        bundle_properties[f"field{slot}"] = properties[f"field{slot}"]
+                        continue
+                    if resource in back_edges and index == 0 and slot == 0:
+                        # Chain level 0 down to the schema holding the back-reference
+                        name = schema_name(resource, level + 1, 0)
+                        ref = f"#/components/schemas/{name}"
+                    elif rng.random() < sharing:
+                        name = f"Type{rng.randrange(SHARED_TYPES)}"
+                        ref = f"../types.json#/components/schemas/{name}"
+                    else:
+                        target = resource if rng.random() < 0.5 else rng.randrange(resources)
+                        name = schema_name(target, level + 1, rng.randrange(SCHEMAS_PER_LEVEL))
+                        ref = (f"#/components/schemas/{name}" if target == resource else
+                               f"../resource{target}/resource{target}.json#/components/schemas/{name}")
+                    properties[f"field{slot}"] = {"$ref": ref}
+                    bundle_properties[f"field{slot}"] = {"$ref": f"#/components/schemas/{name}"}
+                    refs += 1
+                if level == depth - 1 and index == 0 and resource in back_edges:
+                    name = schema_name(resource, 0, 0)
+                    properties["parent"] = {"$ref": f"#/components/schemas/{name}"}
+                    bundle_properties["parent"] = {"$ref": f"#/components/schemas/{name}"}
+                    refs += 1
+                name = schema_name(resource, level, index)
+                schemas[name] = {"type": "object", "title": name, "properties": properties}
+                bundle_schemas[name] = {"type": "object", "title": name, "properties": bundle_properties}
+        files[own_file] = {"components": {"schemas": schemas}}
+
+        paths = {}
+        bundle_path_items = {}
+        for kind, many in (("item", False), ("list", True)):
+            name = schema_name(resource, 0, 1 if many else 0)
+            for ref, target in ((f"./resource{resource}.json#/components/schemas/{name}", paths),
+                                (f"./schemas.json#/components/schemas/{name}", bundle_path_items)):
+                schema = {"$ref": ref}
+                if many:
+                    schema = {"type": "object", "properties": {"data": {"type": "array", "items": schema}}}
+                target[kind] = {
+                    "get": {
+                        "operationId": f"{kind}Resource{resource}",
+                        "parameters": [{"name": "id", "in": "path", "required": True,
+                                        "schema": {"type": "string"}}],
+                        "responses": {"200": {"description": "OK", "content": {
+                            "application/vnd.api+json": {"schema": schema}
+                        }}}
+                    }
+                }
+            refs += 1
+        files[f"schemas/resource{resource}/resource{resource}Paths.json"] = paths
+        bundle_paths[f"/resources{resource}/{{id}}"] = bundle_path_items["item"]
+        bundle_paths[f"/resources{resource}"] = bundle_path_items["list"]
+
+    info = {"title": "Synthetic API", "version": "1.0.0"}
+    files["openapi.json"] = {
+        "openapi": "3.0.2",
+        "info": info,
+        "paths": {
+            path: {"$ref": f"./schemas/resource{resource}/resource{resource}Paths.json#/{kind}"}
+            for resource in range(resources)
+            for path, kind in ((f"/resources{resource}/{{id}}", "item"), (f"/resources{resource}", "list"))
+        },
+        "components": {"schemas": {
+            schema_name(resource, 0, 0): {"$ref": f"./{schema_file(resource)}#/components/schemas/"
+                                                  f"{schema_name(resource, 0, 0)}"}
+            for resource in range(resources)
+        }}
+    }
+    refs += 3 * resources
+    files["bundle/openapi.json"] = {"openapi": "3.0.2", "info": info, "paths": bundle_paths}
+    files["bundle/schemas.json"] = {"components": {"schemas": bundle_schemas}}
+
+    for relative, content in files.items():
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(content, f, indent=2)
+
+    return {
+        'scale': scale, 'fanout': fanout, 'depth': depth, 'sharing': sharing, 'cycles': cycles, 'seed': seed,
+        'resources': resources, 'files': len(files) - 2, 'refs': refs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic multi-file OpenAPI spec tree')
+    parser.add_argument('output_dir', help='Directory to write the tree to')
+    parser.add_argument('--scale', type=float, default=1, help='Size relative to the Unit SDK tree (default: 1)')
+    parser.add_argument('--fanout', type=int, default=4, help='$ref properties per schema (default: 4)')
+    parser.add_argument('--depth', type=int, default=4, help='Schema levels per resource (default: 4)')
+    parser.add_argument('--sharing', type=float, default=0.5,
+                        help='Probability that a reference targets a shared type (default: 0.5)')
+    parser.add_argument('--cycles', type=int, default=2, help='Reference cycles to create (default: 2)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    args = parser.parse_args()
+
+    summary = generate_spec_tree(args.output_dir, args.scale, args.fanout, args.depth,
+                                 args.sharing, args.cycles, args.seed)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,50 @@
+import argparse
 import json
+import os
 from pathlib import Path
 
-def create_llm_bundle(openapi_file, schemas_file, output_file):
-    """Create a single file by inlining the schemas.json content"""
+from spec_cache import DocumentStore, default_cache, load_json
+from spec_flatten import flatten_schemas
+from spec_prune import prune_unreachable_schemas
+from spec_shard import BYTES_PER_TOKEN, DEFAULT_SHARD_BYTES, SHARD_BY, write_shards
+from spec_walk import rewrite_refs
+
+# Ref prefixes create_llm_bundle makes local by default
+DEFAULT_REF_PREFIXES = {'./schemas.json#/': '#/'}
+
+def prune_report_path(output_file):
+    """Pruning report path for a bundle: openapi-bundled.json -> openapi-bundled.prune.json"""
+    root, _ = os.path.splitext(str(output_file))
+    return f"{root}.prune.json"
+
+def prefix_rewriter(prefixes):
+    """Ref rewrite function replacing the longest matching prefix, for spec_walk.rewrite_refs"""
+    ordered = sorted(prefixes.items(), key=lambda item: len(item[0]), reverse=True)
+    
+    def rewrite(ref):
+        for prefix, replacement in ordered:
+            if ref.startswith(prefix):
+                return replacement + ref[len(prefix):]
+        return None
+    return rewrite
+
+def create_llm_bundle(openapi_file, schemas_file, output_file, cache=None, flatten=False, prune=False,
+                      shard_dir=None, shard_by='resource', shard_bytes=DEFAULT_SHARD_BYTES, ref_prefixes=None):
+    """
+    Create a single file by inlining the schemas.json content.
     
-    with open(openapi_file, 'r') as f:
-        openapi = json.load(f)
+    Refs starting with a key of ref_prefixes (default:
+    DEFAULT_REF_PREFIXES, './schemas.json#/' -> '#/') have that prefix
+    replaced, in place in the loaded documents.
+    Optionally drops the schemas no path reaches (writing the names removed
+    to prune_report_path(output_file)), then merges allOf compositions.
+    With shard_dir, the bundle is also written there as self-contained
+    per-tag or per-resource shards of at most shard_bytes each, with an
+    index of paths and operationIds (see spec_shard.write_shards).
+    """
     
-    with open(schemas_file, 'r') as f:
-        schemas = json.load(f)
+    openapi = load_json(openapi_file, cache)
+    schemas = load_json(schemas_file, cache)
     
     # Merge schemas into openapi components
     if 'components' not in openapi:
@@ -18,17 +54,26 @@ def create_llm_bundle(openapi_file, schemas_file, output_file):
     
     openapi['components']['schemas'].update(schemas['components']['schemas'])
     
-    # Update all references from ./schemas.json#/... to #/...
-    def localize_refs(obj):
-        if isinstance(obj, dict):
-            if '$ref' in obj and obj['$ref'].startswith('./schemas.json#/'):
-                obj['$ref'] = obj['$ref'].replace('./schemas.json#/', '#/')
-            return {k: localize_refs(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [localize_refs(item) for item in obj]
-        return obj
+    # Update all references from ./schemas.json#/... to #/..., merged schemas
+    # included; the documents were parsed for this run, so no copy is needed
+    rewrite_refs(openapi, prefix_rewriter(DEFAULT_REF_PREFIXES if ref_prefixes is None else ref_prefixes))
+    documents = DocumentStore(cache)
     
-    openapi = localize_refs(openapi)
+    if prune:
+        openapi, report = prune_unreachable_schemas(openapi, openapi_file, documents)
+        with open(prune_report_path(output_file), 'w') as f:
+            json.dump(report, f, indent=2)
+        if report['unresolved']:
+            print(f"Pruning skipped: {len(report['unresolved'])} references could not be followed "
+                  f"(see {prune_report_path(output_file)})")
+        else:
+            print(f"Pruned schemas: {len(report['removed'])} unreachable removed, {report['kept']} kept "
+                  f"(see {prune_report_path(output_file)})")
+    
+    if flatten:
+        openapi, stats = flatten_schemas(openapi)
+        print(f"Flattened schemas: {stats['allof_merged']} allOf compositions merged, "
+              f"{stats['conflicts']} conflicting compositions kept")
     
     # Save bundled version
     with open(output_file, 'w') as f:
@@ -37,6 +82,40 @@ def create_llm_bundle(openapi_file, schemas_file, output_file):
     file_size = Path(output_file).stat().st_size
     print(f"Created LLM-ready bundle: {output_file}")
     print(f"File size: {file_size:,} bytes ({file_size / 1024 / 1024:.2f} MB)")
+    
+    if shard_dir:
+        index = write_shards(openapi, shard_dir, openapi_file, shard_by, shard_bytes, documents)
+        largest = max((shard['bytes'] for shard in index['shards'].values()), default=0)
+        print(f"Wrote {len(index['shards'])} shards by {shard_by} to {shard_dir} "
+              f"(largest {largest:,} bytes, {len(index['operations'])} operations indexed)")
+        if index['over_budget']:
+            print(f"Warning: {len(index['over_budget'])} shards hold a path item too large for {shard_bytes:,} bytes: "
+                  f"{', '.join(index['over_budget'])}")
 
 if __name__ == "__main__":
-    create_llm_bundle('openapi.json', 'schemas.json', 'openapi-bundled.json')
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Bundle openapi.json and schemas.json into one LLM-ready file')
+    parser.add_argument('--flatten', action='store_true', help='Merge allOf compositions into single schemas')
+    parser.add_argument('--prune', action='store_true', help='Drop the schemas no path reaches')
+    parser.add_argument('--shards', metavar='DIR', help='Also write the bundle as shards with an index to DIR')
+    parser.add_argument('--shard-by', choices=SHARD_BY, default='resource',
+                        help='Group paths by first tag or first path segment (default: resource)')
+    budget = parser.add_mutually_exclusive_group()
+    budget.add_argument('--shard-bytes', type=int, default=DEFAULT_SHARD_BYTES,
+                        help=f'Size budget per shard (default: {DEFAULT_SHARD_BYTES})')
+    budget.add_argument('--shard-tokens', type=int,
+                        help=f'Size budget per shard in tokens, at {BYTES_PER_TOKEN} bytes per token')
+    parser.add_argument('--localize', action='append', metavar='PREFIX=REPLACEMENT',
+                        help="Rewrite refs starting with PREFIX, e.g. './types.json#/=#/' (repeatable; "
+                             "default: ./schemas.json#/=#/)")
+    args = parser.parse_args()
+    
+    ref_prefixes = None
+    if args.localize:
+        if any('=' not in rewrite for rewrite in args.localize):
+            parser.error('--localize expects PREFIX=REPLACEMENT')
+        ref_prefixes = dict(rewrite.split('=', 1) for rewrite in args.localize)
+    
+    create_llm_bundle('openapi.json', 'schemas.json', 'openapi-bundled.json', cache=default_cache(),
+                      flatten=args.flatten, prune=args.prune, shard_dir=args.shards, shard_by=args.shard_by,
+                      shard_bytes=args.shard_tokens * BYTES_PER_TOKEN if args.shard_tokens else args.shard_bytes,
+                      ref_prefixes=ref_prefixes)
\ No newline at end of file
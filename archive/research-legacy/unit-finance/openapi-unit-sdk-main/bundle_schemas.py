@@ -1,49 +1,226 @@
+import argparse
+import hashlib
 import json
+import multiprocessing.util
+import os
+import posixpath
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-def collect_schemas_from_directory(schemas_dir):
-    """Collect all schemas from files in the schemas directory"""
+from spec_cache import ParseCache, default_cache, load_json
+from spec_pointer import escape_pointer_token
+from spec_walk import Descend, rebuild
+
+# Bump when the bundle manifest layout changes
+MANIFEST_VERSION = 2
+
+# Below this many files to parse, starting a worker pool costs more than it saves
+PARALLEL_MIN_FILES = 64
+
+def read_schema_file(json_file, cache=None):
+    """
+    Read the schemas one file defines.
+    
+    Returns:
+        (schemas, error): the file's components/schemas, or the file itself
+        under its stem if it looks like a schema, and an error message if it
+        could not be read
+    """
+    try:
+        data = load_json(json_file, cache)
+    except (OSError, ValueError) as e:
+        return {}, str(e)
+    
+    # Extract schemas from components/schemas
+    if isinstance(data, dict) and isinstance(data.get('components'), dict) and 'schemas' in data['components']:
+        return data['components']['schemas'], None
+    
+    # Also check for top-level schemas (some files might be structured differently)
+    if isinstance(data, dict) and 'type' in data:
+        return {Path(json_file).stem: data}, None
+    return {}, None
+
+# Parse cache of a read_schema_paths worker process, set up by init_schema_worker
+_worker_cache = None
+
+def init_schema_worker(cache_dir, max_bytes):
+    """Pool initializer for read_schema_paths: give the worker process one parse cache, saved when it exits"""
+    global _worker_cache
+    _worker_cache = ParseCache(cache_dir, max_bytes)
+    # Worker processes exit without running atexit handlers, but do run multiprocessing finalizers
+    multiprocessing.util.Finalize(_worker_cache, _worker_cache.save, exitpriority=10)
+
+def cache_schema_files(paths):
+    """
+    Worker side of read_schema_paths: parse a chunk of files into the shared parse cache.
+    
+    Only the files' index entries go back to the parent process, which is
+    far cheaper than pickling the parsed documents. Files that fail to load
+    are skipped; the parent reads them again and reports the error.
+    """
+    entries = []
+    for path in paths:
+        try:
+            _worker_cache.load(path)
+        except (OSError, ValueError):
+            continue
+        entry = _worker_cache.entries(path)
+        if entry is not None:
+            entries.append(entry)
+    return entries
+
+def read_schema_paths(json_files, cache=None, jobs=None):
+    """
+    Read schema files, parsing them on jobs worker processes (default: one per core).
+    
+    Workers are only used with a parse cache, and only for files it does
+    not hold yet: they parse those into the cache directory, and the files
+    are then all loaded here from the cache. Without a cache every file is
+    parsed in this process, since sending parsed documents back from
+    workers costs more than parsing them.
+    
+    Returns:
+        One read_schema_file result per file, in the order given
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if cache is not None and jobs > 1:
+        stale = [str(path) for path in json_files if not cache.is_current(path)]
+        if len(stale) >= PARALLEL_MIN_FILES:
+            # A few chunks per worker balances uneven file sizes
+            size = -(-len(stale) // (jobs * 4))
+            chunks = [stale[start:start + size] for start in range(0, len(stale), size)]
+            with ProcessPoolExecutor(max_workers=jobs, initializer=init_schema_worker,
+                                     initargs=(str(cache.cache_dir), cache.max_bytes)) as pool:
+                for entries in pool.map(cache_schema_files, chunks):
+                    cache.add_entries(entries)
+    return [read_schema_file(path, cache) for path in json_files]
+
+def schema_digest(schema):
+    """Content hash of a schema definition, independent of key order"""
+    return hashlib.sha256(json.dumps(schema, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+def duplicate_report(defined):
+    """
+    Find schema names defined by more than one file.
+    
+    Args:
+        defined: (file, {schema name: schema_digest}) pairs in merge order
+    
+    Returns:
+        {"schema", "kept", "ignored", "identical"} per duplicated name, in the
+        order the duplicates are met
+    """
+    kept = {}
+    duplicates = {}
+    for relative, digests in defined:
+        for schema_name, digest in digests.items():
+            if schema_name not in kept:
+                kept[schema_name] = (relative, digest)
+                continue
+            duplicate = duplicates.setdefault(schema_name, {
+                'schema': schema_name, 'kept': kept[schema_name][0], 'ignored': [], 'identical': True
+            })
+            duplicate['ignored'].append(relative)
+            duplicate['identical'] = duplicate['identical'] and digest == kept[schema_name][1]
+    return list(duplicates.values())
+
+def canonical_ref(ref, source):
+    """Resolve the file part of a $ref against the file it appears in; local and remote refs stay as they are"""
+    file_part, hash_mark, fragment = ref.partition('#')
+    if not file_part or '://' in file_part:
+        return ref
+    target = posixpath.normpath(posixpath.join(posixpath.dirname(source), file_part))
+    return f"{target}{hash_mark}{fragment}"
+
+def canonical_digest(schema, source):
+    """
+    schema_digest of a schema as the bundle means it.
+    
+    Relative file $refs are resolved against source (the schema's file,
+    relative to the schemas directory), so equal-looking schemas from
+    different directories that point at different files hash differently.
+    Local refs already name bundle components and are kept.
+    """
+    def canonical(node, _):
+        siblings = {key: value for key, value in node.items() if key != '$ref'}
+        ref = node['$ref']
+        return Descend([(siblings, None)], lambda parts: {
+            **parts[0], '$ref': canonical_ref(ref, source) if isinstance(ref, str) else ref
+        })
+    return schema_digest(rebuild(schema, None, canonical))
+
+def dedupe_bundled_schemas(schemas, sources):
+    """
+    Collapse structurally identical schemas to one definition.
+    
+    Schemas are compared by canonical_digest. The first schema of each group
+    in bundle order keeps its definition; the others become aliases, local
+    $refs to it, so references to every name keep working. schemas is
+    modified in place.
+    
+    Args:
+        schemas: Bundled schemas by name, in bundle order
+        sources: Per schema name, the file it came from relative to the
+            schemas directory
+    
+    Returns:
+        {alias: canonical name} for the schemas replaced by references
+    """
+    canonical_names = {}
+    aliases = {}
+    for schema_name, schema in schemas.items():
+        if not isinstance(schema, dict):
+            continue
+        canonical_name = canonical_names.setdefault(canonical_digest(schema, sources[schema_name]), schema_name)
+        if canonical_name != schema_name:
+            aliases[schema_name] = canonical_name
+    for alias, canonical_name in aliases.items():
+        schemas[alias] = {'$ref': f"#/components/schemas/{escape_pointer_token(canonical_name)}"}
+    return aliases
+
+def list_schema_files(schemas_dir):
+    """Schema files under a directory, sorted by their path relative to it"""
+    schemas_path = Path(schemas_dir)
+    return sorted(schemas_path.glob('**/*.json'), key=lambda path: path.relative_to(schemas_path).as_posix())
+
+def collect_schemas_from_directory(schemas_dir, cache=None, jobs=None):
+    """
+    Collect all schemas from files in the schemas directory.
+    
+    Files are read with read_schema_paths (uncached files are parsed on
+    jobs worker processes) and merged in sorted path order, so when several
+    files define the same schema name the first path wins whatever order
+    the filesystem lists them in. Nothing is printed; duplicates and
+    unreadable files are returned in the report.
+    
+    Returns:
+        (schemas, report): report has the number of files scanned, the
+        duplicates as {"schema", "kept", "ignored", "identical"} entries
+        (paths relative to schemas_dir) and the errors as {"file", "error"}
+    """
     schemas_path = Path(schemas_dir)
+    json_files = list_schema_files(schemas_dir)
+    results = read_schema_paths(json_files, cache, jobs)
+    
     all_schemas = {}
+    defined = []
+    errors = []
+    for json_file, (schemas, error) in zip(json_files, results):
+        relative = json_file.relative_to(schemas_path).as_posix()
+        if error is not None:
+            errors.append({'file': relative, 'error': error})
+            continue
+        defined.append((relative, {name: schema_digest(schema) for name, schema in schemas.items()}))
+        for schema_name, schema_def in schemas.items():
+            all_schemas.setdefault(schema_name, schema_def)
     
-    print(f"Scanning directory: {schemas_path}")
-    
-    # Find all JSON files in schemas directory
-    json_files = list(schemas_path.glob('**/*.json'))
-    print(f"Found {len(json_files)} JSON files")
-    
-    for json_file in json_files:
-        print(f"  Processing: {json_file.name}")
-        
-        with open(json_file, 'r') as f:
-            try:
-                data = json.load(f)
-                
-                # Extract schemas from components/schemas
-                if 'components' in data and 'schemas' in data['components']:
-                    for schema_name, schema_def in data['components']['schemas'].items():
-                        if schema_name in all_schemas:
-                            print(f"    Warning: Duplicate schema '{schema_name}' (keeping first occurrence)")
-                        else:
-                            all_schemas[schema_name] = schema_def
-                            print(f"    Added: {schema_name}")
-                
-                # Also check for top-level schemas (some files might be structured differently)
-                elif isinstance(data, dict) and 'type' in data:
-                    # This looks like a schema itself
-                    schema_name = json_file.stem
-                    all_schemas[schema_name] = data
-                    print(f"    Added: {schema_name} (top-level schema)")
-                    
-            except json.JSONDecodeError as e:
-                print(f"    Error reading {json_file}: {e}")
-    
-    return all_schemas
-
-def extract_schemas_from_openapi(openapi_file):
+    report = {'files': len(json_files), 'duplicates': duplicate_report(defined), 'errors': errors}
+    return all_schemas, report
+
+def extract_schemas_from_openapi(openapi_file, cache=None):
     """Extract schemas already defined in openapi.json"""
-    with open(openapi_file, 'r') as f:
-        openapi = json.load(f)
+    openapi = load_json(openapi_file, cache)
     
     schemas = {}
     if 'components' in openapi and 'schemas' in openapi['components']:
@@ -52,21 +229,222 @@ def extract_schemas_from_openapi(openapi_file):
     
     return schemas
 
-def create_bundled_schemas(openapi_file, schemas_dir, output_file):
-    """Create a single schemas.json file from all sources"""
+def bundle_manifest_path(output_file):
+    """Manifest path for a bundle: schemas.json -> schemas.manifest.json"""
+    root, _ = os.path.splitext(str(output_file))
+    return f"{root}.manifest.json"
+
+def file_digest(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def check_source(file_path, entry):
+    """
+    Compare a source file with its manifest entry.
+    
+    The content is hashed only when the file's size or modification time
+    changed, so touching a file does not count as a change.
+    
+    Returns:
+        (entry, changed): the previous entry (with fresh stat fields if the
+        file was only touched) and False, or a new entry still without
+        schemas and True
+    """
+    stat = os.stat(file_path)
+    if entry is not None and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+        return entry, False
+    digest = file_digest(file_path)
+    if entry is not None and entry['hash'] == digest:
+        return {**entry, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}, False
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'hash': digest, 'schemas': {}}, True
+
+def load_bundle_manifest(manifest_file, sources, output_path):
+    """
+    Read the manifest of a previous run, if it still describes output_path.
+    
+    Returns:
+        The manifest, or None when there is none, it was written for other
+        sources and options or another format version, or the bundle was
+        modified since
+    """
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        stat = output_path.stat()
+    except (OSError, ValueError):
+        return None
+    if (manifest.get('version') != MANIFEST_VERSION
+            or manifest.get('sources') != sources
+            or manifest.get('output') != {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}):
+        return None
+    return manifest
+
+def write_bundle_manifest(manifest_file, manifest):
+    """Write a manifest atomically, so an interrupted run leaves the previous one in place"""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(manifest_file)), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    os.replace(temp_path, manifest_file)
+
+def print_scan_summary(report, schema_count):
+    conflicting = [duplicate for duplicate in report['duplicates'] if not duplicate['identical']]
+    print(f"Scanned {report['files']} files: {schema_count} schemas, "
+          f"{len(report['duplicates'])} duplicate names ({len(conflicting)} with differing definitions), "
+          f"{len(report['errors'])} unreadable files")
+    for duplicate in conflicting:
+        print(f"  Warning: '{duplicate['schema']}' differs in {', '.join(duplicate['ignored'])}; "
+              f"kept {duplicate['kept']}")
+    for error in report['errors']:
+        print(f"  Error reading {error['file']}: {error['error']}")
+
+def write_report(report_file, report):
+    if report_file:
+        with open(report_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Scan report written to {report_file}")
+
+def create_bundled_schemas(openapi_file, schemas_dir, output_file, cache=None, jobs=None, report_file=None,
+                           incremental=True, dedupe=False):
+    """
+    Create a single schemas.json file from all sources, optionally writing the scan report as JSON.
+    
+    A manifest next to the output (see bundle_manifest_path) records each
+    source file's size, modification time and content hash, and the hash of
+    every schema it defines. With incremental set, a re-run re-reads only
+    the files added or changed since, takes everything else from the
+    previous bundle, and writes nothing when no source changed. The result
+    is the same as a full rebuild, which happens when there is no usable
+    manifest or the bundle was modified by something else.
+    
+    With dedupe set, structurally identical schemas stored under different
+    names are collapsed to one definition (see dedupe_bundled_schemas).
     
-    print("Step 1: Collecting schemas from /schemas directory...")
-    dir_schemas = collect_schemas_from_directory(schemas_dir)
+    Returns:
+        The scan report: files, duplicates and errors as returned by
+        collect_schemas_from_directory, the "added", "changed" and "removed"
+        files of this run, and with dedupe the "aliases" as {"schema",
+        "canonical"} entries
+    """
+    schemas_path = Path(schemas_dir)
+    output_path = Path(output_file)
+    manifest_file = bundle_manifest_path(output_file)
+    sources = {'openapi': str(openapi_file), 'schemas_dir': str(schemas_dir), 'dedupe': dedupe}
+    previous = load_bundle_manifest(manifest_file, sources, output_path) if incremental else None
+    previous_files = previous['files'] if previous else {}
+    
+    print("Step 1: Checking sources for changes..." if previous else
+          "Step 1: Collecting schemas from /schemas directory...")
+    openapi_entry, openapi_changed = check_source(openapi_file, previous['openapi'] if previous else None)
+    files = {}
+    to_read = []
+    added, changed = [], []
+    for json_file in list_schema_files(schemas_dir):
+        relative = json_file.relative_to(schemas_path).as_posix()
+        entry = previous_files.get(relative)
+        try:
+            files[relative], is_changed = check_source(json_file, entry)
+        except FileNotFoundError:
+            # Deleted since the directory was listed: reported as removed
+            continue
+        except OSError as e:
+            # An unreadable file contributes no schemas, so the bundle changes
+            # unless the file was unreadable last time too
+            if entry is not None and entry['hash'] == '':
+                files[relative] = entry
+            else:
+                files[relative] = {'mtime_ns': 0, 'size': -1, 'hash': '', 'schemas': {}, 'error': str(e)}
+                (changed if entry is not None else added).append(relative)
+            continue
+        if is_changed:
+            to_read.append((relative, json_file))
+            (changed if entry is not None else added).append(relative)
+    removed = [relative for relative in previous_files if relative not in files]
+    
+    loaded = {}
+    results = read_schema_paths([json_file for _, json_file in to_read], cache, jobs)
+    for (relative, _), (schemas, error) in zip(to_read, results):
+        entry = files[relative]
+        if error is not None:
+            entry['error'] = error
+        entry['schemas'] = {name: schema_digest(schema) for name, schema in schemas.items()}
+        loaded[relative] = schemas
+    
+    report = {
+        'files': len(files),
+        'duplicates': duplicate_report((relative, entry['schemas']) for relative, entry in files.items()),
+        'errors': [{'file': relative, 'error': entry['error']} for relative, entry in files.items() if 'error' in entry],
+        'added': added, 'changed': changed, 'removed': removed,
+    }
+    
+    if previous and not (openapi_changed or added or changed or removed):
+        if openapi_entry is not previous['openapi'] or any(files[relative] is not previous_files[relative]
+                                                            for relative in files):
+            write_bundle_manifest(manifest_file, {**previous, 'openapi': openapi_entry, 'files': files})
+        print(f"Bundle is up to date: {output_file} ({len(previous['bundle'])} schemas)")
+        if dedupe:
+            report['aliases'] = previous['aliases']
+        write_report(report_file, report)
+        return report
+    
+    if previous:
+        print(f"Sources changed: {len(added)} added, {len(changed)} changed, {len(removed)} removed"
+              + (", openapi.json changed" if openapi_changed else ""))
+    print_scan_summary(report, len({name for entry in files.values() for name in entry['schemas']}))
     
     print("\nStep 2: Extracting schemas from openapi.json...")
-    openapi_schemas = extract_schemas_from_openapi(openapi_file)
+    if openapi_changed:
+        loaded[None] = extract_schemas_from_openapi(openapi_file, cache)
+        openapi_entry['schemas'] = {name: schema_digest(schema) for name, schema in loaded[None].items()}
     
     print("\nStep 3: Merging schemas...")
-    # Merge both sources (directory schemas take precedence)
-    all_schemas = {**openapi_schemas, **dir_schemas}
+    # Directory schemas take precedence, the first file by path winning;
+    # the order is that of {**openapi_schemas, **dir_schemas}
+    winners = {}
+    for relative, entry in files.items():
+        for schema_name, digest in entry['schemas'].items():
+            winners.setdefault(schema_name, (relative, digest))
+    for schema_name, digest in openapi_entry['schemas'].items():
+        winners.setdefault(schema_name, (None, digest))
+    order = list(openapi_entry['schemas']) + [name for name in winners if name not in openapi_entry['schemas']]
+    
+    # Schemas whose winning definition is not new and not in the previous
+    # bundle (e.g. uncovered by removing a duplicate, or replaced there by an
+    # alias) are read from their file
+    bundled_digests = previous['bundle'] if previous else {}
+    previous_aliases = {alias['schema'] for alias in previous['aliases']} if previous else set()
+    unread = {winners[name][0] for name in order
+              if winners[name][0] not in loaded
+              and (bundled_digests.get(name) != winners[name][1] or name in previous_aliases)}
+    for source in sorted(unread, key=lambda source: source or ''):
+        if source is None:
+            loaded[None] = extract_schemas_from_openapi(openapi_file, cache)
+        else:
+            loaded[source] = read_schema_file(schemas_path / source, cache)[0]
+    old_schemas = None
+    all_schemas = {}
+    for schema_name in order:
+        source, digest = winners[schema_name]
+        if source in loaded:
+            all_schemas[schema_name] = loaded[source][schema_name]
+            continue
+        if old_schemas is None:
+            with open(output_path, 'r', encoding='utf-8') as f:
+                old_schemas = json.load(f)['components']['schemas']
+        all_schemas[schema_name] = old_schemas[schema_name]
     
     print(f"Total unique schemas: {len(all_schemas)}")
     
+    if dedupe:
+        openapi_source = posixpath.relpath(Path(openapi_file).resolve().as_posix(), schemas_path.resolve().as_posix())
+        aliases = dedupe_bundled_schemas(all_schemas, {
+            schema_name: openapi_source if winners[schema_name][0] is None else winners[schema_name][0]
+            for schema_name in order
+        })
+        report['aliases'] = [{'schema': alias, 'canonical': canonical_name}
+                             for alias, canonical_name in aliases.items()]
+        print(f"Deduplicated: {len(aliases)} schemas replaced by references to "
+              f"{len(set(aliases.values()))} identical definitions")
+    
     # Create the bundled structure
     bundled = {
         "components": {
@@ -75,7 +453,6 @@ def create_bundled_schemas(openapi_file, schemas_dir, output_file):
     }
     
     # Save to file
-    output_path = Path(output_file)
     with open(output_path, 'w') as f:
         json.dump(bundled, f, indent=2)
     
@@ -83,11 +460,41 @@ def create_bundled_schemas(openapi_file, schemas_dir, output_file):
     print(f"\nCreated: {output_file}")
     print(f"File size: {file_size:,} bytes ({file_size / 1024:.2f} KB)")
     print(f"Schemas included: {len(all_schemas)}")
+    
+    stat = output_path.stat()
+    write_bundle_manifest(manifest_file, {
+        'version': MANIFEST_VERSION,
+        'sources': sources,
+        'output': {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size},
+        'openapi': openapi_entry,
+        'files': files,
+        'bundle': {schema_name: winners[schema_name][1] for schema_name in order},
+        'aliases': report.get('aliases', []),
+    })
+    write_report(report_file, report)
+    return report
 
 if __name__ == "__main__":
-    # Adjust these paths if needed
+    parser = argparse.ArgumentParser(description='Bundle every schema of a spec tree into one schemas.json')
+    parser.add_argument('--openapi', default='openapi.json', help='Main OpenAPI file (default: openapi.json)')
+    parser.add_argument('--schemas-dir', default='schemas', help='Schema directory to scan (default: schemas)')
+    parser.add_argument('--output', default='schemas.json', help='Bundled output file (default: schemas.json)')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='Worker processes parsing files not yet in the parse cache (default: one per core)')
+    parser.add_argument('--report', help='Write duplicates and unreadable files to this JSON file')
+    parser.add_argument('--dedupe', action='store_true',
+                        help='Replace schemas identical to an earlier one by references to it')
+    parser.add_argument('--full', action='store_true',
+                        help='Rebuild from every source instead of patching the previous bundle')
+    args = parser.parse_args()
+    
     create_bundled_schemas(
-        openapi_file='openapi.json',
-        schemas_dir='schemas',
-        output_file='schemas.json'
-    )
\ No newline at end of file
+        openapi_file=args.openapi,
+        schemas_dir=args.schemas_dir,
+        output_file=args.output,
+        cache=default_cache(),
+        jobs=args.jobs,
+        report_file=args.report,
+        incremental=not args.full,
+        dedupe=args.dedupe
+    )
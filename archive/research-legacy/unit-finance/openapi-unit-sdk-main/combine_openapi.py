@@ -2,18 +2,80 @@ import json
 import os
 import sys
 from pathlib import Path
-from typing import Dict, Any, Set
+from typing import Dict, Any, Set, Tuple
 from urllib.parse import urlparse, urljoin
 
+from spec_cache import MISSING, BoundedCache, DocumentStore, default_cache, resolved_size
+from spec_dedupe import dedupe_schemas, unique_component_name
+from spec_flatten import SchemaFlattener, flatten_schemas
+from spec_pointer import compile_pointer, escape_pointer_token
+from spec_sourcemap import SourceMapBuilder, source_map_path
+from spec_stats import ResolutionStats, stats_path
+from spec_walk import Descend, Replace, find_cycles, iter_refs, prefetch_ref_graph, rebuild
+
 class OpenAPIResolver:
-    def __init__(self, base_dir: str):
+    def __init__(self, base_dir: str, cache=None, memory_budget: int = None):
         self.base_dir = Path(base_dir)
-        self.resolved_refs = {}
+        self.cache = cache
+        self.memory_budget = memory_budget
+        # Split a memory budget between parsed files and resolved targets;
+        # evicted entries are reloaded or re-resolved when needed again
+        if memory_budget is None:
+            self.resolved_refs = {}
+        else:
+            self.resolved_refs = BoundedCache(memory_budget // 2, resolved_size)
+        # Parsed files with their pointer indexes, shared by every pointer into a file
+        self.documents = DocumentStore(cache, None if memory_budget is None else memory_budget // 2,
+                                       on_load=self.record_load)
+        self.loaded_files = self.documents.files
+        # Every target resolved so far, including evicted ones
+        self.resolved_keys = set()
         self.processed_files = set()
+        self.resolving = set()
+        # (file, JSON path) of targets on reference cycles -> components/schemas name
+        self.recursive_names = {}
+        # Merges sibling $refs and allOf compositions when flattening
+        self.flattener = None
+        # Collects where output nodes came from, when a source map was requested
+        self.source_map = None
+        # Profiling for the current run, when a stats report was requested
+        self.stats = None
+    
+    def ref_file_path(self, file_path: str, current_file_path: Path) -> Path:
+        """Resolve the file part of a $ref relative to the referencing file or base dir"""
+        if file_path.startswith('./') or file_path.startswith('../'):
+            return (current_file_path.parent / file_path).resolve()
+        return (self.base_dir / file_path).resolve()
+    
+    def load_json_file(self, full_path: Path) -> Any:
+        """Load and cache a JSON or YAML file, returning None if it cannot be read"""
+        try:
+            return self.documents.load(full_path)
+        except (OSError, ValueError):
+            return None
+    
+    def record_load(self, file_key: str, seconds: float):
+        """DocumentStore callback: record the load time of a file when collecting stats"""
+        if self.stats is not None:
+            self.stats.record_load(os.path.relpath(file_key, self.base_dir), seconds, os.path.getsize(file_key))
+    
+    def note_target(self, full_path: Path, json_path: str, value: Any):
+        """Register a resolved target's origin with the source map being built, if any"""
+        if self.source_map is not None:
+            pointer = json_path if json_path.startswith('/') or not json_path else '/' + json_path
+            self.source_map.add_target(value, (os.path.relpath(full_path, self.base_dir), '#' + pointer))
+    
+    def target_label(self, cache_key: str) -> str:
+        """Readable name of a target for reports: path relative to the base dir plus JSON path"""
+        full_path, json_path = cache_key.rsplit('#', 1)
+        return f"{os.path.relpath(full_path, self.base_dir)}#{json_path}"
+    
+    def prefetch(self, main_path: Path, max_workers: int = None) -> int:
+        """Load every file reachable from the main file on a thread pool"""
+        return len(prefetch_ref_graph(main_path, self.load_json_file, self.ref_file_path, max_workers))
         
-    def resolve_ref(self, ref_path: str, current_file_path: Path) -> Any:
-        """Resolve a $ref reference to its actual content"""
-        # Parse the reference
+    def ref_target(self, ref_path: str, current_file: Path) -> Tuple[Path, str]:
+        """Split a $ref into the file it points at and its JSON path"""
         if '#' in ref_path:
             file_path, json_path = ref_path.split('#', 1)
         else:
@@ -22,115 +84,256 @@ class OpenAPIResolver:
         
         # Resolve relative file path
         if file_path:
-            if file_path.startswith('./') or file_path.startswith('../'):
-                full_path = (current_file_path.parent / file_path).resolve()
-            else:
-                full_path = (self.base_dir / file_path).resolve()
-        else:
-            full_path = current_file_path
+            return self.ref_file_path(file_path, current_file), json_path
+        return current_file, json_path
+    
+    def lookup_target(self, full_path: Path, json_path: str) -> Any:
+        """Follow a JSON path into a referenced file; each file is parsed once and shared by all its pointers"""
+        return self.documents.lookup(full_path, json_path)
+    
+    def plan_recursive_components(self, spec: Any, main_path: Path) -> Dict[Tuple[Path, str], str]:
+        """
+        Name the targets that lie on reference cycles.
+        
+        References to these targets become local '#/components/schemas/<name>'
+        references, and their bodies are added to components/schemas once.
+        Targets that are components/schemas entries of the main file (directly
+        or as a plain $ref) keep that name; others are named after the last
+        JSON path token, with a hash suffix on collisions.
+        """
+        def successors(target):
+            full_path, json_path = target
+            try:
+                data = self.lookup_target(full_path, json_path)
+            except Exception:
+                return []
+            return [self.ref_target(ref, full_path) for ref in iter_refs(data)]
+        
+        cyclic = find_cycles([self.ref_target(ref, main_path) for ref in iter_refs(spec)], successors)
+        names = {}
+        taken = set()
+        
+        components = spec.get('components')
+        schemas = components.get('schemas') if isinstance(components, dict) else None
+        if cyclic and isinstance(schemas, dict):
+            taken.update(schemas)
+            for name, schema in schemas.items():
+                local = (main_path, f"/components/schemas/{escape_pointer_token(name)}")
+                if local in cyclic:
+                    names[local] = name
+                elif isinstance(schema, dict) and isinstance(schema.get('$ref'), str):
+                    target = self.ref_target(schema['$ref'], main_path)
+                    if target in cyclic and target not in names:
+                        names[target] = name
+        
+        for full_path, json_path in sorted(cyclic - set(names), key=str):
+            tokens, _ = compile_pointer(json_path)
+            base = tokens[-1] if tokens else full_path.stem
+            origin = f"{os.path.relpath(full_path, self.base_dir)}#{json_path}"
+            names[full_path, json_path] = unique_component_name(base, taken, origin)
+        
+        self.recursive_names = names
+        return names
+    
+    def resolve_ref(self, ref_path: str, current_file_path: Path) -> Any:
+        """Resolve a $ref reference to its actual content"""
+        return self.resolve_refs_in_object({'$ref': ref_path}, current_file_path)
+    
+    def substitute_ref(self, obj: Dict[str, Any], current_file: Path) -> Any:
+        """Traversal instruction for a dict containing $ref (see spec_walk.rebuild)"""
+        ref_path = obj['$ref']
+        if len(obj) > 1:
+            # Resolve the reference and the sibling keys, then inline the reference
+            siblings = {key: value for key, value in obj.items() if key != '$ref'}
+            
+            def merge(results):
+                ref_content, resolved_siblings = results
+                if self.flattener is not None and isinstance(ref_content, dict):
+                    return self.flattener.merge_ref(ref_content, resolved_siblings)
+                resolved = {}
+                for key in obj:
+                    if key == '$ref':
+                        if isinstance(ref_content, dict):
+                            resolved.update(ref_content)
+                        else:
+                            resolved['$ref_resolved'] = ref_content
+                    else:
+                        resolved[key] = resolved_siblings[key]
+                if isinstance(ref_content, dict):
+                    # The merged node is the target's content plus the sibling keys
+                    self.note_target(*self.ref_target(ref_path, current_file), resolved)
+                return resolved
+            
+            return Descend([({'$ref': ref_path}, current_file), (siblings, current_file)], merge)
+        
+        full_path, json_path = self.ref_target(ref_path, current_file)
+        
+        # Targets on a reference cycle are emitted once under components/schemas
+        name = self.recursive_names.get((full_path, json_path))
+        if name is not None:
+            return Replace({'$ref': f"#/components/schemas/{escape_pointer_token(name)}"})
         
         # Check if we've already loaded this file
         cache_key = f"{full_path}#{json_path}"
-        if cache_key in self.resolved_refs:
-            return self.resolved_refs[cache_key]
+        resolved = self.resolved_refs.get(cache_key, MISSING)
+        if self.stats is not None:
+            self.stats.record_reference(self.target_label(cache_key), resolved is not MISSING)
+        if resolved is not MISSING:
+            return Replace(resolved)
+        
+        # A reference back into a target being resolved is a cycle; keep it as-is
+        if cache_key in self.resolving:
+            return Replace(obj)
         
-        # Load the referenced file
         try:
-            with open(full_path, 'r') as f:
-                ref_data = json.load(f)
-            
-            # Navigate to the specific path if provided
-            if json_path:
-                parts = json_path.strip('/').split('/')
-                for part in parts:
-                    ref_data = ref_data[part]
-            
-            # Recursively resolve any nested $refs
-            resolved_data = self.resolve_refs_in_object(ref_data, full_path)
-            
-            # Cache the result
-            self.resolved_refs[cache_key] = resolved_data
-            return resolved_data
-            
+            ref_data = self.lookup_target(full_path, json_path)
         except FileNotFoundError:
             print(f"Warning: Referenced file not found: {full_path}")
-            return {"error": f"Reference not found: {ref_path}"}
+            return Replace({"error": f"Reference not found: {ref_path}"})
         except KeyError as e:
             print(f"Warning: Path not found in file {full_path}: {json_path}")
-            return {"error": f"Path not found: {json_path}"}
+            return Replace({"error": f"Path not found: {json_path}"})
         except Exception as e:
             print(f"Error resolving reference {ref_path}: {e}")
-            return {"error": str(e)}
+            return Replace({"error": str(e)})
+        
+        # Resolve any nested $refs, then cache the result
+        self.resolving.add(cache_key)
+        
+        def finish(results):
+            self.resolving.discard(cache_key)
+            self.resolved_refs[cache_key] = results[0]
+            self.resolved_keys.add(cache_key)
+            self.note_target(full_path, json_path, results[0])
+            return results[0]
+        
+        return Descend([(ref_data, full_path)], finish)
     
     def resolve_refs_in_object(self, obj: Any, current_file: Path) -> Any:
-        """Recursively resolve all $ref in an object"""
-        if isinstance(obj, dict):
-            if '$ref' in obj and len(obj) == 1:
-                # This is a pure reference, replace it entirely
-                return self.resolve_ref(obj['$ref'], current_file)
-            else:
-                # Process each key-value pair
-                resolved = {}
-                for key, value in obj.items():
-                    if key == '$ref':
-                        # Inline the reference
-                        ref_content = self.resolve_ref(value, current_file)
-                        if isinstance(ref_content, dict):
-                            resolved.update(ref_content)
-                        else:
-                            resolved['$ref_resolved'] = ref_content
-                    else:
-                        resolved[key] = self.resolve_refs_in_object(value, current_file)
-                return resolved
-        elif isinstance(obj, list):
-            return [self.resolve_refs_in_object(item, current_file) for item in obj]
-        else:
-            return obj
+        """Resolve all $ref in an object, iteratively so deep documents are safe"""
+        try:
+            return rebuild(obj, current_file, self.substitute_ref)
+        finally:
+            self.resolving.clear()
+    
+    def add_recursive_components(self, resolved_spec: Dict[str, Any]):
+        """Add the resolved body of every recursive target to components/schemas"""
+        components = resolved_spec.setdefault('components', {})
+        schemas = components['schemas'] = dict(components.get('schemas') or {})
+        for (full_path, json_path), name in sorted(self.recursive_names.items(), key=lambda item: item[1]):
+            cache_key = f"{full_path}#{json_path}"
+            body = self.resolved_refs.get(cache_key, MISSING)
+            if body is MISSING:
+                ref_data = self.lookup_target(full_path, json_path)
+                body = self.resolved_refs[cache_key] = self.resolve_refs_in_object(ref_data, full_path)
+                self.resolved_keys.add(cache_key)
+                self.note_target(full_path, json_path, body)
+            schemas[name] = body
     
-    def combine_openapi(self, main_file: str, output_file: str = 'combined_openapi.json'):
-        """Combine OpenAPI spec with all referenced files"""
+    def combine_openapi(self, main_file: str, output_file: str = 'combined_openapi.json', jobs: int = 1,
+                        dedupe: bool = False, stats_file: str = None, flatten: bool = False,
+                        source_map_file: str = None):
+        """
+        Combine OpenAPI spec with all referenced files, optionally writing a JSON stats report
+        and a source map from output JSON pointers to where each node came from
+        """
         main_path = Path(main_file)
-        
-        print(f"Loading main OpenAPI file: {main_file}")
+        # Absolute, so local refs in the main file share its parsed document
+        spec_path = main_path.resolve()
+        if source_map_file:
+            if dedupe or flatten:
+                print("Error: --source-map describes the inlined output and cannot be used with --dedupe or --flatten")
+                return
+            if self.memory_budget is not None:
+                print("Error: --source-map needs every resolved target in memory and cannot be used with --memory-budget")
+                return
+            self.source_map = SourceMapBuilder((os.path.relpath(spec_path, self.base_dir), '#'))
+        if stats_file:
+            self.stats = ResolutionStats(parse_cache=self.cache)
         
         try:
-            with open(main_path, 'r') as f:
-                openapi_spec = json.load(f)
-        except Exception as e:
-            print(f"Error loading main file: {e}")
-            return
+            print(f"Loading main OpenAPI file: {main_file}")
         
-        print("Resolving all $ref references...")
+            try:
+                openapi_spec = self.documents.load(spec_path)
+            except Exception as e:
+                print(f"Error loading main file: {e}")
+                return
         
-        # Resolve all references
-        resolved_spec = self.resolve_refs_in_object(openapi_spec, main_path)
+            if jobs > 1:
+                print(f"Prefetching referenced files with {jobs} workers...")
+                self.prefetch(spec_path, max_workers=jobs)
         
-        # Add metadata about the combination
-        if 'info' not in resolved_spec:
-            resolved_spec['info'] = {}
+            print("Resolving all $ref references...")
         
-        resolved_spec['info']['x-combined'] = True
-        resolved_spec['info']['x-original-file'] = str(main_path)
-        resolved_spec['info']['x-total-refs-resolved'] = len(self.resolved_refs)
+            # Resolve all references, then add the recursive schemas as components
+            self.flattener = SchemaFlattener() if flatten else None
+            self.plan_recursive_components(openapi_spec, spec_path)
+            resolved_spec = self.resolve_refs_in_object(openapi_spec, spec_path)
+            if self.recursive_names:
+                self.add_recursive_components(resolved_spec)
+            if self.source_map is not None:
+                self.source_map.add('', resolved_spec)
         
-        # Save the combined spec
-        with open(output_file, 'w') as f:
-            json.dump(resolved_spec, f, indent=2)
+            # Add metadata about the combination
+            if 'info' not in resolved_spec:
+                resolved_spec['info'] = {}
         
-        print(f"\nCombined OpenAPI spec saved to: {output_file}")
-        print(f"Total references resolved: {len(self.resolved_refs)}")
+            resolved_spec['info']['x-combined'] = True
+            resolved_spec['info']['x-original-file'] = str(main_path)
+            resolved_spec['info']['x-total-refs-resolved'] = len(self.resolved_keys)
         
-        # Show statistics
-        paths_count = len(resolved_spec.get('paths', {}))
-        schemas_count = len(resolved_spec.get('components', {}).get('schemas', {}))
-        print(f"Total paths: {paths_count}")
-        print(f"Total schemas: {schemas_count}")
+            if flatten:
+                resolved_spec, stats = flatten_schemas(resolved_spec, self.flattener)
+                print(f"Flattened schemas: {stats['allof_merged']} allOf compositions and "
+                      f"{stats['sibling_refs_merged']} sibling $refs merged, {stats['conflicts']} conflicting "
+                      f"compositions kept")
         
-        return resolved_spec
+            if dedupe:
+                resolved_spec, stats = dedupe_schemas(resolved_spec)
+                print(f"Deduplicated schemas: {stats['components_added']} components added, "
+                      f"{stats['refs_emitted']} local references")
+        
+            # Save the combined spec
+            with open(output_file, 'w') as f:
+                json.dump(resolved_spec, f, indent=2)
+        
+            print(f"\nCombined OpenAPI spec saved to: {output_file}")
+            print(f"Total references resolved: {len(self.resolved_keys)}")
+            loads = self.documents.summary()
+            print(f"Total files loaded: {loads['files']} ({loads['loads']} parses)")
+        
+            # Show statistics
+            paths_count = len(resolved_spec.get('paths', {}))
+            schemas_count = len(resolved_spec.get('components', {}).get('schemas', {}))
+            print(f"Total paths: {paths_count}")
+            print(f"Total schemas: {schemas_count}")
+        
+            if source_map_file:
+                source_map = self.source_map.build()
+                source_map.write(source_map_file, os.path.basename(output_file))
+                self.source_map = None
+                print(f"Source map with {len(source_map):,} segments written to {source_map_file}")
+        
+            if stats_file:
+                resolved = {self.target_label(key): value for key, value in self.resolved_refs.items()}
+                caches = None
+                if self.memory_budget is not None:
+                    caches = {'loaded_files': self.loaded_files.summary(), 'resolved_refs': self.resolved_refs.summary()}
+                self.stats.write(stats_file, resolved, caches)
+                self.stats = None
+                print(f"Resolution stats written to {stats_file}")
+        
+            return resolved_spec
+        finally:
+            if self.stats is not None:
+                # The run failed before its report was written
+                self.stats.finish()
+                self.stats = None
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python combine_openapi.py <main_openapi_file.json> [output_file.json]")
+        print("Usage: python combine_openapi.py <main_openapi_file.json> [output_file.json] [--jobs N] [--dedupe] [--flatten] [--stats] [--source-map] [--memory-budget MB]")
         print("\nExample:")
         print("  python combine_openapi.py unit_openapi.json combined_unit_api.json")
         print("\nThis script will:")
@@ -138,10 +341,40 @@ def main():
         print("  2. Resolve all $ref references to external files")
         print("  3. Combine everything into a single JSON file")
         print("\nNote: The script will look for referenced files relative to the main file's location")
+        print("      --jobs N loads all referenced files on N threads before resolving")
+        print("      --dedupe emits repeated schemas once under components/schemas")
+        print("      --flatten merges allOf compositions and $refs with sibling keywords into single schemas")
+        print("      --stats writes a JSON profiling report next to the output file")
+        print("      --source-map writes a map from output JSON pointers to their source file and pointer")
+        print("      --memory-budget MB caps the memory held by parsed files and resolved references")
         sys.exit(1)
     
-    main_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else 'combined_openapi.json'
+    args = sys.argv[1:]
+    jobs = 1
+    if '--jobs' in args:
+        index = args.index('--jobs')
+        jobs = int(args[index + 1])
+        del args[index:index + 2]
+    dedupe = '--dedupe' in args
+    if dedupe:
+        args.remove('--dedupe')
+    flatten = '--flatten' in args
+    if flatten:
+        args.remove('--flatten')
+    stats = '--stats' in args
+    if stats:
+        args.remove('--stats')
+    source_map = '--source-map' in args
+    if source_map:
+        args.remove('--source-map')
+    memory_budget = None
+    if '--memory-budget' in args:
+        index = args.index('--memory-budget')
+        memory_budget = int(args[index + 1]) * 1024 * 1024
+        del args[index:index + 2]
+    
+    main_file = args[0]
+    output_file = args[1] if len(args) > 1 else 'combined_openapi.json'
     
     # Get the base directory from the main file
     base_dir = Path(main_file).parent
@@ -151,8 +384,10 @@ def main():
     print("="*60)
     print(f"Base directory: {base_dir}\n")
     
-    resolver = OpenAPIResolver(base_dir)
-    resolver.combine_openapi(main_file, output_file)
+    resolver = OpenAPIResolver(base_dir, cache=default_cache(), memory_budget=memory_budget)
+    resolver.combine_openapi(main_file, output_file, jobs=jobs, dedupe=dedupe,
+                             stats_file=stats_path(output_file) if stats else None, flatten=flatten,
+                             source_map_file=source_map_path(output_file) if source_map else None)
     
     print("\n" + "="*60)
     print("DONE")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Lazy OpenAPI spec access
+Read-only view over an OpenAPI document that follows $ref references only when a node
+is accessed, so looking up one operation does not require combining the whole spec.
+
+    spec = open_spec('openapi.json')
+    operation = spec.paths['/payments'].post.resolve()
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from openapi_combiner import OpenAPICombiner, RefKey
+from spec_cache import ParseCache, default_cache
+from spec_walk import iter_refs
+
+
+class LazySpec:
+    def __init__(self, openapi_file: str, combiner: Optional[OpenAPICombiner] = None,
+                 cache: Optional[ParseCache] = None):
+        """
+        Open a spec for lazy access.
+
+        Args:
+            openapi_file: Path to the main OpenAPI JSON or YAML file
+            combiner: Combiner whose file, pointer and resolution caches are used
+                (default: a new one for the file's directory)
+            cache: Optional persistent parse cache, used when creating the combiner
+        """
+        self.path = Path(openapi_file).resolve()
+        self.combiner = combiner or OpenAPICombiner(str(self.path.parent), cache=cache)
+        # Wrapped reference targets, so every path to a target shares one node
+        self.targets: Dict[RefKey, Any] = {}
+
+        self.data = self.combiner.load_json_file(self.path)
+        if self.data is None:
+            raise ValueError(f"Could not load OpenAPI file: {openapi_file}")
+        self.root = self.wrap(self.data, self.path)
+
+    def follow(self, value: Any, file_path: Path) -> Tuple[Any, Path, Optional[RefKey]]:
+        """
+        Follow a chain of $ref nodes to the value they point at.
+
+        Returns:
+            The target value, the file it lives in, and the key of the last
+            reference followed (None if value was not a reference). Unresolvable
+            and cyclic references are returned unchanged.
+        """
+        key = None
+        seen = set()
+        while isinstance(value, dict) and '$ref' in value:
+            ref_key = self.combiner.ref_key(value['$ref'], file_path)
+            if ref_key in seen:
+                break
+            target = self.combiner.lookup_pointer(*ref_key)
+            if target is None:
+                break
+            seen.add(ref_key)
+            key = ref_key
+            value, file_path = target, Path(ref_key[0])
+        return value, file_path, key
+
+    def wrap(self, value: Any, file_path: Path) -> Any:
+        """Wrap a raw value from a file: containers become lazy nodes, scalars are returned as-is."""
+        value, file_path, key = self.follow(value, file_path)
+        if key is not None and key in self.targets:
+            return self.targets[key]
+        if isinstance(value, dict):
+            node = LazyObject(self, value, file_path)
+        elif isinstance(value, list):
+            node = LazyArray(self, value, file_path)
+        else:
+            return value
+        if key is not None:
+            self.targets[key] = node
+        return node
+
+    def resolve(self, data: Any, file_path: Path) -> Any:
+        """
+        Resolve every reference inside a raw value, like combine() would.
+
+        The reference cycles the value reaches are planned first, as combine()
+        plans them for the whole spec, so targets on a cycle become local
+        '#/components/schemas/<name>' refs (see recursive_schemas) instead of
+        being resolved, and cached, while still in progress.
+        """
+        combiner = self.combiner
+        # Resolved targets were planned when they were first reached
+        roots = [key for key in (combiner.ref_key(ref, file_path) for ref in iter_refs(data))
+                 if key not in combiner.resolved_refs]
+        if roots:
+            combiner.plan_recursive_components(self.data, self.path, roots)
+        return combiner.resolve_refs_recursive(data, file_path)
+
+    def recursive_schemas(self) -> Dict[str, Any]:
+        """The components/schemas entries the local refs of resolved nodes point at, by name."""
+        return {name: self.combiner.recursive_component(key)
+                for key, name in sorted(self.combiner.recursive_names.items(), key=lambda item: item[1])}
+
+
+class LazyNode:
+    """Base for lazily resolved containers."""
+    __slots__ = ('_spec', '_data', '_file', '_children')
+
+    def __init__(self, spec: LazySpec, data: Any, file_path: Path):
+        self._spec = spec
+        self._data = data
+        self._file = file_path
+        self._children: Dict[Any, Any] = {}
+
+    def __getitem__(self, key: Any) -> Any:
+        children = self._children
+        if key not in children:
+            children[key] = self._spec.wrap(self._data[key], self._file)
+        return children[key]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def resolve(self) -> Any:
+        """Return this node with every reference inside it resolved (see LazySpec.resolve)."""
+        return self._spec.resolve(self._data, self._file)
+
+    @property
+    def source(self) -> Tuple[Path, Any]:
+        """The file this node was read from and its raw (unresolved) content."""
+        return self._file, self._data
+
+
+class LazyObject(LazyNode):
+    """
+    Lazily resolved JSON object.
+
+    Members are available by item access and, for names that are valid
+    identifiers, by attribute access (spec.paths['/payments'].post). Mapping
+    methods such as get/items are deliberately absent, since those names are
+    common OpenAPI keys.
+    """
+    __slots__ = ()
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._data
+
+    def __repr__(self) -> str:
+        return f"<LazyObject {list(self._data)[:5]} from {self._file.name}>"
+
+
+class LazyArray(LazyNode):
+    """Lazily resolved JSON array."""
+    __slots__ = ()
+
+    def __iter__(self) -> Iterator[Any]:
+        return (self[index] for index in range(len(self._data)))
+
+    def __repr__(self) -> str:
+        return f"<LazyArray of {len(self._data)} from {self._file.name}>"
+
+
+def open_spec(openapi_file: str, cache: Optional[ParseCache] = None) -> LazyObject:
+    """Open an OpenAPI file and return its lazily resolved root object."""
+    return LazySpec(openapi_file, cache=cache).root
+
+
+def main():
+    """Print one fully resolved node, e.g. `lazy_spec.py openapi.json paths /payments post`."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Print a single fully resolved node of an OpenAPI spec without combining all of it'
+    )
+    parser.add_argument('input_file', help='Path to the main OpenAPI JSON or YAML file')
+    parser.add_argument('keys', nargs='*', help='Keys leading to the node, e.g. paths /payments post')
+    args = parser.parse_args()
+
+    try:
+        node: Any = open_spec(args.input_file, cache=default_cache())
+        for key in args.keys:
+            node = node[int(key)] if isinstance(node, LazyArray) else node[key]
+    except (KeyError, IndexError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    value = node.resolve() if isinstance(node, LazyNode) else node
+    print(json.dumps(value, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -4,42 +4,104 @@ OpenAPI Schema Combiner
 Resolves $ref references and combines OpenAPI specification files into a single document.
 """
 
+import contextlib
+import io
 import json
 import os
+import time
 from pathlib import Path
-from typing import Any, Dict, Set
+from typing import Any, Dict, Iterable, List, Optional, Set, TextIO, Tuple, Union
 from urllib.parse import urljoin, urlparse
 
+from spec_cache import MISSING, BoundedCache, DocumentStore, ParseCache, default_cache, is_yaml, resolved_size
+from spec_dedupe import dedupe_schemas, unique_component_name
+from spec_flatten import SchemaFlattener, flatten_schemas
+from spec_pointer import PointerError, compile_pointer, escape_pointer_token, step
+from spec_sourcemap import SourceMapBuilder, source_map_path
+from spec_stats import ResolutionStats, stats_path
+from spec_walk import Descend, Replace, find_cycles, iter_refs, prefetch_ref_graph, rebuild
+
+
+# Cache key for a resolved reference target: (absolute file path, normalized pointer)
+RefKey = Tuple[str, str]
+# Something that depends on a resolved target: another target, or an output
+# section identified by its JSON pointer in the combined document
+Dependent = Union[RefKey, str]
+
 
 class OpenAPICombiner:
-    def __init__(self, base_path: str):
+    def __init__(self, base_path: str, cache: Optional[ParseCache] = None,
+                 memory_budget: Optional[int] = None):
         """
         Initialize the combiner with a base path for resolving relative references.
         
         Args:
             base_path: Directory containing the main OpenAPI file
+            cache: Optional persistent parse cache for loading files
+            memory_budget: Optional limit, in bytes, on the estimated memory
+                held by loaded files and by resolved targets (half each).
+                Least recently used entries are evicted and transparently
+                reloaded or re-resolved when needed again, which trades
+                speed for memory; pair it with a parse cache so reloads are
+                cheap. Default: no limit
         """
         self.base_path = Path(base_path).resolve()
-        self.loaded_files: Dict[str, Any] = {}
-        self.processed_refs: Set[str] = set()
+        self.cache = cache
+        self.memory_budget = memory_budget
+        # Parsed files with their pointer indexes, each file parsed once
+        self.documents = DocumentStore(cache, None if memory_budget is None else memory_budget // 2,
+                                       on_load=self.record_load)
+        self.loaded_files = self.documents.files
+        # Memoized resolution results, shared by every use site of a target.
+        # A value of None records a target that could not be resolved.
+        self.resolved_refs: Union[Dict[RefKey, Any], BoundedCache]
+        if memory_budget is None:
+            self.resolved_refs = {}
+        else:
+            self.resolved_refs = BoundedCache(memory_budget // 2, resolved_size)
+        # Targets currently being resolved; a hit here means a reference cycle
+        self.resolving: Set[RefKey] = set()
+        # Targets on reference cycles -> the components/schemas name they are
+        # emitted under; references to them become local refs
+        self.recursive_names: Dict[RefKey, str] = {}
+        # Merges sibling $refs during resolution and allOf compositions after
+        # it, when the combined spec is flattened
+        self.flattener: Optional[SchemaFlattener] = None
+        # Collects where output nodes came from, when a source map was requested
+        self.source_map: Optional[SourceMapBuilder] = None
         
-    def load_json_file(self, file_path: Path) -> Any:
-        """Load a JSON file and cache it."""
-        file_path = file_path.resolve()
-        file_key = str(file_path)
+        # Reverse dependency graph for incremental re-combines: which targets
+        # and output sections use each target, and which targets each file holds
+        self.dependents: Dict[RefKey, Set[Dependent]] = {}
+        self.file_targets: Dict[str, Set[RefKey]] = {}
+        # Output section pointer -> key path, and the stack of what is being resolved
+        self.sections: Dict[str, Tuple[str, ...]] = {}
+        self.owners: List[Dependent] = []
         
-        if file_key not in self.loaded_files:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    self.loaded_files[file_key] = json.load(f)
-            except FileNotFoundError:
+        # State of the last in-memory combine, patched by recombine()
+        self.spec_path: Optional[Path] = None
+        self.combined: Optional[Dict[str, Any]] = None
+        # Profiling for the current combine, when a stats report was requested
+        self.stats: Optional[ResolutionStats] = None
+        
+    def load_json_file(self, file_path: Path, warn: bool = True) -> Any:
+        """Load a JSON or YAML file and cache it; warn=False suppresses load warnings."""
+        file_path = file_path.resolve()
+        try:
+            return self.documents.load(file_path)
+        except FileNotFoundError:
+            if warn:
                 print(f"Warning: File not found: {file_path}")
-                return None
-            except json.JSONDecodeError as e:
-                print(f"Warning: Invalid JSON in {file_path}: {e}")
-                return None
-                
-        return self.loaded_files[file_key]
+        except ValueError as e:
+            if warn:
+                print(f"Warning: Invalid {'YAML' if is_yaml(file_path) else 'JSON'} in {file_path}: {e}")
+        return None
+    
+    def record_load(self, file_key: str, seconds: float) -> None:
+        """DocumentStore callback: record a file's parse time when collecting stats."""
+        if self.stats is not None:
+            self.stats.record_load(os.path.relpath(file_key, self.base_path), seconds,
+                                   os.path.getsize(file_key))
     
     def resolve_json_pointer(self, data: Any, pointer: str) -> Any:
         """
@@ -52,66 +114,59 @@ class OpenAPICombiner:
         Returns:
             The referenced data
         """
-        if not pointer or pointer == '#':
-            return data
-            
-        # Remove leading '#/' or '#'
-        pointer = pointer.lstrip('#').lstrip('/')
-        
-        if not pointer:
-            return data
-            
-        # Split by '/' and navigate the structure
-        parts = pointer.split('/')
+        tokens, _ = compile_pointer(pointer)
         current = data
+        try:
+            for token in tokens:
+                current = step(current, token)
+        except PointerError as e:
+            print(f"Warning: {e}")
+            return None
+        return current
+    
+    def lookup_pointer(self, file_key: str, pointer: str, warn: bool = True) -> Any:
+        """
+        Resolve a JSON pointer in a loaded file through the file's pointer index.
         
-        for part in parts:
-            # Unescape JSON pointer tokens
-            part = part.replace('~1', '/').replace('~0', '~')
+        Args:
+            file_key: Absolute path of the file
+            pointer: JSON pointer string (starting with #)
+            warn: Print a warning when the file or pointer is invalid
             
-            if isinstance(current, dict):
-                if part not in current:
-                    print(f"Warning: Pointer part '{part}' not found in data")
-                    return None
-                current = current[part]
-            elif isinstance(current, list):
-                try:
-                    index = int(part)
-                    current = current[index]
-                except (ValueError, IndexError):
-                    print(f"Warning: Invalid array index '{part}'")
-                    return None
-            else:
-                print(f"Warning: Cannot navigate further at '{part}'")
-                return None
-                
-        return current
+        Returns:
+            The referenced data, or None if the file or pointer is invalid
+        """
+        if file_key not in self.documents.indexes and self.load_json_file(Path(file_key), warn) is None:
+            return None
+        try:
+            return self.documents.lookup(file_key, pointer)
+        except PointerError as e:
+            if warn:
+                print(f"Warning: {e}")
+            return None
     
-    def resolve_ref(self, ref: str, current_file_path: Path) -> Any:
+    @staticmethod
+    def normalize_pointer(pointer: str) -> str:
+        """Normalize '', '#' and '#/' to '#', and 'a/b' or '#a/b' to '#/a/b'."""
+        pointer = pointer.lstrip('#').lstrip('/')
+        return '#/' + pointer if pointer else '#'
+
+    def ref_key(self, ref: str, current_file_path: Path) -> RefKey:
         """
-        Resolve a $ref reference.
+        Build the cache key for a $ref as seen from a given file.
         
         Args:
-            ref: The reference string (e.g., './schemas/application/applicationPaths.json#/application')
+            ref: The reference string
             current_file_path: Path of the file containing this reference
             
         Returns:
-            The resolved content
+            The (absolute file path, normalized JSON pointer) pair
         """
-        # Skip already processed refs to avoid infinite loops
-        ref_key = f"{current_file_path}::{ref}"
-        if ref_key in self.processed_refs:
-            return {"$ref": ref}  # Return original ref if already processed
-        
-        self.processed_refs.add(ref_key)
-        
         # Split reference into file path and JSON pointer
         if '#' in ref:
             file_ref, pointer = ref.split('#', 1)
-            pointer = '#' + pointer
         else:
-            file_ref = ref
-            pointer = '#'
+            file_ref, pointer = ref, ''
         
         # Resolve file path
         if file_ref:
@@ -119,86 +174,890 @@ class OpenAPICombiner:
             ref_file_path = (current_file_path.parent / file_ref).resolve()
         else:
             # Same file reference
-            ref_file_path = current_file_path
+            ref_file_path = current_file_path.resolve()
+        
+        return str(ref_file_path), self.normalize_pointer(pointer)
+    
+    def note_target(self, key: RefKey, value: Any) -> None:
+        """Register a resolved target's origin with the source map being built, if any."""
+        if self.source_map is not None:
+            self.source_map.add_target(value, (os.path.relpath(key[0], self.base_path), key[1]))
+    
+    def target_label(self, key: RefKey) -> str:
+        """Readable name of a target for reports: path relative to the base path plus pointer."""
+        file_key, pointer = key
+        return os.path.relpath(file_key, self.base_path) + pointer
+    
+    def prefetch(self, openapi_path: Path, max_workers: Optional[int] = None) -> int:
+        """
+        Load every file reachable from the main OpenAPI file before resolution.
+        
+        Args:
+            openapi_path: Path to the main OpenAPI file
+            max_workers: Number of loader threads
+            
+        Returns:
+            Number of files reached
+        """
+        def ref_file(file_ref: str, current_file_path: Path) -> Path:
+            return (current_file_path.parent / file_ref).resolve()
+        
+        return len(prefetch_ref_graph(openapi_path, self.load_json_file, ref_file, max_workers))
+    
+    def plan_recursive_components(self, spec: Any, spec_path: Path,
+                                  roots: Optional[List[RefKey]] = None) -> Dict[RefKey, str]:
+        """
+        Find the reference targets that lie on cycles and name their components.
+        
+        A target on a cycle cannot be inlined, so every reference to it is
+        emitted as a local '#/components/schemas/<name>' reference and its
+        resolved body is added once under that name. Deciding this from the
+        reference graph up front, rather than when resolution runs into a
+        target that is in progress, keeps the output independent of the order
+        in which sections are resolved.
+        
+        A target that is already a components/schemas entry of the main file,
+        directly or as a plain $ref, keeps that entry's name. Other targets are
+        named after their last pointer token (or file name), with a hash
+        suffix on collisions.
+        
+        Args:
+            spec: The loaded main OpenAPI document
+            spec_path: Path of the main OpenAPI file
+            roots: Only plan the targets these references reach, keeping the
+                names planned before (default: plan the whole spec afresh)
+            
+        Returns:
+            The component name of every recursive target (also stored in
+            self.recursive_names)
+        """
+        def successors(key: RefKey) -> List[RefKey]:
+            target = self.lookup_pointer(*key, warn=False)
+            if target is None:
+                return []
+            file_path = Path(key[0])
+            return [self.ref_key(ref, file_path) for ref in iter_refs(target)]
+        
+        if roots is None:
+            roots = [self.ref_key(ref, spec_path) for ref in iter_refs(spec)]
+            names: Dict[RefKey, str] = {}
+        else:
+            names = dict(self.recursive_names)
+        cyclic = find_cycles(roots, successors) - set(names)
+        taken: Set[str] = set(names.values())
+        
+        components = spec.get('components') if isinstance(spec, dict) else None
+        schemas = components.get('schemas') if isinstance(components, dict) else None
+        if cyclic and isinstance(schemas, dict):
+            taken.update(schemas)
+            for name, schema in schemas.items():
+                local_key = (str(spec_path), f"#/components/schemas/{escape_pointer_token(name)}")
+                if local_key in cyclic:
+                    names[local_key] = name
+                elif isinstance(schema, dict) and isinstance(schema.get('$ref'), str):
+                    key = self.ref_key(schema['$ref'], spec_path)
+                    if key in cyclic and key not in names:
+                        names[key] = name
+        
+        for key in sorted(cyclic - set(names)):
+            file_key, pointer = key
+            tokens, _ = compile_pointer(pointer)
+            base = tokens[-1] if tokens else Path(file_key).stem
+            origin = os.path.relpath(file_key, self.base_path) + pointer
+            names[key] = unique_component_name(base, taken, origin)
         
-        # Load the referenced file
-        ref_data = self.load_json_file(ref_file_path)
-        if ref_data is None:
-            return {"$ref": ref}  # Keep original if file not found
+        self.recursive_names = names
+        return names
+    
+    def recursive_component(self, key: RefKey) -> Optional[Any]:
+        """The resolved body of a recursive target, or None if it cannot be loaded."""
+        body = self.resolved_refs.get(key, MISSING)
+        if body is MISSING:
+            file_key, pointer = key
+            target = self.lookup_pointer(file_key, pointer)
+            body = None
+            if target is not None:
+                self.file_targets.setdefault(file_key, set()).add(key)
+                self.owners.append(key)
+                try:
+                    body = self.resolve_refs_recursive(target, Path(file_key))
+                finally:
+                    self.owners.pop()
+                self.note_target(key, body)
+            self.resolved_refs[key] = body
+        return body
+    
+    def with_recursive_components(self, components: Any) -> Dict[str, Any]:
+        """
+        Copy a resolved components object with the recursive targets added to its schemas.
+        
+        Existing entries keep their position; new ones are appended in name order.
+        """
+        components = dict(components) if isinstance(components, dict) else {}
+        schemas = components.get('schemas')
+        schemas = components['schemas'] = dict(schemas) if isinstance(schemas, dict) else {}
+        for key, name in sorted(self.recursive_names.items(), key=lambda item: item[1]):
+            body = self.recursive_component(key)
+            if body is not None:
+                schemas[name] = body
+                if self.source_map is not None:
+                    self.source_map.add(f"/components/schemas/{escape_pointer_token(name)}", body)
+        return components
+    
+    def resolve_ref(self, ref: str, current_file_path: Path) -> Optional[Any]:
+        """
+        Resolve a $ref reference.
+        
+        Each (file, pointer) target is resolved once; later references to the
+        same target return the same resolved object.
+        
+        Args:
+            ref: The reference string (e.g., './schemas/application/applicationPaths.json#/application')
+            current_file_path: Path of the file containing this reference
+            
+        Returns:
+            The resolved content, or None if the reference could not be
+            resolved (missing file, invalid pointer or reference cycle)
+        """
+        node = {'$ref': ref}
+        resolved = self.resolve_refs_recursive(node, current_file_path)
+        return None if resolved is node else resolved
+    
+    def substitute_ref(self, node: Dict[str, Any], current_file_path: Path) -> Union[Replace, Descend]:
+        """
+        Decide what replaces a $ref node during traversal.
+        
+        Recursive targets become local component references, and cached
+        targets (and unresolvable ones) are substituted directly. A new target
+        is marked in progress and traversed in its own file; its result is
+        cached once the traversal of the target finishes.
+        
+        Args:
+            node: A dict containing a '$ref' key
+            current_file_path: Path of the file containing the node
+            
+        Returns:
+            The traversal instruction for the node
+        """
+        if self.flattener is not None and len(node) > 1:
+            # Resolve the target and the sibling keywords, then merge them
+            siblings = {key: value for key, value in node.items() if key != '$ref'}
+            
+            def merge(results: List[Any]) -> Any:
+                target, resolved_siblings = results
+                if not isinstance(target, dict):
+                    return target
+                return self.flattener.merge_ref(target, resolved_siblings)
+            
+            return Descend([({'$ref': node['$ref']}, current_file_path), (siblings, current_file_path)], merge)
+        
+        key = self.ref_key(node['$ref'], current_file_path)
+        resolved = self.resolved_refs.get(key, MISSING)
+        if self.stats is not None:
+            self.stats.record_reference(self.target_label(key), resolved is not MISSING)
+        if self.owners:
+            self.dependents.setdefault(key, set()).add(self.owners[-1])
+        name = self.recursive_names.get(key)
+        if name is not None:
+            self.file_targets.setdefault(key[0], set()).add(key)
+            return Replace({'$ref': f"#/components/schemas/{escape_pointer_token(name)}"})
+        if resolved is not MISSING:
+            return Replace(node if resolved is None else resolved)
         
-        # Resolve the JSON pointer
-        resolved = self.resolve_json_pointer(ref_data, pointer)
-        if resolved is None:
-            return {"$ref": ref}  # Keep original if pointer invalid
+        # Leave the ref in place if it points back at a target being resolved
+        # (only possible for cycles not planned by plan_recursive_components)
+        if key in self.resolving:
+            return Replace(node)
         
-        # Recursively resolve any nested $refs
-        return self.resolve_refs_recursive(resolved, ref_file_path)
+        file_key, pointer = key
+        ref_file_path = Path(file_key)
+        self.file_targets.setdefault(file_key, set()).add(key)
+        
+        # Load the referenced file and resolve the JSON pointer
+        target = self.lookup_pointer(file_key, pointer)
+        if target is None:
+            self.resolved_refs[key] = None
+            return Replace(node)
+        
+        self.resolving.add(key)
+        self.owners.append(key)
+        
+        def finish(results: List[Any]) -> Any:
+            self.owners.pop()
+            self.resolving.discard(key)
+            self.resolved_refs[key] = results[0]
+            self.note_target(key, results[0])
+            return results[0]
+        
+        return Descend([(target, ref_file_path)], finish)
     
     def resolve_refs_recursive(self, data: Any, current_file_path: Path) -> Any:
         """
-        Recursively resolve all $ref references in a data structure.
+        Resolve all $ref references in a data structure.
+        
+        The traversal uses an explicit work stack, so arbitrarily deep
+        documents and long reference chains do not hit the recursion limit.
         
         Args:
             data: The data to process
             current_file_path: Path of the file containing this data
             
         Returns:
-            Data with all references resolved
-        """
-        if isinstance(data, dict):
-            if '$ref' in data:
-                # This is a reference - resolve it
-                ref = data['$ref']
-                resolved = self.resolve_ref(ref, current_file_path)
-                
-                # If the ref resolved to something other than itself, use it
-                if resolved != {"$ref": ref}:
-                    return resolved
-                return data
+            Data with all references resolved; unresolvable references are kept as-is
+        """
+        depth = len(self.owners)
+        try:
+            return rebuild(data, current_file_path, self.substitute_ref)
+        except BaseException:
+            # Drop the in-progress state of targets abandoned mid-traversal
+            for key in self.owners[depth:]:
+                self.resolving.discard(key)
+            del self.owners[depth:]
+            raise
+    
+    def plan_stream_releases(self, sections: List[Tuple[Tuple[str, ...], Any]],
+                             spec_path: Path) -> Dict[Tuple[str, ...], List[str]]:
+        """
+        Plan when streaming can drop each referenced file.
+        
+        Every file is parsed once here for the files its refs point to, and
+        dropped again, so the plan never holds all documents at once. A
+        section needs a file if its refs reach the file through any chain of
+        refs; refs into the main file are followed target by target, since
+        the main file is never dropped. Files holding recursive targets are
+        kept for the components written last.
+        
+        Args:
+            sections: (section key path, unresolved value) pairs in write order
+            spec_path: Path of the main OpenAPI file
+            
+        Returns:
+            Section key path -> files that no later section needs
+        """
+        main_key = str(spec_path)
+        file_refs: Dict[str, List[Any]] = {}
+        
+        def node(ref: str, file_path: Path) -> Any:
+            key = self.ref_key(ref, file_path)
+            return key if key[0] == main_key else key[0]
+        
+        def successors(current: Any) -> List[Any]:
+            if not isinstance(current, str):
+                target = self.lookup_pointer(*current, warn=False)
+                return [node(ref, spec_path) for ref in iter_refs(target)] if target is not None else []
+            if current not in file_refs:
+                document = self.load_json_file(Path(current), warn=False)
+                file_path = Path(current)
+                file_refs[current] = [node(ref, file_path) for ref in iter_refs(document)] if document is not None else []
+                self.documents.discard(current)
+            return file_refs[current]
+        
+        # Walking sections last to first, the first section to reach a file
+        # is the last one needing it, and so is it for everything the file reaches
+        last_use: Dict[Any, int] = {}
+        for index in range(len(sections) - 1, -1, -1):
+            stack = [node(ref, spec_path) for ref in iter_refs(sections[index][1])]
+            while stack:
+                current = stack.pop()
+                if current not in last_use:
+                    last_use[current] = index
+                    stack.extend(successors(current))
+        
+        kept = {key[0] for key in self.recursive_names}
+        releases: Dict[Tuple[str, ...], List[str]] = {}
+        for current, index in last_use.items():
+            if isinstance(current, str) and current not in kept:
+                releases.setdefault(sections[index][0], []).append(current)
+        return releases
+    
+    def release_file(self, file_key: str) -> None:
+        """Drop a file's parsed document and every target resolved from it."""
+        self.documents.discard(file_key)
+        for key in self.file_targets.pop(file_key, ()):
+            self.resolved_refs.pop(key, None)
+            self.dependents.pop(key, None)
+    
+    def write_streaming(self, spec: Dict[str, Any], spec_path: Path, f: TextIO,
+                        minify: bool = False) -> None:
+        """
+        Serialize a spec to an open file while resolving it.
+        
+        Top-level members are written one at a time, and top-level objects such
+        as 'paths' and 'components' are written entry by entry, so only one
+        resolved path item is ever held for output. Referenced files and the
+        targets resolved from them are dropped once no later entry needs them
+        (see plan_stream_releases), unless a stats report or source map needs
+        every target. The bytes written match json.dump() of the fully
+        resolved spec with indent=2, or with compact separators when minified.
+        
+        Args:
+            spec: The loaded (unresolved) OpenAPI document
+            spec_path: Path of the file the spec was loaded from
+            f: Text file to write to
+            minify: Write compact JSON instead of 2-space indented JSON
+        """
+        indent = None if minify else 2
+        item_sep, key_sep = (',', ':') if minify else (',', ': ')
+        
+        def newline(level: int) -> str:
+            return '' if minify else '\n' + ' ' * (indent * level)
+        
+        def write_value(value: Any, level: int) -> None:
+            text = json.dumps(value, indent=indent, separators=(item_sep, key_sep))
+            if not minify:
+                text = text.replace('\n', newline(level))
+            f.write(text)
+        
+        def write_object(items, level: int, write_member) -> None:
+            f.write('{')
+            first = True
+            for key, value in items:
+                f.write(('' if first else item_sep) + newline(level + 1) + json.dumps(key) + key_sep)
+                write_member(key, value, level + 1)
+                first = False
+            if not first:
+                f.write(newline(level))
+            f.write('}')
+        
+        def write_entries(value: Any, level: int) -> None:
+            # Dump resolved objects one member at a time, so no single string
+            # holds a whole section such as components/schemas
+            if type(value) is dict and value:
+                write_object(value.items(), level, lambda _, entry, lvl: write_value(entry, lvl))
             else:
-                # Process all values in the dictionary
-                return {key: self.resolve_refs_recursive(value, current_file_path) 
-                       for key, value in data.items()}
+                write_value(value, level)
+        
+        releases: Dict[Tuple[str, ...], List[str]] = {}
+        if self.is_split_section(spec) and self.stats is None and self.source_map is None:
+            sections: List[Tuple[Tuple[str, ...], Any]] = []
+            for key, value in spec.items():
+                if self.is_split_section(value) and not (key == 'components' and self.recursive_names):
+                    sections.extend(((key, sub), entry) for sub, entry in value.items())
+                else:
+                    sections.append(((key,), value))
+            releases = self.plan_stream_releases(sections, spec_path)
         
-        elif isinstance(data, list):
-            # Process all items in the list
-            return [self.resolve_refs_recursive(item, current_file_path) 
-                   for item in data]
+        def release(section: Tuple[str, ...]) -> None:
+            for file_key in releases.pop(section, ()):
+                self.release_file(file_key)
         
+        def write_section(section: Tuple[str, ...], value: Any, level: int) -> None:
+            write_entries(self.resolve_section(section, value, spec_path), level)
+            release(section)
+        
+        def write_top_level(key: str, value: Any, level: int) -> None:
+            if key == 'components' and self.recursive_names:
+                # Recursive targets are added to the schemas, so resolve the section first
+                if self.is_split_section(value):
+                    value = {sub: self.resolve_section((key, sub), entry, spec_path)
+                             for sub, entry in value.items()}
+                else:
+                    value = self.resolve_section((key,), value, spec_path)
+                value = self.with_recursive_components(value)
+                if type(value) is dict and value:
+                    write_object(value.items(), level, lambda _, entry, lvl: write_entries(entry, lvl))
+                else:
+                    write_value(value, level)
+                release((key,))
+            # Stream plain objects entry by entry; anything else is resolved whole
+            elif self.is_split_section(value):
+                write_object(value.items(), level, lambda sub, entry, lvl: write_section((key, sub), entry, lvl))
+            else:
+                write_value(self.resolve_section((key,), value, spec_path), level)
+                release((key,))
+        
+        if self.is_split_section(spec):
+            items = list(spec.items())
+            if self.recursive_names and 'components' not in spec:
+                items.append(('components', {}))
+            write_object(items, 0, write_top_level)
         else:
-            # Primitive value - return as is
-            return data
+            write_value(self.add_recursive_components(self.resolve_section((), spec, spec_path)), 0)
+    
+    @staticmethod
+    def is_split_section(value: Any) -> bool:
+        """Whether an object is resolved entry by entry rather than as a whole."""
+        return isinstance(value, dict) and bool(value) and '$ref' not in value
+    
+    def resolve_section(self, section: Tuple[str, ...], value: Any, spec_path: Path) -> Any:
+        """
+        Resolve one section of the output document.
+        
+        Sections are the top-level members of the spec, or the entries of
+        top-level objects (e.g. each path item). Every target used while
+        resolving a section records the section as a dependent.
+        
+        Args:
+            section: Key path of the section in the spec
+            value: The unresolved section content
+            spec_path: Path of the main OpenAPI file
+            
+        Returns:
+            The resolved section
+        """
+        pointer = ''.join('/' + escape_pointer_token(key) for key in section)
+        self.sections[pointer] = section
+        self.owners.append(pointer)
+        try:
+            resolved = self.resolve_refs_recursive(value, spec_path)
+        finally:
+            self.owners.pop()
+        if self.source_map is not None:
+            self.source_map.add(pointer, resolved)
+        return resolved
+    
+    def add_recursive_components(self, combined: Any) -> Any:
+        """Add the recursive targets to a resolved spec's components/schemas."""
+        if self.recursive_names and isinstance(combined, dict):
+            combined['components'] = self.with_recursive_components(combined.get('components'))
+        return combined
+    
+    def resolve_spec(self, spec: Any, spec_path: Path) -> Any:
+        """
+        Resolve a whole spec section by section, adding the recursive targets
+        found by plan_recursive_components to components/schemas.
+        """
+        if not self.is_split_section(spec):
+            return self.add_recursive_components(self.resolve_section((), spec, spec_path))
+        combined = {}
+        for key, value in spec.items():
+            if self.is_split_section(value):
+                combined[key] = {sub: self.resolve_section((key, sub), entry, spec_path)
+                                 for sub, entry in value.items()}
+            else:
+                combined[key] = self.resolve_section((key,), value, spec_path)
+        return self.add_recursive_components(combined)
+    
+    def reset(self) -> None:
+        """Drop every loaded file, resolved target and dependency record."""
+        self.documents.clear()
+        self.resolved_refs.clear()
+        self.recursive_names = {}
+        self.dependents.clear()
+        self.file_targets.clear()
+        self.sections.clear()
+    
+    def invalidate_file(self, file_path: Path) -> Set[str]:
+        """
+        Forget a changed file and everything resolved from it.
+        
+        Args:
+            file_path: The file that changed
+            
+        Returns:
+            JSON pointers of the output sections that must be re-resolved
+        """
+        file_key = str(Path(file_path).resolve())
+        self.documents.discard(file_key)
+        
+        affected: Set[str] = set()
+        seen: Set[Dependent] = set()
+        stack: List[Dependent] = list(self.file_targets.pop(file_key, ()))
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            if isinstance(node, str):
+                affected.add(node)
+            else:
+                self.resolved_refs.pop(node, None)
+                stack.extend(self.dependents.pop(node, ()))
+        return affected
+    
+    def recombine(self, changed_files: Iterable[Path]) -> int:
+        """
+        Patch the last combined spec after some source files changed.
+        
+        Only output sections that depend on the changed files are re-resolved.
+        A change to the main OpenAPI file, or one that changes which targets
+        are recursive, re-resolves everything.
+        
+        Args:
+            changed_files: Files that were modified, added or removed
+            
+        Returns:
+            Number of output sections re-resolved
+        """
+        if self.combined is None or self.spec_path is None:
+            raise ValueError("recombine() requires a previous in-memory combine()")
+        
+        changed_keys = {str(Path(file_path).resolve()) for file_path in changed_files}
+        rebuild_all = str(self.spec_path) in changed_keys
+        affected: Set[str] = set()
+        if not rebuild_all:
+            for file_key in changed_keys:
+                affected |= self.invalidate_file(Path(file_key))
+            spec = self.load_json_file(self.spec_path)
+            previous = self.recursive_names
+            rebuild_all = self.plan_recursive_components(spec, self.spec_path) != previous
+        
+        if rebuild_all:
+            self.reset()
+            spec = self.load_json_file(self.spec_path)
+            if spec is None:
+                raise ValueError(f"Could not load OpenAPI file: {self.spec_path}")
+            self.plan_recursive_components(spec, self.spec_path)
+            self.combined = self.resolve_spec(spec, self.spec_path)
+            return len(self.sections)
+        
+        for pointer in affected:
+            section = self.sections[pointer]
+            value = spec
+            for key in section:
+                value = value[key]
+            resolved = self.resolve_section(section, value, self.spec_path)
+            if not section:
+                self.combined = resolved
+                continue
+            target = self.combined
+            for key in section[:-1]:
+                target = target[key]
+            target[section[-1]] = resolved
+        self.combined = self.add_recursive_components(self.combined)
+        return len(affected)
+    
+    def watched_files(self) -> Dict[str, Optional[int]]:
+        """Modification times of every file the last combine read or tried to read."""
+        mtimes: Dict[str, Optional[int]] = {}
+        for file_key in set(self.loaded_files) | set(self.file_targets) | {str(self.spec_path)}:
+            try:
+                mtimes[file_key] = os.stat(file_key).st_mtime_ns
+            except OSError:
+                mtimes[file_key] = None
+        return mtimes
+    
+    def watch(self, openapi_file: str, output_file: str, minify: bool = False,
+              interval: float = 1.0, dedupe: bool = False, flatten: bool = False) -> None:
+        """
+        Combine once, then re-combine incrementally whenever a source file changes.
+        
+        Files are polled every interval seconds; stop with Ctrl-C. A run that
+        fails, e.g. on a half-written save, is reported and the last good
+        output is kept; the next change retries with a full re-combine.
+        
+        Args:
+            openapi_file: Path to the main OpenAPI JSON or YAML file
+            output_file: Path to save the combined spec
+            minify: Write compact JSON instead of 2-space indented JSON
+            interval: Polling interval in seconds
+            dedupe: Deduplicate repeated schemas in the written output
+            flatten: Merge allOf compositions and sibling $refs in the written
+                output
+        """
+        # Watched even when the first combine fails before loading it
+        self.spec_path = Path(openapi_file).resolve()
+        failed = False
+        try:
+            self.combine(openapi_file, output_file, minify=minify, dedupe=dedupe, flatten=flatten)
+        except Exception as e:
+            print(f"Error: {e}")
+            failed = True
+        mtimes = self.watched_files()
+        print(f"Watching {len(mtimes)} files for changes (Ctrl-C to stop)...")
+        try:
+            while True:
+                time.sleep(interval)
+                current = self.watched_files()
+                changed = [Path(key) for key in current if current[key] != mtimes.get(key)]
+                if changed:
+                    start = time.perf_counter()
+                    try:
+                        if self.combined is None:
+                            # No good combine to patch yet
+                            self.reset()
+                            self.combine(openapi_file, output_file, minify=minify, dedupe=dedupe, flatten=flatten)
+                            updated = len(self.sections)
+                        else:
+                            if self.flattener is not None:
+                                # Memos are keyed by object identity; drop the previous run's
+                                self.flattener.clear()
+                            # A failed run may have left dependency records half updated
+                            updated = self.recombine(changed + [self.spec_path] if failed else changed)
+                            output = self.combined
+                            if flatten:
+                                output = flatten_schemas(output, self.flattener)[0]
+                            if dedupe:
+                                output = dedupe_schemas(output)[0]
+                            self.write_json(output, output_file, minify)
+                        failed = False
+                    except Exception as e:
+                        print(f"Error: {e}")
+                        print("Kept the last good output; retrying on the next change")
+                        failed = True
+                    else:
+                        elapsed = time.perf_counter() - start
+                        print(f"{len(changed)} file(s) changed, {updated} section(s) updated in {elapsed:.3f}s")
+                    current = self.watched_files()
+                mtimes = current
+        except KeyboardInterrupt:
+            print("Stopped watching.")
     
-    def combine(self, openapi_file: str, output_file: str = None) -> Dict[str, Any]:
+    @staticmethod
+    def write_json(combined: Any, output_file: str, minify: bool = False) -> None:
+        """Write a combined spec as indented or compact JSON."""
+        with open(output_file, 'w', encoding='utf-8') as f:
+            if minify:
+                json.dump(combined, f, separators=(',', ':'))
+            else:
+                json.dump(combined, f, indent=2)
+    
+    def write_source_map(self, map_file: str, output_file: Optional[str]) -> None:
+        """Write the source map for the finished combine and stop collecting."""
+        source_map = self.source_map.build()
+        source_map.write(map_file, output_file and os.path.basename(output_file))
+        self.source_map = None
+        print(f"Source map with {len(source_map):,} segments written to {map_file}")
+    
+    def write_stats(self, stats_file: str) -> None:
+        """Write the profiling report for the finished combine and stop collecting."""
+        resolved = {self.target_label(key): value for key, value in self.resolved_refs.items()}
+        caches = None
+        if self.memory_budget is not None:
+            caches = {'loaded_files': self.loaded_files.summary(), 'resolved_refs': self.resolved_refs.summary()}
+        self.stats.write(stats_file, resolved, caches)
+        self.stats = None
+        print(f"Resolution stats written to {stats_file}")
+    
+    def combine(self, openapi_file: str, output_file: str = None, stream: bool = False,
+                minify: bool = False, jobs: int = 1, dedupe: bool = False, flatten: bool = False,
+                stats_file: Optional[str] = None, source_map_file: Optional[str] = None
+                ) -> Optional[Dict[str, Any]]:
         """
         Combine an OpenAPI specification with all its references.
         
         Args:
-            openapi_file: Path to the main OpenAPI JSON file
+            openapi_file: Path to the main OpenAPI JSON or YAML file
             output_file: Optional path to save the combined spec
+            stream: Write the output while resolving instead of building the
+                combined spec in memory first (requires output_file)
+            minify: Write compact JSON instead of 2-space indented JSON
+            jobs: When greater than 1, load all referenced files up front on
+                this many threads before resolving
+            dedupe: Emit repeated schemas once under components/schemas and
+                reference them locally instead of inlining every use
+            flatten: Merge every allOf composition, and every $ref with
+                sibling keywords, into a single effective schema (see
+                spec_flatten); each shared composition is merged once
+            stats_file: Write a JSON profiling report (load times, reference
+                counts, cache hit rates, largest subtrees, peak memory) here
+            source_map_file: Write a source map (see spec_sourcemap) from
+                output JSON pointers to the file and pointer each inlined
+                node came from here
             
         Returns:
-            The combined OpenAPI specification
+            The combined OpenAPI specification, or None when streaming
         """
         openapi_path = Path(openapi_file).resolve()
+        if source_map_file:
+            if dedupe or flatten:
+                raise ValueError("Source maps describe the inlined output and cannot be combined "
+                                 "with deduplication or flattening")
+            if self.memory_budget is not None:
+                raise ValueError("Source maps need every resolved target in memory and cannot be "
+                                 "combined with a memory budget")
+            self.source_map = SourceMapBuilder((os.path.relpath(openapi_path, self.base_path), '#'))
+        if stats_file:
+            self.stats = ResolutionStats(parse_cache=self.cache)
         
-        # Load the main OpenAPI file
-        spec = self.load_json_file(openapi_path)
-        if spec is None:
-            raise ValueError(f"Could not load OpenAPI file: {openapi_file}")
+        try:
+            # Load the main OpenAPI file
+            spec = self.load_json_file(openapi_path)
+            if spec is None:
+                raise ValueError(f"Could not load OpenAPI file: {openapi_file}")
         
-        # Resolve all references
-        print("Resolving references...")
-        combined = self.resolve_refs_recursive(spec, openapi_path)
+            if jobs > 1:
+                print(f"Prefetching referenced files with {jobs} workers...")
+                self.prefetch(openapi_path, max_workers=jobs)
         
-        # Save to file if requested
-        if output_file:
-            print(f"Writing combined specification to {output_file}...")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(combined, f, indent=2)
-            print("Done!")
+            self.spec_path = openapi_path
+            self.plan_recursive_components(spec, openapi_path)
+            self.flattener = SchemaFlattener() if flatten else None
+            if stream:
+                if not output_file:
+                    raise ValueError("Streaming output requires an output file")
+                if dedupe:
+                    raise ValueError("Deduplication needs the whole spec and cannot be streamed")
+                if flatten:
+                    raise ValueError("Flattening needs the whole spec and cannot be streamed")
+                print(f"Resolving references and streaming to {output_file}...")
+                self.combined = None
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    self.write_streaming(spec, openapi_path, f, minify=minify)
+                print("Done!")
+                if source_map_file:
+                    self.write_source_map(source_map_file, output_file)
+                if stats_file:
+                    self.write_stats(stats_file)
+                return None
         
-        return combined
+            # Resolve all references
+            print("Resolving references...")
+            combined = self.resolve_spec(spec, openapi_path)
+            self.combined = combined
+        
+            if flatten:
+                combined, stats = flatten_schemas(combined, self.flattener)
+                print(f"Flattened schemas: {stats['allof_merged']} allOf compositions and "
+                      f"{stats['sibling_refs_merged']} sibling $refs merged, {stats['conflicts']} conflicting "
+                      f"compositions kept")
+        
+            if dedupe:
+                combined, stats = dedupe_schemas(combined)
+                print(f"Deduplicated schemas: {stats['components_added']} components added, "
+                      f"{stats['refs_emitted']} local references")
+        
+            # Save to file if requested
+            if output_file:
+                print(f"Writing combined specification to {output_file}...")
+                self.write_json(combined, output_file, minify)
+                print("Done!")
+        
+            if source_map_file:
+                self.write_source_map(source_map_file, output_file)
+            if stats_file:
+                self.write_stats(stats_file)
+            return combined
+        finally:
+            if self.stats is not None:
+                # The run failed before its report was written
+                self.stats.finish()
+                self.stats = None
+
+
+# Per-spec options a manifest may set, globally under [defaults] or per [[spec]]
+MANIFEST_OPTIONS = {'minify': False, 'dedupe': False, 'flatten': False, 'stream': False, 'stats': False,
+                    'source_map': False, 'jobs': 1, 'memory_budget_mb': 0}
+
+
+def load_manifest(manifest_file: str) -> List[Dict[str, Any]]:
+    """
+    Read a batch manifest listing the specs to combine.
+    
+    The manifest is a TOML file with one [[spec]] table per entry document.
+    Relative paths are resolved against the manifest's directory:
+    
+        [defaults]
+        minify = true
+        memory_budget_mb = 512             # default: 0, no limit
+        
+        [[spec]]
+        name = "unit"                      # default: the input file's stem
+        input = "unit-finance/openapi-unit-sdk-main/openapi.json"
+        output = "out/unit-combined.json"  # default: <name>-combined.json
+        
+        [[spec]]
+        input = "moov/openapi.yaml"
+        dedupe = true
+    
+    Args:
+        manifest_file: Path to the manifest
+        
+    Returns:
+        One dict per spec with name, input, output and every MANIFEST_OPTIONS key
+    """
+    import tomllib  # Python 3.11+; only batch runs need it
+    
+    manifest_path = Path(manifest_file).resolve()
+    with open(manifest_path, 'rb') as f:
+        manifest = tomllib.load(f)
+    
+    defaults = dict(MANIFEST_OPTIONS)
+    defaults.update(manifest.get('defaults', {}))
+    entries = []
+    for spec in manifest.get('spec', []):
+        if 'input' not in spec:
+            raise ValueError(f"Manifest entry without an input file: {spec}")
+        entry = dict(defaults)
+        entry.update(spec)
+        input_path = manifest_path.parent / entry['input']
+        entry['input'] = str(input_path)
+        entry.setdefault('name', input_path.stem)
+        entry['output'] = str(manifest_path.parent / entry.get('output', f"{entry['name']}-combined.json"))
+        entries.append(entry)
+    
+    names = [entry['name'] for entry in entries]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate spec names in manifest: {', '.join(duplicates)}")
+    return entries
+
+
+def combine_manifest_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Combine one manifest entry, capturing its console output.
+    
+    Runs in a worker process in batch mode, so it must not raise; failures
+    are reported in the result instead.
+    
+    Returns:
+        Summary with name, output, ok, seconds, files, bytes and, on failure,
+        error and the captured log
+    """
+    cache = default_cache()
+    start = time.perf_counter()
+    log = io.StringIO()
+    budget = entry['memory_budget_mb'] * 1024 * 1024 or None
+    combiner = OpenAPICombiner(os.path.dirname(entry['input']), cache=cache, memory_budget=budget)
+    result: Dict[str, Any] = {'name': entry['name'], 'output': entry['output']}
+    try:
+        Path(entry['output']).parent.mkdir(parents=True, exist_ok=True)
+        with contextlib.redirect_stdout(log):
+            combiner.combine(entry['input'], entry['output'], stream=entry['stream'],
+                             minify=entry['minify'], jobs=entry['jobs'], dedupe=entry['dedupe'],
+                             flatten=entry['flatten'],
+                             stats_file=stats_path(entry['output']) if entry['stats'] else None,
+                             source_map_file=source_map_path(entry['output']) if entry['source_map'] else None)
+        result.update(ok=True, bytes=os.path.getsize(entry['output']))
+    except Exception as e:
+        result.update(ok=False, error=str(e), log=log.getvalue())
+    result.update(seconds=round(time.perf_counter() - start, 3), files=combiner.documents.summary()['files'])
+    if cache is not None:
+        # Worker processes exit without running atexit handlers
+        cache.save()
+    return result
+
+
+def combine_manifest(manifest_file: str, processes: int = 1) -> List[Dict[str, Any]]:
+    """
+    Combine every spec listed in a manifest in one run.
+    
+    With processes > 1 the specs are combined on a process pool; every
+    worker shares the persistent parse cache. Results are returned in
+    manifest order.
+    
+    Args:
+        manifest_file: Path to the manifest (see load_manifest)
+        processes: Number of worker processes
+        
+    Returns:
+        One combine_manifest_entry summary per spec
+    """
+    entries = load_manifest(manifest_file)
+    if processes > 1 and len(entries) > 1:
+        # Imported here: multiprocessing adds noticeably to every run's startup
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(processes, len(entries))) as pool:
+            return list(pool.map(combine_manifest_entry, entries))
+    return [combine_manifest_entry(entry) for entry in entries]
+
+
+def print_manifest_summary(results: List[Dict[str, Any]], elapsed: float) -> None:
+    """Print one line per combined spec, plus the errors of failed ones."""
+    width = max([len(result['name']) for result in results] + [4])
+    print(f"{'Spec':<{width}}  {'Status':<6}  {'Files':>5}  {'Seconds':>7}  {'Size':>10}  Output")
+    for result in results:
+        status = 'ok' if result['ok'] else 'FAILED'
+        size = f"{result['bytes']:,}" if result['ok'] else '-'
+        print(f"{result['name']:<{width}}  {status:<6}  {result['files']:>5}  {result['seconds']:>7.2f}  "
+              f"{size:>10}  {result['output']}")
+    for result in results:
+        if not result['ok']:
+            print(f"\n{result['name']} failed: {result['error']}")
+            if result['log'].strip():
+                print(result['log'].rstrip())
+    failed = sum(not result['ok'] for result in results)
+    print(f"\n{len(results) - failed} of {len(results)} specs combined in {elapsed:.2f}s")
 
 
 def main():
@@ -210,7 +1069,8 @@ def main():
     )
     parser.add_argument(
         'input_file',
-        help='Path to the main OpenAPI JSON file'
+        nargs='?',
+        help='Path to the main OpenAPI JSON or YAML file'
     )
     parser.add_argument(
         '-o', '--output',
@@ -221,9 +1081,81 @@ def main():
         '--base-path',
         help='Base path for resolving relative references (default: directory of input file)'
     )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Write the output path by path while resolving instead of building it in memory'
+    )
+    parser.add_argument(
+        '--minify',
+        action='store_true',
+        help='Write compact JSON without indentation'
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='Load referenced files on this many threads before resolving (default: 1, lazy loading); '
+             'with --manifest, the number of worker processes'
+    )
+    parser.add_argument(
+        '--dedupe',
+        action='store_true',
+        help='Emit repeated schemas once under components/schemas with local $refs'
+    )
+    parser.add_argument(
+        '--flatten',
+        action='store_true',
+        help='Merge allOf compositions and $refs with sibling keywords into single schemas'
+    )
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help='Write a JSON profiling report next to the output (e.g. openapi-combined.stats.json)'
+    )
+    parser.add_argument(
+        '--source-map',
+        action='store_true',
+        help='Write a source map from output JSON pointers to the file and pointer each node came from '
+             '(e.g. openapi-combined.map.json)'
+    )
+    parser.add_argument(
+        '--memory-budget',
+        type=int,
+        metavar='MB',
+        help='Cap the memory held by loaded files and resolved targets, evicting and '
+             'reloading the least recently used ones (default: no limit)'
+    )
+    parser.add_argument(
+        '--manifest',
+        help='Combine every spec listed in this TOML manifest in one run and print a summary'
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep running and re-combine only the affected sections when a source file changes'
+    )
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=1.0,
+        help='Polling interval in seconds for --watch (default: 1.0)'
+    )
     
     args = parser.parse_args()
     
+    if args.manifest:
+        start = time.perf_counter()
+        try:
+            results = combine_manifest(args.manifest, processes=args.jobs)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            return 1
+        print_manifest_summary(results, time.perf_counter() - start)
+        return 0 if all(result['ok'] for result in results) else 1
+    if not args.input_file:
+        parser.error('an input file or --manifest is required')
+    
     # Determine base path
     if args.base_path:
         base_path = args.base_path
@@ -231,12 +1163,25 @@ def main():
         base_path = os.path.dirname(os.path.abspath(args.input_file))
     
     # Create combiner and process
-    combiner = OpenAPICombiner(base_path)
+    budget = args.memory_budget * 1024 * 1024 if args.memory_budget else None
+    combiner = OpenAPICombiner(base_path, cache=default_cache(), memory_budget=budget)
+    
+    if args.watch:
+        if args.stream:
+            print("Error: --watch keeps the combined spec in memory and cannot be used with --stream")
+            return 1
+        combiner.watch(args.input_file, args.output, minify=args.minify, interval=args.interval,
+                       dedupe=args.dedupe, flatten=args.flatten)
+        return 0
     
     try:
-        combined = combiner.combine(args.input_file, args.output)
+        combiner.combine(args.input_file, args.output, stream=args.stream, minify=args.minify,
+                         jobs=args.jobs, dedupe=args.dedupe, flatten=args.flatten,
+                         stats_file=stats_path(args.output) if args.stats else None,
+                         source_map_file=source_map_path(args.output) if args.source_map else None)
         print(f"\nSuccessfully combined OpenAPI specification!")
-        print(f"Total files loaded: {len(combiner.loaded_files)}")
+        loads = combiner.documents.summary()
+        print(f"Total files loaded: {loads['files']} ({loads['loads']} parses)")
         print(f"Output saved to: {args.output}")
     except Exception as e:
         print(f"Error: {e}")
@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+"""
+Persistent parse cache for OpenAPI spec files.
+Stores each parsed document in marshal form, keyed by the SHA-256 of its parser kind and content,
+so unchanged files are not re-parsed across runs of the combiner and bundler scripts,
+and the in-memory stores (DocumentStore, BoundedCache) that hold parsed documents within a run.
+JSON and YAML (.yaml/.yml, via PyYAML's LibYAML loader when available) are supported.
+"""
+
+import atexit
+import contextlib
+import hashlib
+import json
+import marshal
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, Optional, Tuple, Union
+
+from spec_pointer import PointerIndex
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'openapi-spec-cache'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Marshal's format is tied to the interpreter, so each Python version and
+# marshal format keeps its own index and documents under the cache directory
+CACHE_FORMAT = f"py{sys.version_info[0]}.{sys.version_info[1]}-marshal{marshal.version}"
+
+# In-memory size estimates used by BoundedCache, measured on the Unit and
+# Increase specs: a parsed document takes about twice its size on disk, and
+# a resolved subtree about 100 bytes per JSON node.
+PARSED_BYTES_PER_FILE_BYTE = 2
+RESOLVED_BYTES_PER_NODE = 100
+
+YAML_SUFFIXES = ('.yaml', '.yml')
+
+# Marks a cache miss where None is a valid cached value
+MISSING = object()
+
+
+class DocumentError(ValueError):
+    """Raised when a YAML document cannot be parsed."""
+
+
+_yaml_loader = None
+
+
+def yaml_loader() -> Any:
+    """
+    The safe YAML loader class used for spec files, or None without PyYAML.
+
+    PyYAML is imported on first use, so JSON-only runs never load it. The
+    loader uses the LibYAML parser when PyYAML was built with it. Dates stay
+    strings, and non-string keys (e.g. unquoted status codes such as 200)
+    become strings, so documents can be addressed by JSON pointers and
+    written back as JSON.
+    """
+    global _yaml_loader
+    if _yaml_loader is None:
+        try:
+            import yaml
+        except ImportError:
+            return None
+        base = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+        class SpecYAMLLoader(base):
+            yaml_implicit_resolvers = {
+                first: [(tag, regexp) for tag, regexp in resolvers if tag != 'tag:yaml.org,2002:timestamp']
+                for first, resolvers in base.yaml_implicit_resolvers.items()
+            }
+
+            def construct_mapping(self, node, deep=False):
+                mapping = super().construct_mapping(node, deep=deep)
+                if all(isinstance(key, str) for key in mapping):
+                    return mapping
+                return {key if isinstance(key, str) else json.dumps(key): value for key, value in mapping.items()}
+
+        _yaml_loader = SpecYAMLLoader
+    return _yaml_loader
+
+
+def is_yaml(file_path: Union[str, Path]) -> bool:
+    """Whether a file is parsed as YAML, judged by its extension."""
+    return Path(file_path).suffix.lower() in YAML_SUFFIXES
+
+
+def parse_document(content: Union[bytes, str], file_path: Union[str, Path]) -> Any:
+    """
+    Parse the content of a spec file as YAML or JSON, depending on its extension.
+
+    Raises:
+        json.JSONDecodeError: If a JSON file is invalid
+        DocumentError: If a YAML file is invalid, or PyYAML is not installed
+    """
+    if not is_yaml(file_path):
+        return json.loads(content)
+    loader = yaml_loader()
+    if loader is None:
+        raise DocumentError(f"PyYAML is required to load {file_path}")
+    import yaml
+    try:
+        return yaml.load(content, Loader=loader)
+    except yaml.YAMLError as e:
+        raise DocumentError(str(e)) from None
+
+
+def content_digest(content: bytes, file_path: Union[str, Path]) -> str:
+    """Cache key for a file's parsed form: the SHA-256 of its parser kind and its content."""
+    digest = hashlib.sha256(b'yaml\0' if is_yaml(file_path) else b'json\0')
+    digest.update(content)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    def __init__(self, cache_dir: Union[str, Path], max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize a parse cache rooted at a directory.
+
+        Args:
+            cache_dir: Directory holding the index and the cached documents,
+                in a subdirectory per CACHE_FORMAT
+            max_bytes: Size cap for the cached documents; least recently used
+                entries are evicted when it is exceeded
+        """
+        self.cache_dir = Path(cache_dir)
+        self.store_dir = self.cache_dir / CACHE_FORMAT
+        self.objects_dir = self.store_dir / 'objects'
+        self.index_file = self.store_dir / 'index.json'
+        self.lock_file = self.store_dir / 'index.lock'
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        # files: absolute path -> {"mtime_ns", "size", "hash"}
+        # objects: content hash (see content_digest) -> {"size", "used"} for size accounting and LRU
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.objects: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            self.files = index.get('files', {})
+            self.objects = index.get('objects', {})
+        except (OSError, ValueError):
+            pass
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, f"{digest}.marshal")
+
+    def _read_object(self, digest: str) -> Any:
+        """Load a cached document, returning None if it is missing or corrupt."""
+        try:
+            # Unbuffered, read whole: marshal.load on a buffered file reads it
+            # piecemeal and is several times slower than marshal.loads
+            with open(self._object_path(digest), 'rb', buffering=0) as f:
+                return marshal.loads(f.readall())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+    def _write_object(self, digest: str, data: Any) -> int:
+        """Atomically write a document in marshal form and return its size."""
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        payload = marshal.dumps(data)
+        fd, tmp_name = tempfile.mkstemp(dir=self.objects_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_name, self._object_path(digest))
+        return len(payload)
+
+    def load(self, file_path: Union[str, Path]) -> Any:
+        """
+        Load a JSON or YAML file through the cache.
+
+        The file's mtime and size are checked against the index first; when they
+        changed, the content hash decides whether a cached document can still be
+        used. Only files with new content are parsed.
+
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If the file cannot be parsed (see parse_document)
+        """
+        # os.path rather than pathlib, and no symlink resolution: on a warm
+        # cache, path handling would cost as much as reading the document
+        file_key = os.path.abspath(file_path)
+        stat = os.stat(file_key)
+
+        with self._lock:
+            entry = self.files.get(file_key)
+        if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            data = self._read_object(entry['hash'])
+            if data is not None:
+                self._touch(entry['hash'])
+                return data
+
+        with open(file_key, 'rb') as f:
+            content = f.read()
+        digest = content_digest(content, file_key)
+
+        data = None
+        with self._lock:
+            known = digest in self.objects
+        if known:
+            data = self._read_object(digest)
+        if data is None:
+            data = parse_document(content, file_key)
+            size = self._write_object(digest, data)
+            with self._lock:
+                self.objects[digest] = {'size': size, 'used': time.time()}
+                self.misses += 1
+        else:
+            self._touch(digest)
+
+        with self._lock:
+            self.files[file_key] = {
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'hash': digest,
+            }
+            self._dirty = True
+        return data
+
+    def is_current(self, file_path: Union[str, Path]) -> bool:
+        """Whether a file's index entry matches its mtime and size, so loading it needs no parse."""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        with self._lock:
+            entry = self.files.get(os.path.abspath(file_path))
+            return (entry is not None and entry['hash'] in self.objects
+                    and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size)
+
+    def entries(self, file_path: Union[str, Path]) -> Optional[Tuple[str, Dict[str, Any], Dict[str, Any]]]:
+        """
+        A loaded file's index entries, for handing to another process's cache (see add_entries).
+
+        Returns:
+            (file key, file entry, object entry), or None if the file is not indexed
+        """
+        file_key = os.path.abspath(file_path)
+        with self._lock:
+            entry = self.files.get(file_key)
+            if entry is None or entry['hash'] not in self.objects:
+                return None
+            return file_key, dict(entry), dict(self.objects[entry['hash']])
+
+    def add_entries(self, entries: Iterable[Tuple[str, Dict[str, Any], Dict[str, Any]]]) -> None:
+        """Index documents another process sharing the cache directory has already written (see entries)."""
+        with self._lock:
+            for file_key, entry, obj in entries:
+                self.objects[entry['hash']] = obj
+                self.files[file_key] = entry
+                self._dirty = True
+
+    def _touch(self, digest: str) -> None:
+        with self._lock:
+            self.hits += 1
+            if digest in self.objects:
+                self.objects[digest]['used'] = time.time()
+                self._dirty = True
+
+    def evict(self) -> int:
+        """Remove least recently used documents until under the size cap; returns the count removed."""
+        with self._lock:
+            total = sum(obj['size'] for obj in self.objects.values())
+            removed = 0
+            for digest, obj in sorted(self.objects.items(), key=lambda item: item[1]['used']):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(self._object_path(digest))
+                except OSError:
+                    pass
+                del self.objects[digest]
+                total -= obj['size']
+                removed += 1
+            if removed:
+                self.files = {key: entry for key, entry in self.files.items()
+                              if entry['hash'] in self.objects}
+                self._dirty = True
+            return removed
+
+    @contextlib.contextmanager
+    def _index_lock(self) -> Iterator[None]:
+        """Hold an exclusive lock on the index file across processes; a no-op where fcntl is unavailable."""
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_file, 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # Closing the file releases the lock
+            yield
+
+    def save(self) -> None:
+        """
+        Apply the size cap and write the index if anything changed.
+
+        Entries written to the index by other processes since it was read are
+        kept, so several processes can share one cache directory; the
+        read-merge-write runs under a lock file so concurrent saves do not
+        drop each other's entries.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+        with self._index_lock():
+            with self._lock:
+                try:
+                    with open(self.index_file, 'r', encoding='utf-8') as f:
+                        on_disk = json.load(f)
+                except (OSError, ValueError):
+                    on_disk = {}
+                for digest, obj in on_disk.get('objects', {}).items():
+                    if digest not in self.objects and os.path.exists(self._object_path(digest)):
+                        self.objects[digest] = obj
+                for file_key, entry in on_disk.get('files', {}).items():
+                    if file_key not in self.files and entry.get('hash') in self.objects:
+                        self.files[file_key] = entry
+            self.evict()
+            with self._lock:
+                fd, tmp_name = tempfile.mkstemp(dir=self.store_dir, suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump({'files': self.files, 'objects': self.objects}, f)
+                os.replace(tmp_name, self.index_file)
+                self._dirty = False
+
+
+_default_cache: Optional[ParseCache] = None
+
+
+def default_cache() -> Optional[ParseCache]:
+    """
+    Return the process-wide parse cache used by the command line scripts.
+
+    The location defaults to ~/.cache/openapi-spec-cache and can be changed
+    with the SPEC_CACHE_DIR environment variable; setting it to an empty
+    string disables caching. SPEC_CACHE_MAX_MB sets the size cap. The index
+    is saved when the process exits.
+    """
+    global _default_cache
+    cache_dir = os.environ.get('SPEC_CACHE_DIR', str(DEFAULT_CACHE_DIR))
+    if not cache_dir:
+        return None
+    if _default_cache is None:
+        max_mb = os.environ.get('SPEC_CACHE_MAX_MB')
+        max_bytes = int(max_mb) * 1024 * 1024 if max_mb else DEFAULT_MAX_BYTES
+        _default_cache = ParseCache(cache_dir, max_bytes)
+        atexit.register(_default_cache.save)
+    return _default_cache
+
+
+def load_json(file_path: Union[str, Path], cache: Optional[ParseCache] = None) -> Any:
+    """Load a JSON or YAML file, through the parse cache when one is given."""
+    if cache is not None:
+        return cache.load(file_path)
+    if is_yaml(file_path):
+        with open(file_path, 'rb') as f:
+            return parse_document(f.read(), file_path)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def parsed_size(file_key: Any, document: Any) -> int:
+    """Estimated memory held by a parsed document, from the size of its file."""
+    try:
+        return os.path.getsize(file_key) * PARSED_BYTES_PER_FILE_BYTE
+    except OSError:
+        return 0
+
+
+def resolved_size(key: Any, value: Any) -> int:
+    """Estimated memory held by a resolved subtree, from its node count."""
+    nodes = 0
+    stack = [value]
+    while stack:
+        node = stack.pop()
+        nodes += 1
+        if isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return nodes * RESOLVED_BYTES_PER_NODE
+
+
+class BoundedCache:
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any, Any], int],
+                 on_evict: Optional[Callable[[Any], None]] = None):
+        """
+        Dict-like cache holding values up to an estimated memory budget.
+
+        Entries are evicted least recently used first once the estimated
+        sizes add up to more than max_bytes. The newest entry is never
+        evicted, so a single value larger than the budget still fits. Callers
+        treat an evicted entry like one never loaded and reload it, so a
+        smaller budget trades lookups that hit for reloads and re-resolution.
+
+        Args:
+            max_bytes: Memory budget for the cached values
+            sizeof: Estimates a value's size as sizeof(key, value)
+            on_evict: Called with the key of every evicted entry
+        """
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, int]]' = OrderedDict()
+        # Files may be loaded on prefetch threads
+        self._lock = threading.RLock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Membership test; counts as a lookup in the hit rate."""
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def __getitem__(self, key: Hashable) -> Any:
+        with self._lock:
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self[key] if key in self else default
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        size = self.sizeof(key, value)
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                oldest, (_, oldest_size) = self._entries.popitem(last=False)
+                self.bytes -= oldest_size
+                self.evictions += 1
+                evicted.append(oldest)
+        if self.on_evict is not None:
+            for oldest in evicted:
+                self.on_evict(oldest)
+
+    def pop(self, key: Hashable, *default: Any) -> Any:
+        with self._lock:
+            if key in self._entries:
+                value, size = self._entries.pop(key)
+                self.bytes -= size
+                return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(list(self._entries))
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        return ((key, value) for key, (value, _) in list(self._entries.items()))
+
+    def summary(self) -> Dict[str, Any]:
+        """Budget, usage and hit/miss/eviction counts, for reports."""
+        lookups = self.hits + self.misses
+        return {
+            'max_bytes': self.max_bytes,
+            'bytes': self.bytes,
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+        }
+
+
+class DocumentStore:
+    def __init__(self, cache: Optional[ParseCache] = None, max_bytes: Optional[int] = None,
+                 on_load: Optional[Callable[[str, float], None]] = None):
+        """
+        Parsed documents of one run, shared by every reference into them.
+
+        Each file is parsed once, through the parse cache when one is given,
+        and a pointer index is built on its first lookup, so any number of
+        pointers into the same file cost a single parse. load_counts records
+        every parse; a file is only parsed again after a memory budget
+        evicted it or it was discarded.
+
+        Args:
+            cache: Optional persistent parse cache to load files through
+            max_bytes: Optional estimated memory budget for parsed documents;
+                least recently used documents are evicted beyond it
+            on_load: Called as on_load(file_key, seconds) after every parse
+        """
+        self.cache = cache
+        self.on_load = on_load
+        self.files: Union[Dict[str, Any], BoundedCache]
+        if max_bytes is None:
+            self.files = {}
+        else:
+            self.files = BoundedCache(max_bytes, parsed_size,
+                                      on_evict=lambda file_key: self.indexes.pop(file_key, None))
+        self.indexes: Dict[str, PointerIndex] = {}
+        self.load_counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def load(self, file_path: Union[str, Path]) -> Any:
+        """
+        Return a file's parsed document, parsing it on first use.
+
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If the file cannot be parsed
+        """
+        file_key = str(file_path)
+        data = self.files.get(file_key, MISSING)
+        if data is MISSING:
+            start = time.perf_counter()
+            data = load_json(file_key, self.cache)
+            seconds = time.perf_counter() - start
+            self.files[file_key] = data
+            with self._lock:
+                self.load_counts[file_key] += 1
+            if self.on_load is not None:
+                self.on_load(file_key, seconds)
+        return data
+
+    def lookup(self, file_path: Union[str, Path], pointer: str) -> Any:
+        """
+        Resolve a JSON pointer in a file through the file's pointer index.
+
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If the file cannot be parsed
+            PointerError: If the pointer does not match the document
+        """
+        file_key = str(file_path)
+        index = self.indexes.get(file_key)
+        if index is None:
+            index = self.indexes[file_key] = PointerIndex(self.load(file_key))
+        elif isinstance(self.files, BoundedCache):
+            # Keep files that are still being read from at the recent end of the LRU
+            self.files.get(file_key)
+        return index.lookup(pointer)
+
+    def discard(self, file_path: Union[str, Path]) -> None:
+        """Forget a file, e.g. after it changed; it is parsed again on next use."""
+        file_key = str(file_path)
+        self.files.pop(file_key, None)
+        self.indexes.pop(file_key, None)
+
+    def clear(self) -> None:
+        self.files.clear()
+        self.indexes.clear()
+
+    def summary(self) -> Dict[str, int]:
+        """Distinct files parsed, total parses and repeated parses, for reports."""
+        loads = sum(self.load_counts.values())
+        return {'files': len(self.load_counts), 'loads': loads, 'reloads': loads - len(self.load_counts)}
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Schema deduplication for combined OpenAPI specs.
+Hash-conses every subtree of a fully inlined spec and emits schemas that are used more
+than once a single time under components/schemas, with local $refs at the use sites.
+"""
+
+import hashlib
+import json
+import re
+from collections import Counter, deque
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+
+DEFAULT_MIN_NODES = 8
+
+# Keys of a schema object whose values are schemas, or lists of schemas
+SCHEMA_KEYS = ('items', 'additionalProperties', 'not')
+SCHEMA_LIST_KEYS = ('allOf', 'oneOf', 'anyOf')
+
+_INVALID_NAME_CHARS = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+def iter_schema_slots(schema: Dict[str, Any]) -> Iterator[Tuple[Any, Any, Dict[str, Any]]]:
+    """Yield (container, key, subschema) for every direct subschema of a schema object."""
+    for key in SCHEMA_KEYS:
+        child = schema.get(key)
+        if isinstance(child, dict):
+            yield schema, key, child
+    properties = schema.get('properties')
+    if isinstance(properties, dict):
+        for name, child in properties.items():
+            if isinstance(child, dict):
+                yield properties, name, child
+    for key in SCHEMA_LIST_KEYS:
+        children = schema.get(key)
+        if isinstance(children, list):
+            for index, child in enumerate(children):
+                if isinstance(child, dict):
+                    yield children, index, child
+
+
+class StructureTable:
+    """
+    Hash-consing table: structurally equal containers get the same integer id.
+
+    Object key order is ignored. Containers are memoized by identity, so
+    subtrees shared between use sites (as produced by the combiners) are
+    only hashed once.
+    """
+
+    def __init__(self):
+        self.ids: Dict[int, int] = {}
+        self.table: Dict[tuple, int] = {}
+        self.sizes: List[int] = []
+        self.heights: List[int] = []
+        # Keep every consed object alive so id() values stay unique
+        self.objects: List[Any] = []
+
+    def intern(self, root: Any) -> int:
+        """Return the structure id of a container, consing all of its subtrees."""
+        ids = self.ids
+        stack = [(root, False)]
+        while stack:
+            node, ready = stack.pop()
+            if id(node) in ids:
+                continue
+            values = node.values() if isinstance(node, dict) else node
+            if not ready:
+                stack.append((node, True))
+                stack.extend((value, False) for value in values
+                             if isinstance(value, (dict, list)) and id(value) not in ids)
+                continue
+
+            size, height = 1, 0
+            parts = []
+            items = sorted(node.items()) if isinstance(node, dict) else enumerate(node)
+            for key, value in items:
+                if isinstance(value, (dict, list)):
+                    child = ids[id(value)]
+                    size += self.sizes[child]
+                    height = max(height, self.heights[child] + 1)
+                    parts.append((key, child))
+                else:
+                    size += 1
+                    parts.append((key, type(value), value))
+            key = (isinstance(node, dict), tuple(parts))
+            structure = self.table.get(key)
+            if structure is None:
+                structure = self.table[key] = len(self.sizes)
+                self.sizes.append(size)
+                self.heights.append(height)
+            ids[id(node)] = structure
+            self.objects.append(node)
+        return ids[id(root)]
+
+
+def component_name(schema: Dict[str, Any], hint: str) -> str:
+    """Base component name for a hoisted schema: its title, else where it was first seen."""
+    name = schema.get('title') if isinstance(schema.get('title'), str) else hint
+    name = _INVALID_NAME_CHARS.sub('', ''.join(word[:1].upper() + word[1:] for word in name.split()))
+    return name or 'Schema'
+
+
+def unique_component_name(base: str, taken: Set[str], origin: str) -> str:
+    """
+    Claim a component name derived from base.
+
+    Characters that are not valid in component names are dropped, and a hash
+    of origin (a stable description of where the schema comes from) is
+    appended if the name is already taken. The name is added to taken.
+    """
+    name = _INVALID_NAME_CHARS.sub('', base) or 'Schema'
+    if name in taken:
+        name = f"{name}_{hashlib.sha256(origin.encode('utf-8')).hexdigest()[:8]}"
+    taken.add(name)
+    return name
+
+
+def schema_digest(schema: Dict[str, Any]) -> str:
+    """Short content hash used to disambiguate component names."""
+    canonical = json.dumps(schema, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:8]
+
+
+def dedupe_schemas(spec: Dict[str, Any], min_nodes: int = DEFAULT_MIN_NODES) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Emit repeated schemas once under components/schemas and reference them locally.
+
+    Schemas are found at 'schema' keys outside of schemas and under
+    components/schemas, and their subschemas through properties, items,
+    additionalProperties, not, allOf, oneOf and anyOf. A schema with at least
+    min_nodes nodes that would be emitted more than once becomes a component;
+    a schema equal to an existing component is replaced by a reference to it.
+    Existing components keep their names and definitions. New components are
+    named after their title (or the property or key they first appear under),
+    with a content hash suffix on collisions, and are appended in name order.
+    The input spec is not modified.
+
+    Args:
+        spec: A combined (fully inlined) OpenAPI document
+        min_nodes: Minimum subtree size, in JSON nodes, for hoisting a schema
+
+    Returns:
+        The deduplicated spec and counts of hoisted components and replaced use sites
+    """
+    table = StructureTable()
+
+    # Copy the non-schema part of the spec and note where the schemas sit
+    skeleton: Dict[str, Any] = {}
+    root_slots: List[Tuple[Any, Any, Dict[str, Any]]] = []
+    existing: List[Tuple[str, Dict[str, Any]]] = []
+    stack: List[Tuple[Any, Any, Any]] = []
+    for key, value in spec.items():
+        if key == 'components' and isinstance(value, dict):
+            components = skeleton['components'] = dict(value)
+            schemas = value.get('schemas')
+            if isinstance(schemas, dict):
+                existing = [(name, schema) for name, schema in schemas.items() if isinstance(schema, dict)]
+                components['schemas'] = dict(schemas)
+            for section, content in value.items():
+                if section != 'schemas' and isinstance(content, (dict, list)):
+                    stack.append((content, components, section))
+        elif isinstance(value, (dict, list)):
+            stack.append((value, skeleton, key))
+        else:
+            skeleton[key] = value
+    while stack:
+        node, container, slot = stack.pop()
+        if isinstance(node, dict):
+            copy = container[slot] = dict(node)
+            for key, value in node.items():
+                if key == 'schema' and isinstance(value, dict):
+                    root_slots.append((copy, key, value))
+                elif isinstance(value, (dict, list)):
+                    stack.append((value, copy, key))
+        else:
+            copy = container[slot] = list(node)
+            for index, value in enumerate(node):
+                if isinstance(value, (dict, list)):
+                    stack.append((value, copy, index))
+
+    # Intern every schema reachable from the roots
+    representative: Dict[int, Dict[str, Any]] = {}
+    hints: Dict[int, str] = {}
+    existing_names: Dict[int, str] = {}
+    uses: Counter = Counter()
+    work: deque = deque()
+    for name, schema in existing:
+        existing_names.setdefault(table.intern(schema), name)
+        uses[table.ids[id(schema)]] += 1
+        work.append((schema, name))
+    for _, _, schema in root_slots:
+        uses[table.intern(schema)] += 1
+        work.append((schema, 'Schema'))
+    while work:
+        schema, hint = work.popleft()
+        structure = table.ids[id(schema)]
+        if structure in representative:
+            continue
+        representative[structure] = schema
+        hints[structure] = hint
+        for container, key, child in iter_schema_slots(schema):
+            # Property names make the best default component names
+            is_property = container is not schema and isinstance(key, str)
+            work.append((child, key if is_property else 'Schema'))
+
+    # Count how many times each schema would be emitted. A parent is always
+    # taller than its subschemas, so walking from the tallest structure down
+    # settles every parent's count before it is passed on to its children.
+    hoisted = set()
+    for structure in sorted(representative, key=lambda s: (-table.heights[s], s)):
+        if structure in existing_names or (uses[structure] > 1 and table.sizes[structure] >= min_nodes):
+            hoisted.add(structure)
+            weight = 1
+        else:
+            weight = uses[structure]
+        for _, _, child in iter_schema_slots(representative[structure]):
+            uses[table.ids[id(child)]] += weight
+
+    # Name the new components
+    names: Dict[int, str] = dict(existing_names)
+    taken = {name for name, _ in existing}
+    new_components = []
+    for structure in sorted(hoisted - set(existing_names)):
+        schema = representative[structure]
+        name = component_name(schema, hints[structure])
+        if name in taken:
+            name = f"{name}_{schema_digest(schema)}"
+        taken.add(name)
+        names[structure] = name
+        new_components.append((name, schema))
+    new_components.sort()
+
+    replaced = 0
+
+    def emit(schema: Dict[str, Any], as_definition: bool) -> Any:
+        nonlocal replaced
+        out: List[Any] = [None]
+        work = [(schema, out, 0, as_definition)]
+        while work:
+            node, container, slot, definition = work.pop()
+            structure = table.ids[id(node)]
+            if not definition and structure in names:
+                container[slot] = {'$ref': f"#/components/schemas/{names[structure]}"}
+                replaced += 1
+                continue
+            copy = container[slot] = dict(node)
+            if isinstance(node.get('properties'), dict):
+                copy['properties'] = dict(node['properties'])
+            for key in SCHEMA_LIST_KEYS:
+                if isinstance(node.get(key), list):
+                    copy[key] = list(node[key])
+            for parent, key, child in iter_schema_slots(copy):
+                work.append((child, parent, key, False))
+        return out[0]
+
+    for container, slot, schema in root_slots:
+        container[slot] = emit(schema, as_definition=False)
+    if existing or new_components:
+        schemas = skeleton.setdefault('components', {}).setdefault('schemas', {})
+        for name, schema in existing:
+            schemas[name] = emit(schema, as_definition=table.ids[id(schema)] in hoisted
+                                 and names[table.ids[id(schema)]] == name)
+        for name, schema in new_components:
+            schemas[name] = emit(schema, as_definition=True)
+
+    return skeleton, {'components_added': len(new_components), 'refs_emitted': replaced}
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Schema flattening for OpenAPI specs.
+Merges allOf compositions, and $refs with sibling keywords, into single effective schemas.
+Merged schemas are memoized by the identity of the schemas they come from, so a
+composition shared by many use sites (as the combiners share resolved targets, or as
+bundle components are shared through local $refs) is merged once.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from spec_dedupe import iter_schema_slots
+
+
+LOCAL_SCHEMA_PREFIX = '#/components/schemas/'
+
+# Keywords that describe rather than constrain; the first schema that sets one wins
+ANNOTATION_KEYS = frozenset(('title', 'description', 'summary', 'example', 'examples', 'default',
+                             'deprecated', 'externalDocs', 'xml', 'readOnly', 'writeOnly'))
+# Bounds where merging keeps the most restrictive value
+LOWER_BOUNDS = ('minLength', 'minItems', 'minProperties')
+UPPER_BOUNDS = ('maxLength', 'maxItems', 'maxProperties')
+
+
+def merge_subschemas(first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge two nested schemas, keeping them as an allOf when they conflict."""
+    merged = merge_schemas([first, second])
+    return merged if merged is not None else {'allOf': [first, second]}
+
+
+def merge_schemas(schemas: Sequence[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Merge schemas that must all hold into one effective schema.
+
+    Properties are united (a property defined more than once is merged in
+    turn), required lists are united, enums are intersected and length, item
+    and property-count bounds keep the most restrictive value. A schema that
+    restricts additional properties (additionalProperties false or a schema)
+    must itself declare every property the others declare: otherwise the
+    merged schema would accept properties that schema rejects, so the
+    schemas are not merged. The merged schema is nullable only if every
+    schema that sets a type is. Annotations such as title and description
+    come from the first schema that sets them. Any other keyword must have
+    the same value everywhere it is set.
+
+    The input schemas are not modified; unchanged values are shared with them.
+
+    Args:
+        schemas: Schema objects without $ref or allOf keys to merge, in priority order
+
+    Returns:
+        The merged schema, or None if two schemas set a keyword to incompatible values
+    """
+    names = set()
+    for schema in schemas:
+        if isinstance(schema.get('properties'), dict):
+            names.update(schema['properties'])
+    for schema in schemas:
+        if schema.get('additionalProperties', True) is not True:
+            own = schema.get('properties')
+            if not names.issubset(own if isinstance(own, dict) else ()):
+                return None
+
+    merged: Dict[str, Any] = {}
+    for schema in schemas:
+        for key, value in schema.items():
+            if key not in merged:
+                merged[key] = value
+                continue
+            current = merged[key]
+            if key in ANNOTATION_KEYS or key == 'nullable' or key.startswith('x-') or current == value:
+                continue
+            if key == 'properties' and isinstance(current, dict) and isinstance(value, dict):
+                properties = dict(current)
+                for name, child in value.items():
+                    if name not in properties or properties[name] == child:
+                        properties.setdefault(name, child)
+                    elif isinstance(properties[name], dict) and isinstance(child, dict):
+                        properties[name] = merge_subschemas(properties[name], child)
+                    else:
+                        return None
+                merged[key] = properties
+            elif key == 'required' and isinstance(current, list) and isinstance(value, list):
+                merged[key] = current + [name for name in value if name not in current]
+            elif key == 'enum' and isinstance(current, list) and isinstance(value, list):
+                common = [option for option in current if option in value]
+                if not common:
+                    return None
+                merged[key] = common
+            elif key == 'additionalProperties':
+                if current is False or value is False:
+                    merged[key] = False
+                elif current is True:
+                    merged[key] = value
+                elif isinstance(current, dict) and isinstance(value, dict):
+                    merged[key] = merge_subschemas(current, value)
+            elif key == 'items' and isinstance(current, dict) and isinstance(value, dict):
+                merged[key] = merge_subschemas(current, value)
+            elif key in LOWER_BOUNDS and isinstance(current, int) and isinstance(value, int):
+                merged[key] = max(current, value)
+            elif key in UPPER_BOUNDS and isinstance(current, int) and isinstance(value, int):
+                merged[key] = min(current, value)
+            else:
+                return None
+    if 'nullable' in merged:
+        # null must pass every schema, and a typed schema rejects it unless nullable
+        merged['nullable'] = all(schema.get('nullable') is True or 'type' not in schema
+                                 for schema in schemas)
+    return merged
+
+
+class SchemaFlattener:
+    def __init__(self, components: Optional[Dict[str, Any]] = None):
+        """
+        Memoizing flattener for allOf compositions and sibling $refs.
+
+        One flattener can be shared by every stage of a run (resolution,
+        output, bundling); a schema object is flattened once however many
+        times it is reached.
+
+        Args:
+            components: The document's components/schemas, used to resolve
+                local '#/components/schemas/<name>' allOf members; other
+                $refs are left in place, and so is any allOf containing them
+        """
+        self.components = components
+        # id(schema) -> (schema, flattened); the schema is kept so ids stay unique
+        self.flattened: Dict[int, Tuple[Any, Any]] = {}
+        # (id(target), sibling JSON) -> (target, merged)
+        self.merged_refs: Dict[Tuple[int, str], Tuple[Any, Any]] = {}
+        self.stats = {'allof_merged': 0, 'sibling_refs_merged': 0, 'conflicts': 0, 'reused': 0}
+
+    def set_components(self, components: Optional[Dict[str, Any]]) -> None:
+        """
+        Resolve local allOf members against other components/schemas.
+
+        Memoized results made with the previous components are dropped, since
+        a composition kept because a member could not be followed may merge now.
+        """
+        if components is not self.components:
+            self.components = components
+            self.flattened.clear()
+            self.merged_refs.clear()
+
+    def clear(self) -> None:
+        """Drop every memo, with the schemas the memos keep alive, and reset the counts."""
+        self.flattened.clear()
+        self.merged_refs.clear()
+        self.stats = dict.fromkeys(self.stats, 0)
+
+    def component(self, member: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The component a local allOf member refers to, if it is one."""
+        ref = member.get('$ref')
+        if self.components is None or not isinstance(ref, str) or not ref.startswith(LOCAL_SCHEMA_PREFIX):
+            return None
+        target = self.components.get(ref[len(LOCAL_SCHEMA_PREFIX):].replace('~1', '/').replace('~0', '~'))
+        return target if isinstance(target, dict) else None
+
+    def flatten(self, schema: Any) -> Any:
+        """
+        Return a schema with every allOf inside it merged where possible.
+
+        Subschemas are flattened first, and local component members are
+        flattened before the compositions using them, so nested and chained
+        compositions collapse in one pass. An allOf whose members conflict,
+        or that contains a $ref that cannot be followed (including one back
+        into a component being flattened), is kept. Unchanged subschemas are
+        shared with the input.
+        """
+        if not isinstance(schema, dict):
+            return schema
+        flattened = self.flattened
+        if id(schema) in flattened:
+            self.stats['reused'] += 1
+            return flattened[id(schema)][1]
+
+        # Post-order walk; active holds the schemas whose children are pending,
+        # so a component reached again through its own allOf is not followed
+        active = set()
+        stack: List[Tuple[Dict[str, Any], bool]] = [(schema, False)]
+        while stack:
+            node, ready = stack.pop()
+            if id(node) in flattened:
+                continue
+            if ready:
+                active.discard(id(node))
+                flattened[id(node)] = (node, self.flatten_node(node))
+                continue
+            if id(node) in active:
+                continue
+            active.add(id(node))
+            stack.append((node, True))
+            for _, _, child in iter_schema_slots(node):
+                if id(child) not in flattened and id(child) not in active:
+                    stack.append((child, False))
+            members = node.get('allOf')
+            if isinstance(members, list):
+                for member in members:
+                    target = self.component(member) if isinstance(member, dict) else None
+                    if target is not None and id(target) not in flattened and id(target) not in active:
+                        stack.append((target, False))
+        return flattened[id(schema)][1]
+
+    def flatten_node(self, node: Dict[str, Any]) -> Dict[str, Any]:
+        """Flatten one schema whose subschemas and component members are already flattened."""
+        flattened = self.flattened
+        copy = node
+        for container, key, child in list(iter_schema_slots(node)):
+            entry = flattened.get(id(child))
+            if entry is None or entry[1] is child:
+                continue
+            if copy is node:
+                copy = dict(node)
+                if isinstance(node.get('properties'), dict):
+                    copy['properties'] = dict(node['properties'])
+                if isinstance(node.get('allOf'), list):
+                    copy['allOf'] = list(node['allOf'])
+                for list_key in ('oneOf', 'anyOf'):
+                    if isinstance(node.get(list_key), list):
+                        copy[list_key] = list(node[list_key])
+            if container is node:
+                copy[key] = entry[1]
+            elif container is node.get('properties'):
+                copy['properties'][key] = entry[1]
+            else:
+                for list_key in ('allOf', 'oneOf', 'anyOf'):
+                    if container is node.get(list_key):
+                        copy[list_key][key] = entry[1]
+
+        members = copy.get('allOf')
+        if not isinstance(members, list) or not members:
+            return copy
+        parts = [{key: value for key, value in copy.items() if key != 'allOf'}]
+        for member in members:
+            if not isinstance(member, dict):
+                return copy
+            if '$ref' in member:
+                target = self.component(member)
+                entry = None if target is None else flattened.get(id(target))
+                if entry is None or len(member) > 1:
+                    return copy
+                member = entry[1]
+            if '$ref' in member or 'allOf' in member:
+                return copy
+            parts.append(member)
+        merged = merge_schemas(parts)
+        if merged is None:
+            self.stats['conflicts'] += 1
+            return copy
+        self.stats['allof_merged'] += 1
+        return merged
+
+    def merge_ref(self, target: Dict[str, Any], siblings: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Merge a resolved $ref target with the keywords next to the $ref.
+
+        The siblings take priority for annotations (so '$ref' plus
+        'nullable: true' makes the target nullable) and constrain the target
+        otherwise. When they conflict, the siblings override the target's
+        keywords, as the resolvers did before flattening. Merges are memoized
+        by the target's identity and the siblings' content.
+        """
+        key = (id(target), json.dumps(siblings, sort_keys=True))
+        entry = self.merged_refs.get(key)
+        if entry is not None:
+            self.stats['reused'] += 1
+            return entry[1]
+        flat_target = self.flatten(target)
+        flat_siblings = self.flatten(siblings)
+        merged = None
+        if '$ref' not in flat_target and 'allOf' not in flat_target and 'allOf' not in flat_siblings:
+            merged = merge_schemas([flat_siblings, flat_target])
+        if merged is None:
+            merged = {**flat_target, **flat_siblings}
+        else:
+            if 'nullable' in flat_siblings:
+                merged['nullable'] = flat_siblings['nullable']
+            self.stats['sibling_refs_merged'] += 1
+        self.merged_refs[key] = (target, merged)
+        return merged
+
+
+def flatten_schemas(spec: Dict[str, Any], flattener: Optional[SchemaFlattener] = None
+                    ) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Merge every allOf composition in a spec into a single schema where possible.
+
+    Schemas are found at 'schema' keys and under components/schemas; local
+    '#/components/schemas/<name>' allOf members are resolved against the
+    spec's own components, so bundles with local references flatten too.
+    Other $refs stay references. The input spec is not modified.
+
+    Args:
+        spec: An OpenAPI document, combined or bundled
+        flattener: A flattener to reuse, e.g. the one that merged sibling
+            $refs during resolution; its components are set to the spec's
+            (see set_components)
+
+    Returns:
+        The flattened spec and the flattener's counts of merged compositions,
+        merged sibling $refs, conflicting compositions kept as allOf and
+        memoized results reused
+    """
+    flattener = flattener or SchemaFlattener()
+    components = spec.get('components')
+    schemas = components.get('schemas') if isinstance(components, dict) else None
+    flattener.set_components(schemas if isinstance(schemas, dict) else None)
+
+    out = dict(spec)
+    stack: List[Tuple[Any, Any, Any, bool]] = [(value, out, key, key == 'components')
+                                               for key, value in spec.items()
+                                               if isinstance(value, (dict, list))]
+    while stack:
+        node, container, slot, is_components = stack.pop()
+        if isinstance(node, dict):
+            copy = container[slot] = dict(node)
+            for key, value in node.items():
+                if is_components and key == 'schemas' and isinstance(value, dict):
+                    copy[key] = {name: flattener.flatten(schema) for name, schema in value.items()}
+                elif key == 'schema' and isinstance(value, dict):
+                    copy[key] = flattener.flatten(value)
+                elif isinstance(value, (dict, list)):
+                    stack.append((value, copy, key, False))
+        else:
+            copy = container[slot] = list(node)
+            for index, value in enumerate(node):
+                if isinstance(value, (dict, list)):
+                    stack.append((value, copy, index, False))
+
+    return out, dict(flattener.stats)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+JSON pointer lookups for loaded spec documents.
+Pointers are compiled to token tuples once per process, and each document keeps an
+index from pointer string to node so repeated lookups do not walk from the root.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+
+class PointerError(KeyError):
+    """Raised when a JSON pointer does not match the document."""
+
+    def __str__(self) -> str:
+        return self.args[0] if self.args else ''
+
+
+def escape_pointer_token(token: str) -> str:
+    """Escape a key for use as a JSON pointer token."""
+    return token.replace('~', '~0').replace('/', '~1')
+
+
+@lru_cache(maxsize=None)
+def compile_pointer(pointer: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    Compile a JSON pointer such as '#/components/schemas/Address'.
+
+    A leading '#' and '/' are optional, and '', '#' and '#/' all mean the
+    document root. Tokens are unescaped ('~1' -> '/', '~0' -> '~').
+
+    Returns:
+        The unescaped tokens, and for each token the normalized pointer of the
+        node it leads to ('#/components', '#/components/schemas', ...)
+    """
+    pointer = pointer.lstrip('#').lstrip('/')
+    if not pointer:
+        return (), ()
+    raw_tokens = pointer.split('/')
+    tokens = tuple(token.replace('~1', '/').replace('~0', '~') for token in raw_tokens)
+    prefixes = []
+    prefix = '#'
+    for token in raw_tokens:
+        prefix = f"{prefix}/{token}"
+        prefixes.append(prefix)
+    return tokens, tuple(prefixes)
+
+
+def step(node: Any, token: str) -> Any:
+    """Follow one pointer token, raising PointerError if it does not exist."""
+    if isinstance(node, dict):
+        if token not in node:
+            raise PointerError(f"Pointer part '{token}' not found in data")
+        return node[token]
+    if isinstance(node, list):
+        try:
+            return node[int(token)]
+        except (ValueError, IndexError):
+            raise PointerError(f"Invalid array index '{token}'") from None
+    raise PointerError(f"Cannot navigate further at '{token}'")
+
+
+class PointerIndex:
+    def __init__(self, document: Any):
+        """
+        Index of resolved pointers for one loaded document.
+
+        Args:
+            document: The parsed document
+        """
+        self.document = document
+        self.nodes: Dict[str, Any] = {'#': document}
+
+    def lookup(self, pointer: str) -> Any:
+        """
+        Resolve a pointer, starting from the deepest already-indexed prefix.
+
+        Every prefix walked through is added to the index, so sibling pointers
+        such as '#/components/schemas/A' and '#/components/schemas/B' share the
+        walk to '#/components/schemas'.
+
+        Raises:
+            PointerError: If the pointer does not match the document
+        """
+        nodes = self.nodes
+        if pointer in nodes:
+            return nodes[pointer]
+        tokens, prefixes = compile_pointer(pointer)
+        if not tokens:
+            return self.document
+
+        start = len(prefixes)
+        while start > 0 and prefixes[start - 1] not in nodes:
+            start -= 1
+        if start == len(prefixes):
+            node = nodes[prefixes[-1]]
+        else:
+            node = nodes[prefixes[start - 1]] if start else self.document
+            for index in range(start, len(tokens)):
+                node = step(node, tokens[index])
+                nodes[prefixes[index]] = node
+        nodes[pointer] = node
+        return node
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Reachability pruning for bundled OpenAPI specs.
+Walks a spec from its paths and other non-schema sections, follows $refs to a fixpoint
+and drops the components/schemas entries nothing reaches.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from spec_cache import DocumentStore
+from spec_pointer import PointerError, PointerIndex
+
+
+SCHEMAS_POINTER = '/components/schemas/'
+LOCAL_SCHEMA_PREFIX = '#' + SCHEMAS_POINTER
+
+
+def referenced_schema(fragment: str) -> Optional[str]:
+    """Name of the schema a '/components/schemas/<name>[/...]' pointer points into, if it does."""
+    if not fragment.startswith(SCHEMAS_POINTER):
+        return None
+    name = fragment[len(SCHEMAS_POINTER):].split('/', 1)[0]
+    return name.replace('~1', '/').replace('~0', '~')
+
+
+def node_refs(node: Dict[str, Any]) -> List[str]:
+    """
+    The refs an object makes itself: its $ref and its discriminator mapping values.
+
+    Mapping values are refs, or bare names of component schemas; bare names
+    are returned as local refs to those schemas.
+    """
+    refs = [node['$ref']] if isinstance(node.get('$ref'), str) else []
+    discriminator = node.get('discriminator')
+    mapping = discriminator.get('mapping') if isinstance(discriminator, dict) else None
+    if isinstance(mapping, dict):
+        refs.extend(value if '#' in value or '/' in value else LOCAL_SCHEMA_PREFIX + value
+                    for value in mapping.values() if isinstance(value, str))
+    return refs
+
+
+def reachable_schemas(spec: Dict[str, Any], spec_file: Optional[str] = None,
+                      documents: Optional[DocumentStore] = None) -> Tuple[Set[str], List[Dict[str, str]]]:
+    """
+    Find the component schemas a spec actually uses.
+
+    The walk starts from every top-level section and every components
+    section except schemas. Local refs are looked up in the spec. A ref
+    into '/components/schemas/<name>' of any file counts as a use of the
+    spec's schema of that name, the way bundle_schemas gathers every file's
+    schemas under their names; so do discriminator mappings. Other refs to
+    files, such as path items kept in per-resource files, are loaded
+    relative to the file holding the ref and walked in turn. Schemas
+    reached are walked too, until nothing new is found.
+
+    Args:
+        spec: The bundled OpenAPI document
+        spec_file: Path the spec's own relative refs are resolved against;
+            without it, refs to other files are not followed
+        documents: Store to load referenced files through
+
+    Returns:
+        (names, unresolved): the reachable schema names, and the refs that
+        could not be followed as {"ref", "file", "error"} entries
+    """
+    components = spec.get('components')
+    schemas = components.get('schemas') if isinstance(components, dict) else None
+    schemas = schemas if isinstance(schemas, dict) else {}
+    documents = documents or DocumentStore()
+    spec_path = Path(spec_file).resolve() if spec_file else None
+    local = PointerIndex(spec)
+
+    reached: Set[str] = set()
+    unresolved: List[Dict[str, str]] = []
+    followed: Set[Tuple[Optional[Path], str]] = set()
+    seen: Set[int] = set()
+    # (node, file the node's relative refs resolve against; None inside
+    # bundled schemas, whose source files are not known)
+    stack: List[Tuple[Any, Optional[Path]]] = [
+        (value, spec_path) for key, value in spec.items() if key != 'components'
+    ]
+    if isinstance(components, dict):
+        stack.extend((value, spec_path) for key, value in components.items() if key != 'schemas')
+
+    while stack:
+        node, context = stack.pop()
+        if not isinstance(node, (dict, list)) or id(node) in seen:
+            continue
+        seen.add(id(node))
+        if isinstance(node, list):
+            stack.extend((value, context) for value in node)
+            continue
+        stack.extend((value, context) for key, value in node.items() if key != '$ref')
+        for ref in node_refs(node):
+            file_part, _, fragment = ref.partition('#')
+            name = referenced_schema(fragment)
+            if name is not None and name in schemas:
+                if name not in reached:
+                    reached.add(name)
+                    stack.append((schemas[name], None))
+                continue
+            if '://' in file_part:
+                continue
+            if not file_part:
+                target_path = context if context != spec_path else None
+            elif context is not None:
+                target_path = (context.parent / file_part).resolve()
+            else:
+                unresolved.append({'ref': ref, 'file': None, 'error': 'relative to an unknown file'})
+                continue
+            if (target_path, fragment) in followed:
+                continue
+            followed.add((target_path, fragment))
+            try:
+                if target_path is None:
+                    target = local.lookup('#' + fragment)
+                else:
+                    target = documents.lookup(target_path, '#' + fragment)
+            except (OSError, ValueError, PointerError) as e:
+                unresolved.append({'ref': ref, 'file': str(target_path) if target_path else None, 'error': str(e)})
+                continue
+            stack.append((target, target_path if target_path is not None else spec_path))
+
+    return reached, unresolved
+
+
+def prune_unreachable_schemas(spec: Dict[str, Any], spec_file: Optional[str] = None,
+                              documents: Optional[DocumentStore] = None
+                              ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Drop the component schemas that nothing in the spec reaches (see reachable_schemas).
+
+    When some ref could not be followed, the schemas it might lead to
+    cannot be known, so nothing is dropped. The input spec is not modified.
+
+    Returns:
+        The pruned spec and a report: the number of schemas kept, the names
+        removed and the unresolved refs
+    """
+    components = spec.get('components')
+    schemas = components.get('schemas') if isinstance(components, dict) else None
+    if not isinstance(schemas, dict):
+        return spec, {'kept': 0, 'removed': [], 'unresolved': []}
+
+    reached, unresolved = reachable_schemas(spec, spec_file, documents)
+    if unresolved:
+        return spec, {'kept': len(schemas), 'removed': [], 'unresolved': unresolved}
+    removed = [name for name in schemas if name not in reached]
+    pruned = {**spec, 'components': {**components,
+                                     'schemas': {name: schema for name, schema in schemas.items() if name in reached}}}
+    return pruned, {'kept': len(schemas) - len(removed), 'removed': removed, 'unresolved': []}
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Sharded output for bundled OpenAPI specs.
+Splits a bundle into self-contained per-tag or per-resource shards under a size budget,
+each carrying the closure of schemas its operations need, plus an index mapping paths
+and operationIds to shards so a consumer loads only the shard it needs.
+
+Usage: python spec_shard.py INDEX_FILE OPERATION_ID_OR_PATH [...]
+"""
+
+import argparse
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from spec_cache import DocumentStore
+from spec_pointer import PointerError, escape_pointer_token
+from spec_prune import LOCAL_SCHEMA_PREFIX, node_refs, referenced_schema
+from spec_walk import Descend, Replace, rebuild
+
+
+INDEX_VERSION = 1
+INDEX_FILE = 'index.json'
+SHARD_BY = ('tag', 'resource')
+DEFAULT_SHARD_BYTES = 256 * 1024
+# Rough size of a token of JSON for LLM tokenizers, used to turn token budgets into bytes
+BYTES_PER_TOKEN = 4
+
+HTTP_METHODS = ('get', 'put', 'post', 'delete', 'options', 'head', 'patch', 'trace')
+
+_INVALID_FILE_CHARS = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+def operations(path_item: Any) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(method, operation) pairs of a path item."""
+    if isinstance(path_item, dict):
+        for method in HTTP_METHODS:
+            if isinstance(path_item.get(method), dict):
+                yield method, path_item[method]
+
+
+class BundleLocalizer:
+    def __init__(self, spec: Dict[str, Any], spec_file: Optional[str] = None,
+                 documents: Optional[DocumentStore] = None):
+        """
+        Makes parts of a bundle self-contained.
+
+        Path items the bundle keeps in other files are inlined, and refs into
+        '/components/schemas/<name>' of any file become local refs to the
+        bundle's schema of that name (see spec_prune.reachable_schemas).
+        Refs that cannot be followed are kept as they are.
+
+        Args:
+            spec: The bundled OpenAPI document
+            spec_file: Path the spec's own relative refs are resolved against
+            documents: Store to load referenced files through
+        """
+        components = spec.get('components')
+        schemas = components.get('schemas') if isinstance(components, dict) else None
+        self.schemas: Dict[str, Any] = schemas if isinstance(schemas, dict) else {}
+        self.spec_path = Path(spec_file).resolve() if spec_file else None
+        self.documents = documents or DocumentStore()
+        # Schema name -> localized schema
+        self.localized: Dict[str, Any] = {}
+        # Schema name -> names of the schemas it refers to directly
+        self.edges: Dict[str, List[str]] = {}
+        # Targets being inlined, so a ref cycle through files is kept as a ref
+        self.inlining = set()
+
+    def localize(self, node: Any, context: Optional[Path]) -> Any:
+        """
+        Rebuild a node with its refs made local.
+
+        Args:
+            node: Node of the bundle or of a file it refers to
+            context: File the node's relative refs resolve against; None for
+                bundled schemas, whose source files are not known
+        """
+        def on_ref(ref_node: Dict[str, Any], ctx: Optional[Path]) -> Any:
+            ref = ref_node['$ref']
+            if not isinstance(ref, str):
+                return None
+            file_part, _, fragment = ref.partition('#')
+            siblings = {key: value for key, value in ref_node.items() if key != '$ref'}
+            name = referenced_schema(fragment)
+            if name is not None and name in self.schemas and fragment == f"/components/schemas/{escape_pointer_token(name)}":
+                local_ref = LOCAL_SCHEMA_PREFIX + escape_pointer_token(name)
+                if not siblings:
+                    return Replace({'$ref': local_ref})
+                return Descend([(siblings, ctx)], lambda parts: {'$ref': local_ref, **parts[0]})
+            if '://' in file_part or ctx is None or (not file_part and ctx == self.spec_path):
+                return None
+            target_path = (ctx.parent / file_part).resolve() if file_part else ctx
+            key = (target_path, fragment)
+            if key in self.inlining:
+                return None
+            try:
+                target = self.documents.lookup(target_path, '#' + fragment)
+            except (OSError, ValueError, PointerError):
+                return None
+            self.inlining.add(key)
+            
+            def finish(parts: List[Any]) -> Any:
+                self.inlining.discard(key)
+                # Siblings next to the ref override the target's keys
+                return {**parts[0], **parts[1]} if isinstance(parts[0], dict) else parts[0]
+            return Descend([(target, target_path), (siblings, ctx)], finish)
+
+        return rebuild(node, context, on_ref)
+
+    def schema(self, name: str) -> Any:
+        """The localized form of a bundled schema, built once."""
+        if name not in self.localized:
+            self.localized[name] = self.localize(self.schemas[name], None)
+            self.edges[name] = schema_refs(self.localized[name])
+        return self.localized[name]
+
+    def closure(self, nodes: List[Any]) -> List[str]:
+        """Names of the schemas localized nodes need, directly or through other schemas, in bundle order."""
+        needed = set()
+        work = [name for node in nodes for name in schema_refs(node)]
+        while work:
+            name = work.pop()
+            if name in needed or name not in self.schemas:
+                continue
+            needed.add(name)
+            self.schema(name)
+            work.extend(self.edges[name])
+        return [name for name in self.schemas if name in needed]
+
+
+def schema_refs(node: Any) -> List[str]:
+    """Names of the schemas a localized node refers to through local refs and discriminator mappings."""
+    names = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, list):
+            stack.extend(current)
+            continue
+        if not isinstance(current, dict):
+            continue
+        for ref in node_refs(current):
+            if ref.startswith(LOCAL_SCHEMA_PREFIX):
+                names.append(referenced_schema(ref[1:]))
+        stack.extend(value for key, value in current.items() if key != '$ref')
+    return names
+
+
+def shard_key(path: str, path_item: Any, shard_by: str) -> str:
+    """Group of a path: the first tag of its operations, or its first path segment that is not a parameter."""
+    if shard_by == 'tag':
+        for _, operation in operations(path_item):
+            tags = operation.get('tags')
+            if isinstance(tags, list) and tags and isinstance(tags[0], str):
+                return tags[0]
+        return 'untagged'
+    for segment in path.split('/'):
+        if segment and not segment.startswith('{'):
+            return segment
+    return 'root'
+
+
+def shard_file_name(key: str, taken: Dict[str, Any]) -> str:
+    """File name for a shard, numbered when a group needs several shards or names collide."""
+    base = _INVALID_FILE_CHARS.sub('-', key).strip('-').lower() or 'shard'
+    name, number = f"{base}.json", 1
+    while name in taken:
+        number += 1
+        name = f"{base}-{number}.json"
+    return name
+
+
+def member_bytes(key: Optional[str], value: Any, depth: int) -> int:
+    """
+    Bytes a member adds to json.dumps(..., indent=2) output: an object key and
+    value (or a list item, for key None) nested depth levels deep, with its
+    line break, indentation and separating comma.
+    """
+    text = json.dumps(value, indent=2)
+    key_bytes = len(json.dumps(key)) + 2 if key is not None else 0
+    return 2 + 2 * depth + key_bytes + len(text) + text.count('\n') * 2 * depth
+
+
+def remove_shards(shard_dir: str) -> None:
+    """Delete the shards listed in a directory's index, so a re-run leaves no stale shards behind."""
+    try:
+        with open(os.path.join(shard_dir, INDEX_FILE), 'r', encoding='utf-8') as f:
+            names = list(json.load(f).get('shards', {}))
+    except (OSError, ValueError):
+        return
+    for name in names:
+        try:
+            os.remove(os.path.join(shard_dir, os.path.basename(name)))
+        except OSError:
+            pass
+
+
+def write_shards(spec: Dict[str, Any], shard_dir: str, spec_file: Optional[str] = None,
+                 shard_by: str = 'resource', max_bytes: int = DEFAULT_SHARD_BYTES,
+                 documents: Optional[DocumentStore] = None) -> Dict[str, Any]:
+    """
+    Write a bundle as self-contained shards and an index.
+
+    Paths are grouped by their first tag or first path segment (shard_by),
+    in path order. Each shard is a complete OpenAPI document with the
+    group's path items (inlined when the bundle keeps them in other files),
+    every schema they need and the bundle's other top-level sections and
+    components. A group whose shard would exceed max_bytes is split between
+    path items, going by sizes added up per path item and schema rather than
+    by serializing each candidate shard; a single path item too large for the
+    budget gets a shard of its own, marked over_budget in the index. Shards
+    of a previous run in shard_dir are removed.
+
+    Args:
+        spec: The bundled OpenAPI document
+        shard_dir: Directory for the shards and INDEX_FILE
+        spec_file: Path the spec's own relative refs are resolved against
+        shard_by: 'tag' or 'resource'
+        max_bytes: Size budget per shard file
+        documents: Store to load referenced files through
+
+    Returns:
+        The index: per shard its file, size, paths, schema count and whether it
+        is over budget, the names of the shards over budget, and the shard of
+        every path and operationId
+    """
+    if shard_by not in SHARD_BY:
+        raise ValueError(f"shard_by must be one of {', '.join(SHARD_BY)}, not {shard_by!r}")
+    localizer = BundleLocalizer(spec, spec_file, documents)
+    spec_path = localizer.spec_path
+
+    groups: Dict[str, List[Tuple[str, Any]]] = {}
+    paths = spec.get('paths') if isinstance(spec.get('paths'), dict) else {}
+    for path, path_item in paths.items():
+        path_item = localizer.localize(path_item, spec_path)
+        groups.setdefault(shard_key(path, path_item, shard_by), []).append((path, path_item))
+
+    components = spec.get('components') if isinstance(spec.get('components'), dict) else {}
+    other_components = localizer.localize({key: value for key, value in components.items() if key != 'schemas'},
+                                          spec_path)
+    header = {key: value for key, value in spec.items() if key not in ('paths', 'components', 'tags')}
+    tags = spec.get('tags') if isinstance(spec.get('tags'), list) else None
+
+    def build(items: List[Tuple[str, Any]]) -> Dict[str, Any]:
+        shard = dict(header)
+        if tags is not None:
+            used = {tag for _, item in items for _, operation in operations(item)
+                    for tag in operation.get('tags', []) if isinstance(tag, str)}
+            shard['tags'] = [tag for tag in tags if isinstance(tag, dict) and tag.get('name') in used]
+        shard['paths'] = dict(items)
+        shard['components'] = {**other_components, 'schemas': {
+            name: localizer.schema(name) for name in localizer.closure([other_components] + [item for _, item in items])
+        }}
+        return shard
+
+    os.makedirs(shard_dir, exist_ok=True)
+    remove_shards(shard_dir)
+    index: Dict[str, Any] = {'version': INDEX_VERSION, 'shard_by': shard_by, 'max_bytes': max_bytes,
+                             'shards': {}, 'over_budget': [], 'paths': {}, 'operations': {}}
+
+    def flush(key: str, items: List[Tuple[str, Any]]) -> None:
+        shard = build(items)
+        text = json.dumps(shard, indent=2)
+        name = shard_file_name(key, index['shards'])
+        with open(os.path.join(shard_dir, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+        size = len(text.encode('utf-8'))
+        index['shards'][name] = {'group': key, 'bytes': size, 'paths': len(items),
+                                 'schemas': len(shard['components']['schemas']), 'over_budget': size > max_bytes}
+        if size > max_bytes:
+            index['over_budget'].append(name)
+        for path, item in items:
+            index['paths'][path] = name
+            for method, operation in operations(item):
+                if isinstance(operation.get('operationId'), str):
+                    index['operations'][operation['operationId']] = {'shard': name, 'path': path, 'method': method}
+
+    # A shard's size is that of an empty shard plus its members': path items
+    # and tags two levels deep, schemas three
+    empty_bytes = len(json.dumps(build([]), indent=2).encode('utf-8'))
+    base_schemas = set(localizer.closure([other_components]))
+    tag_bytes: Dict[str, int] = {}
+    for tag in tags or []:
+        if isinstance(tag, dict) and isinstance(tag.get('name'), str):
+            tag_bytes.setdefault(tag['name'], member_bytes(None, tag, 2))
+    schema_bytes: Dict[str, int] = {}
+
+    def added_bytes(item_bytes: int, item_schemas: set, item_tags: set, schemas: set, used_tags: set) -> int:
+        for name in item_schemas - schemas:
+            if name not in schema_bytes:
+                schema_bytes[name] = member_bytes(name, localizer.schema(name), 3)
+        return (item_bytes + sum(schema_bytes[name] for name in item_schemas - schemas)
+                + sum(tag_bytes.get(tag, 0) for tag in item_tags - used_tags))
+
+    for key, items in groups.items():
+        current: List[Tuple[str, Any]] = []
+        size, schemas, used_tags = empty_bytes, set(base_schemas), set()
+        for path, item in items:
+            item_bytes = member_bytes(path, item, 2)
+            item_schemas = set(localizer.closure([item]))
+            item_tags = {tag for _, operation in operations(item)
+                         for tag in operation.get('tags', []) if isinstance(tag, str)}
+            added = added_bytes(item_bytes, item_schemas, item_tags, schemas, used_tags)
+            if current and size + added > max_bytes:
+                flush(key, current)
+                current, size, schemas, used_tags = [], empty_bytes, set(base_schemas), set()
+                added = added_bytes(item_bytes, item_schemas, item_tags, schemas, used_tags)
+            current.append((path, item))
+            size += added
+            schemas |= item_schemas
+            used_tags |= item_tags
+        if current:
+            flush(key, current)
+
+    with open(os.path.join(shard_dir, INDEX_FILE), 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+class ShardIndex:
+    def __init__(self, index_file: str):
+        """
+        Random access to a sharded bundle: loads the index, and a shard only when it is asked for.
+
+        Args:
+            index_file: INDEX_FILE written by write_shards
+        """
+        with open(index_file, 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        if self.index.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported shard index version: {self.index.get('version')}")
+        self.shard_dir = os.path.dirname(os.path.abspath(index_file))
+        self.loaded: Dict[str, Dict[str, Any]] = {}
+
+    def shard_name(self, key: str) -> Optional[str]:
+        """Shard holding an operationId or a path."""
+        operation = self.index['operations'].get(key)
+        return operation['shard'] if operation else self.index['paths'].get(key)
+
+    def shard(self, name: str) -> Dict[str, Any]:
+        if name not in self.loaded:
+            with open(os.path.join(self.shard_dir, name), 'r', encoding='utf-8') as f:
+                self.loaded[name] = json.load(f)
+        return self.loaded[name]
+
+    def operation(self, operation_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Find an operation by its operationId.
+
+        Returns:
+            (shard, operation): the self-contained shard document, to resolve
+            the operation's refs in, and the operation; None if unknown
+        """
+        entry = self.index['operations'].get(operation_id)
+        if entry is None:
+            return None
+        shard = self.shard(entry['shard'])
+        return shard, shard['paths'][entry['path']][entry['method']]
+
+    def path(self, path: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Find a path item, as (shard, path item); None if unknown."""
+        name = self.index['paths'].get(path)
+        if name is None:
+            return None
+        shard = self.shard(name)
+        return shard, shard['paths'][path]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find the shard of a sharded bundle holding operations or paths')
+    parser.add_argument('index_file', help=f'Shard index ({INDEX_FILE} in the shard directory)')
+    parser.add_argument('keys', nargs='+', help='operationIds or paths, e.g. createPayment or /payments')
+    args = parser.parse_args()
+
+    shards = ShardIndex(args.index_file)
+    for key in args.keys:
+        name = shards.shard_name(key)
+        if name is None:
+            print(f"{key} -> (not found)")
+        else:
+            entry = shards.index['shards'][name]
+            print(f"{key} -> {os.path.join(shards.shard_dir, name)} ({entry['bytes']:,} bytes, "
+                  f"{entry['schemas']} schemas)")
+
+
+if __name__ == '__main__':
+    main()
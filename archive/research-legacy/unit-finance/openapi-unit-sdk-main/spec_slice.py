@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Operation-scoped slices of combined OpenAPI specs.
+Cuts a spec down to chosen operations (by operationId) or paths (by glob), keeping only
+the components they need. Each component's transitive closure is computed once per
+slicer, so many slices of one spec are cheap.
+
+Usage: python spec_slice.py INPUT SELECTOR [SELECTOR ...] [-o OUTPUT | --split DIR] [--combined]
+"""
+
+import argparse
+import json
+import os
+from fnmatch import fnmatchcase
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from openapi_combiner import OpenAPICombiner
+from spec_cache import default_cache
+from spec_prune import node_refs
+from spec_shard import HTTP_METHODS, operations, shard_file_name
+
+
+LOCAL_COMPONENT_PREFIX = '#/components/'
+
+# (components section, component name), e.g. ('schemas', 'Payment')
+ComponentKey = Tuple[str, str]
+
+
+def component_key(ref: str) -> Optional[ComponentKey]:
+    """The component a local '#/components/<section>/<name>[/...]' ref points into, if it does."""
+    if not ref.startswith(LOCAL_COMPONENT_PREFIX):
+        return None
+    parts = ref[len(LOCAL_COMPONENT_PREFIX):].split('/', 2)
+    if len(parts) < 2:
+        return None
+    return parts[0], parts[1].replace('~1', '/').replace('~0', '~')
+
+
+def local_refs(node: Any) -> Set[ComponentKey]:
+    """Components a node refers to directly, through local $refs and discriminator mappings (see node_refs)."""
+    keys: Set[ComponentKey] = set()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, list):
+            stack.extend(current)
+            continue
+        if not isinstance(current, dict):
+            continue
+        for ref in node_refs(current):
+            key = component_key(ref)
+            if key is not None:
+                keys.add(key)
+        stack.extend(value for key, value in current.items() if key != '$ref')
+    return keys
+
+
+class SpecSlicer:
+    def __init__(self, spec: Dict[str, Any]):
+        """
+        Slices of one combined spec.
+
+        The spec is not modified; slices share its unchanged nodes.
+
+        Args:
+            spec: A combined OpenAPI document, e.g. from OpenAPICombiner.combine;
+                only local '#/components/...' refs are followed
+        """
+        self.spec = spec
+        components = spec.get('components')
+        self.components: Dict[str, Any] = components if isinstance(components, dict) else {}
+        # operationId -> (path, method)
+        self.operations: Dict[str, Tuple[str, str]] = {}
+        paths = spec.get('paths')
+        self.paths: Dict[str, Any] = paths if isinstance(paths, dict) else {}
+        for path, path_item in self.paths.items():
+            for method, operation in operations(path_item):
+                if isinstance(operation.get('operationId'), str):
+                    self.operations.setdefault(operation['operationId'], (path, method))
+        # Component -> components it refers to directly / transitively
+        self.edges: Dict[ComponentKey, FrozenSet[ComponentKey]] = {}
+        self.closures: Dict[ComponentKey, FrozenSet[ComponentKey]] = {}
+
+    def component(self, key: ComponentKey) -> Any:
+        section = self.components.get(key[0])
+        return section.get(key[1]) if isinstance(section, dict) else None
+
+    def successors(self, key: ComponentKey) -> FrozenSet[ComponentKey]:
+        edges = self.edges.get(key)
+        if edges is None:
+            component = self.component(key)
+            edges = self.edges[key] = frozenset(local_refs(component)) if component is not None else frozenset()
+        return edges
+
+    def closure(self, key: ComponentKey) -> FrozenSet[ComponentKey]:
+        """
+        Every component a component needs, directly or transitively, itself excluded unless on a cycle.
+
+        Memoized: the walk stops at components whose closure is already
+        known and takes their closure whole, so later closures over shared
+        components cost only their new part.
+        """
+        closure = self.closures.get(key)
+        if closure is not None:
+            return closure
+        reached: Set[ComponentKey] = set()
+        work = list(self.successors(key))
+        while work:
+            current = work.pop()
+            if current in reached:
+                continue
+            reached.add(current)
+            known = self.closures.get(current)
+            if known is not None:
+                reached.update(known)
+            else:
+                work.extend(self.successors(current))
+        closure = self.closures[key] = frozenset(reached)
+        return closure
+
+    def select(self, selectors: Iterable[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        Pick path items and operations.
+
+        A selector starting with '/' is a glob over paths and selects whole
+        path items; anything else is an operationId, globs allowed, and
+        selects that operation with its path item's shared fields
+        (parameters, servers, summary, description).
+
+        Returns:
+            (paths, unmatched): the selected path items in spec order, and
+            the selectors that matched nothing
+        """
+        whole: Set[str] = set()
+        methods: Dict[str, Set[str]] = {}
+        unmatched = []
+        for selector in selectors:
+            if selector.startswith('/'):
+                matched = [path for path in self.paths if fnmatchcase(path, selector)]
+                whole.update(matched)
+            else:
+                matched = [operation_id for operation_id in self.operations if fnmatchcase(operation_id, selector)]
+                for operation_id in matched:
+                    path, method = self.operations[operation_id]
+                    methods.setdefault(path, set()).add(method)
+            if not matched:
+                unmatched.append(selector)
+
+        selected: Dict[str, Dict[str, Any]] = {}
+        for path, path_item in self.paths.items():
+            if path in whole:
+                selected[path] = path_item
+            elif path in methods:
+                selected[path] = {key: value for key, value in path_item.items()
+                                  if key not in HTTP_METHODS or key in methods[path]}
+        return selected, unmatched
+
+    def slice(self, selectors: Iterable[str]) -> Dict[str, Any]:
+        """
+        A minimal valid spec holding only the selected operations (see select).
+
+        Top-level fields other than paths, components and tags are kept.
+        Components are kept if the selected paths or the security schemes
+        in use need them, transitively; tags if a selected operation uses
+        them.
+
+        Raises:
+            ValueError: If a selector matches no path or operation
+        """
+        selectors = list(selectors)
+        paths, unmatched = self.select(selectors)
+        if unmatched:
+            raise ValueError(f"No operations match: {', '.join(unmatched)}")
+
+        needed: Set[ComponentKey] = set()
+        for key in local_refs(paths):
+            needed.add(key)
+            needed.update(self.closure(key))
+        # Security requirements name their schemes instead of referencing them
+        requirements = list(self.spec.get('security') or [])
+        for path_item in paths.values():
+            for _, operation in operations(path_item):
+                requirements.extend(operation.get('security') or [])
+        for requirement in requirements:
+            if isinstance(requirement, dict):
+                for scheme in requirement:
+                    needed.add(('securitySchemes', scheme))
+                    needed.update(self.closure(('securitySchemes', scheme)))
+
+        sliced = {key: value for key, value in self.spec.items() if key not in ('paths', 'components', 'tags')}
+        tags = self.spec.get('tags')
+        if isinstance(tags, list):
+            used = {tag for path_item in paths.values() for _, operation in operations(path_item)
+                    for tag in operation.get('tags') or []}
+            sliced['tags'] = [tag for tag in tags if isinstance(tag, dict) and tag.get('name') in used]
+        sliced['paths'] = paths
+        components = {}
+        for section, entries in self.components.items():
+            if not isinstance(entries, dict):
+                continue
+            kept = {name: value for name, value in entries.items() if (section, name) in needed}
+            if kept:
+                components[section] = kept
+        if components:
+            sliced['components'] = components
+        return sliced
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cut an OpenAPI spec down to chosen operations or paths')
+    parser.add_argument('input_file', help='Main OpenAPI file to combine, or a combined spec with --combined')
+    parser.add_argument('selectors', nargs='+',
+                        help="operationIds (e.g. createPayment) or path globs (e.g. '/payments*'); "
+                             "globs are allowed in operationIds too")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('-o', '--output', default='openapi-slice.json',
+                        help='Write one slice with every selected operation here (default: openapi-slice.json)')
+    output.add_argument('--split', metavar='DIR', help='Write one slice per selector to DIR instead')
+    parser.add_argument('--combined', action='store_true',
+                        help='The input is already combined; slice it without resolving references')
+    parser.add_argument('--base-path',
+                        help='Base path for resolving relative references (default: directory of input file)')
+    parser.add_argument('--minify', action='store_true', help='Write compact JSON without indentation')
+    args = parser.parse_args()
+
+    try:
+        if args.combined:
+            with open(args.input_file, 'r', encoding='utf-8') as f:
+                spec = json.load(f)
+        else:
+            base_path = args.base_path or os.path.dirname(os.path.abspath(args.input_file))
+            spec = OpenAPICombiner(base_path, cache=default_cache()).combine(args.input_file)
+        slicer = SpecSlicer(spec)
+        if args.split:
+            os.makedirs(args.split, exist_ok=True)
+            outputs, taken = [], set()
+            for selector in args.selectors:
+                file_name = shard_file_name(selector, taken)
+                taken.add(file_name)
+                outputs.append(([selector], os.path.join(args.split, file_name)))
+        else:
+            outputs = [(args.selectors, args.output)]
+        for selectors, output_file in outputs:
+            sliced = slicer.slice(selectors)
+            OpenAPICombiner.write_json(sliced, output_file, args.minify)
+            schemas = len(sliced.get('components', {}).get('schemas', {}))
+            count = sum(1 for path_item in sliced['paths'].values() for _ in operations(path_item))
+            print(f"{output_file}: {count} operations, {len(sliced['paths'])} paths, {schemas} schemas")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Source maps for combined OpenAPI specs.
+Records, for every place where a combiner inlined a reference target, the file and JSON
+pointer the content came from, and answers "where did this output node come from?" for
+any JSON pointer into the combined output with binary searches over sorted arrays.
+
+Usage: python spec_sourcemap.py MAP_FILE POINTER [POINTER ...]
+"""
+
+import argparse
+import json
+import os
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from spec_pointer import escape_pointer_token
+
+
+FORMAT_VERSION = 1
+
+# (file relative to the base directory, JSON pointer starting with '#')
+Origin = Tuple[str, str]
+
+
+def source_map_path(output_file: str) -> str:
+    """Source map path for an output file: openapi-combined.json -> openapi-combined.map.json."""
+    root, _ = os.path.splitext(output_file)
+    return f"{root}.map.json"
+
+
+def common_prefix_length(first: str, second: str) -> int:
+    limit = min(len(first), len(second))
+    length = 0
+    while length < limit and first[length] == second[length]:
+        length += 1
+    return length
+
+
+class SourceMapBuilder:
+    def __init__(self, root: Origin):
+        """
+        Collect source map segments while a spec is resolved.
+
+        The combiners place each resolved target in the output as one shared
+        object, so an output node that is a target is recognized by its
+        identity; every other node came from the same place as its parent.
+
+        Args:
+            root: Origin of the output root, i.e. the main file and '#'
+        """
+        self.root = root
+        # id() of each resolved target value -> where it came from; the values
+        # are kept alive by the resolution cache while the builder is used
+        self.targets: Dict[int, Origin] = {}
+        # Output pointer -> origin, for the section roots and inlined targets
+        self.segments: Dict[str, Origin] = {'': root}
+
+    def add_target(self, value: Any, origin: Origin) -> None:
+        """Register a resolved target; the first (innermost) origin of a value wins."""
+        if isinstance(value, (dict, list)):
+            self.targets.setdefault(id(value), origin)
+
+    def add(self, pointer: str, value: Any, origin: Optional[Origin] = None) -> None:
+        """
+        Record the segments of a resolved output subtree.
+
+        Args:
+            pointer: JSON pointer of the subtree in the output ('' for the root)
+            value: The resolved subtree
+            origin: Where the subtree came from unless it is a target itself;
+                defaults to the same pointer in the main file
+        """
+        targets = self.targets
+        segments = self.segments
+        if origin is None:
+            origin = (self.root[0], '#' + pointer)
+        segments[pointer] = targets.get(id(value), origin) if isinstance(value, (dict, list)) else origin
+        stack: List[Tuple[str, Any]] = [(pointer, value)] if isinstance(value, (dict, list)) else []
+        while stack:
+            path, node = stack.pop()
+            items = node.items() if isinstance(node, dict) else enumerate(node)
+            for key, child in items:
+                if isinstance(child, (dict, list)):
+                    child_path = f"{path}/{escape_pointer_token(str(key))}"
+                    target = targets.get(id(child))
+                    if target is not None:
+                        segments[child_path] = target
+                    stack.append((child_path, child))
+
+    def build(self) -> 'SourceMap':
+        return SourceMap.from_segments(self.segments)
+
+
+class SourceMap:
+    def __init__(self, outputs: List[str], files: List[str], pointers: List[str],
+                 file_ids: array, pointer_ids: array):
+        """
+        Sorted segment table; see from_segments and lookup.
+
+        Args:
+            outputs: Output pointers of the segments, sorted
+            files: Interned source file names
+            pointers: Interned source pointers
+            file_ids: Per segment, index into files
+            pointer_ids: Per segment, index into pointers
+        """
+        self.outputs = outputs
+        self.files = files
+        self.pointers = pointers
+        self.file_ids = file_ids
+        self.pointer_ids = pointer_ids
+
+    @classmethod
+    def from_segments(cls, segments: Dict[str, Origin]) -> 'SourceMap':
+        """Sort segments by output pointer and intern their file and pointer strings."""
+        files: Dict[str, int] = {}
+        pointers: Dict[str, int] = {}
+        outputs = sorted(segments)
+        file_ids = array('l')
+        pointer_ids = array('l')
+        for output in outputs:
+            file, pointer = segments[output]
+            file_ids.append(files.setdefault(file, len(files)))
+            pointer_ids.append(pointers.setdefault(pointer, len(pointers)))
+        return cls(outputs, list(files), list(pointers), file_ids, pointer_ids)
+
+    def __len__(self) -> int:
+        return len(self.outputs)
+
+    def segment(self, output: str) -> Optional[Origin]:
+        """The origin recorded for exactly this output pointer, by binary search."""
+        index = bisect_left(self.outputs, output)
+        if index < len(self.outputs) and self.outputs[index] == output:
+            return self.files[self.file_ids[index]], self.pointers[self.pointer_ids[index]]
+        return None
+
+    def lookup(self, pointer: str) -> Optional[Origin]:
+        """
+        Find where the node at an output pointer came from.
+
+        The deepest recorded ancestor of the pointer (or the pointer itself)
+        is found with one binary search per path level, and the rest of the
+        path is appended to its source pointer.
+
+        Args:
+            pointer: JSON pointer into the combined output, e.g.
+                '/paths/~1payments/post' ('#' prefixes are accepted)
+
+        Returns:
+            (file, pointer) of the source node, or None if the pointer lies
+            outside the mapped output
+        """
+        pointer = pointer.lstrip('#')
+        if pointer and not pointer.startswith('/'):
+            pointer = '/' + pointer
+        prefix = pointer
+        while True:
+            origin = self.segment(prefix)
+            if origin is not None:
+                file, source = origin
+                suffix = pointer[len(prefix):]
+                return file, (source.rstrip('/') + suffix) if suffix else source
+            if not prefix:
+                return None
+            prefix = prefix[:prefix.rfind('/')]
+
+    def __iter__(self) -> Iterator[Tuple[str, Origin]]:
+        for index, output in enumerate(self.outputs):
+            yield output, (self.files[self.file_ids[index]], self.pointers[self.pointer_ids[index]])
+
+    def to_json(self, output_file: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Compact JSON form.
+
+        Segments are [shared, suffix, file, pointer] rows: the output pointer
+        is stored as the length of the prefix it shares with the previous
+        row's pointer plus the rest of it, and file and pointer index the
+        interned string tables.
+        """
+        rows = []
+        previous = ''
+        for index, output in enumerate(self.outputs):
+            shared = common_prefix_length(previous, output)
+            rows.append([shared, output[shared:], self.file_ids[index], self.pointer_ids[index]])
+            previous = output
+        return {'version': FORMAT_VERSION, 'output': output_file, 'files': self.files,
+                'pointers': self.pointers, 'segments': rows}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> 'SourceMap':
+        if data.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported source map version: {data.get('version')}")
+        outputs = []
+        file_ids = array('l')
+        pointer_ids = array('l')
+        previous = ''
+        for shared, suffix, file_id, pointer_id in data['segments']:
+            previous = previous[:shared] + suffix
+            outputs.append(previous)
+            file_ids.append(file_id)
+            pointer_ids.append(pointer_id)
+        return cls(outputs, data['files'], data['pointers'], file_ids, pointer_ids)
+
+    def write(self, map_file: str, output_file: Optional[str] = None) -> None:
+        with open(map_file, 'w', encoding='utf-8') as f:
+            json.dump(self.to_json(output_file), f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, map_file: str) -> 'SourceMap':
+        with open(map_file, 'r', encoding='utf-8') as f:
+            return cls.from_json(json.load(f))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Look up where nodes of a combined OpenAPI spec came from')
+    parser.add_argument('map_file', help='Source map written with --source-map (e.g. openapi-combined.map.json)')
+    parser.add_argument('pointers', nargs='+', help="JSON pointers into the combined output, e.g. '/paths/~1payments'")
+    args = parser.parse_args()
+
+    source_map = SourceMap.load(args.map_file)
+    for pointer in args.pointers:
+        origin = source_map.lookup(pointer)
+        print(f"{pointer} -> {origin[0]}{origin[1]}" if origin else f"{pointer} -> (not mapped)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Resolution profiling for the spec combiners.
+Collects per-file load times, per-target reference counts and cache hit rates while a
+spec is combined, and writes them as a JSON report next to the combined output.
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from spec_cache import ParseCache
+
+
+DEFAULT_TOP = 20
+
+
+def stats_path(output_file: str) -> str:
+    """Report path for an output file: openapi-combined.json -> openapi-combined.stats.json."""
+    root, _ = os.path.splitext(output_file)
+    return f"{root}.stats.json"
+
+
+def ratio(hits: int, misses: int) -> Optional[float]:
+    total = hits + misses
+    return round(hits / total, 4) if total else None
+
+
+class ResolutionStats:
+    def __init__(self, trace_memory: bool = True, parse_cache: Optional[ParseCache] = None):
+        """
+        Start collecting statistics for one combine run.
+
+        Call finish() (report() does) when the run ends, including when it
+        fails, to stop the memory trace.
+
+        Args:
+            trace_memory: Measure peak memory with tracemalloc (slows resolution
+                down noticeably while enabled)
+            parse_cache: The parse cache the run loads files through, if any;
+                its hits and misses are reported for this run only
+        """
+        self.started = time.perf_counter()
+        self.elapsed: Optional[float] = None
+        # file label -> {"loads", "seconds", "bytes"}; a file is loaded more
+        # than once only when a memory budget evicted it
+        self.files: Dict[str, Dict[str, Any]] = {}
+        # target label -> number of references to it
+        self.references: Counter = Counter()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.peak_memory: Optional[int] = None
+        self.parse_cache = parse_cache
+        self.parse_cache_start = (parse_cache.hits, parse_cache.misses) if parse_cache is not None else (0, 0)
+        self._lock = threading.Lock()
+
+        self._owns_trace = trace_memory and not tracemalloc.is_tracing()
+        if self._owns_trace:
+            tracemalloc.start()
+        if trace_memory:
+            tracemalloc.reset_peak()
+
+    def record_load(self, label: str, seconds: float, size: Optional[int]) -> None:
+        """Record the time taken to read and parse one file."""
+        with self._lock:
+            entry = self.files.setdefault(label, {'loads': 0, 'seconds': 0.0, 'bytes': size})
+            entry['loads'] += 1
+            entry['seconds'] = round(entry['seconds'] + seconds, 6)
+            entry['bytes'] = size
+
+    def record_reference(self, label: str, cached: bool) -> None:
+        """Record one reference to a target, and whether its resolution was already cached."""
+        self.references[label] += 1
+        if cached:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+
+    def finish(self) -> None:
+        """Stop the clock and the memory trace."""
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self.started
+            if tracemalloc.is_tracing():
+                self.peak_memory = tracemalloc.get_traced_memory()[1]
+                if self._owns_trace:
+                    tracemalloc.stop()
+
+    def report(self, resolved: Dict[str, Any], caches: Optional[Dict[str, Dict[str, Any]]] = None,
+               top: int = DEFAULT_TOP) -> Dict[str, Any]:
+        """
+        Build the report.
+
+        Args:
+            resolved: Target label -> resolved content, for subtree sizes
+            caches: Name -> BoundedCache.summary() of memory-bounded caches, if any
+            top: Number of entries in the hottest-pointer and largest-subtree lists
+
+        Returns:
+            The report as a JSON-serializable dict
+        """
+        self.finish()
+
+        subtrees: List[Dict[str, Any]] = []
+        for label, value in resolved.items():
+            if value is None:
+                continue
+            size = len(json.dumps(value, separators=(',', ':')))
+            uses = self.references.get(label, 0)
+            subtrees.append({'target': label, 'bytes': size, 'references': uses,
+                             'inlined_bytes': size * uses})
+        subtrees.sort(key=lambda entry: (-entry['bytes'], entry['target']))
+
+        files = [{'file': label, **entry} for label, entry in self.files.items()]
+        files.sort(key=lambda entry: (-entry['seconds'], entry['file']))
+        parse_hits = parse_misses = 0
+        if self.parse_cache is not None:
+            parse_hits = self.parse_cache.hits - self.parse_cache_start[0]
+            parse_misses = self.parse_cache.misses - self.parse_cache_start[1]
+
+        return {
+            'total_seconds': round(self.elapsed, 6),
+            'peak_memory_bytes': self.peak_memory,
+            'files': {
+                'count': len(files),
+                'loads': sum(entry['loads'] for entry in files),
+                'load_seconds': round(sum(entry['seconds'] for entry in files), 6),
+                'per_file': files,
+            },
+            'resolution': {
+                'targets': len(self.references),
+                'references': self.cache_hits + self.cache_misses,
+                'cache_hits': self.cache_hits,
+                'cache_misses': self.cache_misses,
+                'hit_ratio': ratio(self.cache_hits, self.cache_misses),
+            },
+            'parse_cache': None if self.parse_cache is None else {
+                'hits': parse_hits,
+                'misses': parse_misses,
+                'hit_ratio': ratio(parse_hits, parse_misses),
+            },
+            'bounded_caches': caches,
+            'hottest_pointers': [{'target': label, 'references': count}
+                                 for label, count in sorted(self.references.items(),
+                                                            key=lambda item: (-item[1], item[0]))[:top]],
+            'largest_subtrees': subtrees[:top],
+        }
+
+    def write(self, report_file: str, resolved: Dict[str, Any],
+              caches: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Build the report and write it as indented JSON."""
+        report = self.report(resolved, caches)
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        return report
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Iterative traversal of JSON documents.
+Rebuilds documents with an explicit work stack instead of Python recursion, so
+arbitrarily deep specs can be processed without hitting the recursion limit,
+and follows the $refs of a document to the files they reach.
+"""
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+
+class Replace:
+    """Place a value in the output as-is, without traversing it."""
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+class Descend:
+    """
+    Rebuild some parts first, then place finish(results) in the output.
+
+    Each part is a (value, context) pair; the values are traversed like any
+    other node, in the given context, and their rebuilt forms are passed to
+    finish in the same order.
+    """
+    __slots__ = ('parts', 'finish')
+
+    def __init__(self, parts: Sequence[Tuple[Any, Any]], finish: Callable[[List[Any]], Any]):
+        self.parts = parts
+        self.finish = finish
+
+
+# Callback for dicts containing '$ref': returns None to copy the dict normally
+RefHandler = Callable[[dict, Any], Optional[Union[Replace, Descend]]]
+
+
+def rebuild(root: Any, context: Any, on_ref: RefHandler) -> Any:
+    """
+    Copy a document, letting on_ref substitute every dict that has a '$ref' key.
+
+    Nodes are visited depth first in document order, like a recursive walk
+    would, so callbacks see the same sequence of references. Dicts and lists
+    are copied; everything else is shared. Only plain dict and list
+    containers (as produced by json.load) are traversed.
+
+    Args:
+        root: The document (or subtree) to rebuild
+        context: Opaque value passed to on_ref, e.g. the file the node came from
+        on_ref: Called as on_ref(node, context) for each dict with a '$ref' key.
+            Returns None to copy the node normally, Replace to substitute a
+            final value, or Descend to substitute the result of rebuilding
+            other values (possibly in other contexts)
+
+    Returns:
+        The rebuilt document
+    """
+    out = [None]
+    # Work items are (node, context, container, slot): rebuild node and store
+    # it in container[slot]. A Descend in the node position is a pending
+    # finish step whose context slot holds the results list.
+    stack: List[tuple] = [(root, context, out, 0)]
+    push = stack.append
+    pop = stack.pop
+
+    while stack:
+        node, ctx, container, slot = pop()
+        kind = type(node)
+        if kind is dict:
+            if '$ref' in node:
+                action = on_ref(node, ctx)
+                if action is not None:
+                    if type(action) is Replace:
+                        container[slot] = action.value
+                        continue
+                    parts = action.parts
+                    results = [None] * len(parts)
+                    push((action, results, container, slot))
+                    for index in range(len(parts) - 1, -1, -1):
+                        value, part_ctx = parts[index]
+                        push((value, part_ctx, results, index))
+                    continue
+            container[slot] = copy = node.copy()
+            for key, value in reversed(node.items()):
+                kind = type(value)
+                if kind is dict or kind is list:
+                    push((value, ctx, copy, key))
+        elif kind is list:
+            container[slot] = copy = node.copy()
+            index = len(node)
+            for value in reversed(node):
+                index -= 1
+                kind = type(value)
+                if kind is dict or kind is list:
+                    push((value, ctx, copy, index))
+        elif kind is Descend:
+            container[slot] = node.finish(ctx)
+        else:
+            container[slot] = node
+
+    return out[0]
+
+
+def rewrite_refs(root: Any, rewrite: Callable[[str], Optional[str]]) -> int:
+    """
+    Rewrite every string '$ref' of a document in place.
+
+    Unlike rebuild, nothing is copied: only the dicts whose '$ref' changes
+    are modified, so the walk allocates no containers of its own besides
+    its work stack.
+
+    Args:
+        root: The document (or subtree) to walk; a dict or a list
+        rewrite: Returns the new value of a '$ref', or None to keep it
+
+    Returns:
+        The number of refs rewritten
+    """
+    rewritten = 0
+    stack = [root]
+    push = stack.append
+    pop = stack.pop
+    while stack:
+        node = pop()
+        if type(node) is dict:
+            if '$ref' in node:
+                ref = node['$ref']
+                if type(ref) is str:
+                    new_ref = rewrite(ref)
+                    if new_ref is not None and new_ref != ref:
+                        node['$ref'] = new_ref
+                        rewritten += 1
+            values = node.values()
+        else:
+            values = node
+        for value in values:
+            kind = type(value)
+            if kind is dict or kind is list:
+                push(value)
+    return rewritten
+
+
+def find_cycles(roots: Iterable[Hashable], successors: Callable[[Hashable], Iterable[Hashable]]) -> Set[Hashable]:
+    """
+    Find every node that lies on a cycle of a directed graph.
+
+    Uses an iterative version of Tarjan's strongly connected components
+    algorithm, so the graph is explored once and deep reference chains are
+    safe. A node is on a cycle if its component has more than one node or it
+    has an edge to itself.
+
+    Args:
+        roots: Nodes to start exploring from
+        successors: Returns the nodes a node has edges to
+
+    Returns:
+        The nodes reachable from roots that lie on a cycle
+    """
+    index: Dict[Hashable, int] = {}
+    lowlink: Dict[Hashable, int] = {}
+    on_stack: Set[Hashable] = set()
+    component_stack: List[Hashable] = []
+    edges: Dict[Hashable, List[Hashable]] = {}
+    cyclic: Set[Hashable] = set()
+
+    for root in roots:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = len(index)
+        edges[root] = list(successors(root))
+        component_stack.append(root)
+        on_stack.add(root)
+        work = [(root, 0)]
+        while work:
+            node, position = work[-1]
+            node_edges = edges[node]
+            if position < len(node_edges):
+                work[-1] = (node, position + 1)
+                child = node_edges[position]
+                if child not in index:
+                    index[child] = lowlink[child] = len(index)
+                    edges[child] = list(successors(child))
+                    component_stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, 0))
+                elif child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    member = component_stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                if len(component) > 1 or node in node_edges:
+                    cyclic.update(component)
+
+    return cyclic
+
+
+def iter_refs(data: Any) -> Iterator[str]:
+    """Yield every $ref string found anywhere in a loaded document."""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            ref = node.get('$ref')
+            if isinstance(ref, str):
+                yield ref
+            stack.extend(value for value in node.values() if isinstance(value, (dict, list)))
+        elif isinstance(node, list):
+            stack.extend(item for item in node if isinstance(item, (dict, list)))
+
+
+def prefetch_ref_graph(entry_path: Path, load_file: Callable[[Path], Any],
+                       ref_file: Callable[[str, Path], Path],
+                       max_workers: Optional[int] = None) -> Set[Path]:
+    """
+    Load every file reachable through external $refs from an entry document.
+
+    Files are loaded in breadth-first waves on a thread pool. Each worker
+    loads one file through load_file (which is expected to cache it) and
+    scans it for further external refs, so opening and reading files overlaps
+    instead of happening one at a time during resolution.
+
+    Args:
+        entry_path: The entry document
+        load_file: Loader that parses and caches a file, returning None on failure
+        ref_file: Maps the file part of a $ref and the referencing file to a path
+        max_workers: Thread pool size (default: ThreadPoolExecutor's default)
+
+    Returns:
+        The set of files that were reached
+    """
+    def load_and_scan(file_path: Path) -> Set[Path]:
+        data = load_file(file_path)
+        if data is None:
+            return set()
+        targets = set()
+        for ref in iter_refs(data):
+            file_ref = ref.split('#', 1)[0]
+            if file_ref:
+                targets.add(ref_file(file_ref, file_path))
+        return targets
+
+    # Imported here: prefetching is optional, and concurrent.futures is slow to import
+    from concurrent.futures import ThreadPoolExecutor
+
+    entry_path = entry_path.resolve()
+    seen = {entry_path}
+    wave = [entry_path]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while wave:
+            next_wave = []
+            for targets in pool.map(load_and_scan, wave):
+                for target in targets:
+                    if target not in seen:
+                        seen.add(target)
+                        next_wave.append(target)
+            wave = next_wave
+    return seen
@@ -5,10 +5,24 @@ Test suite for OpenAPI Schema Combiner
 
 import json
 import os
+import subprocess
+import sys
 import tempfile
 import unittest
 from pathlib import Path
-from openapi_combiner import OpenAPICombiner
+from unittest import mock
+import bundle_schemas
+from bundle_openapi import create_llm_bundle
+from combine_openapi import OpenAPIResolver
+from lazy_spec import LazySpec
+from openapi_combiner import OpenAPICombiner, combine_manifest
+from spec_cache import BoundedCache, ParseCache
+from spec_flatten import SchemaFlattener, flatten_schemas
+from spec_pointer import PointerError, PointerIndex
+from spec_prune import prune_unreachable_schemas
+from spec_shard import ShardIndex, write_shards
+from spec_slice import SpecSlicer
+from spec_sourcemap import SourceMap
 
 
 class TestOpenAPICombiner(unittest.TestCase):
@@ -229,6 +243,140 @@ class TestOpenAPICombiner(unittest.TestCase):
             "updateUser"
         )
     
+    def test_resolver_parses_each_file_once(self):
+        """Test the resolver shares one parsed document between every pointer into a file."""
+        self.create_test_file("schemas/users.json", {
+            "getUser": {"get": {"operationId": "getUser"}},
+            "updateUser": {"patch": {"operationId": "updateUser"}},
+            "deleteUser": {"delete": {"operationId": "deleteUser"}}
+        })
+        main_file = self.create_test_file("openapi.json", {
+            "openapi": "3.0.2",
+            "paths": {
+                "/users/{id}": {"$ref": "./schemas/users.json#/getUser"},
+                "/users/{id}/update": {"$ref": "./schemas/users.json#/updateUser"},
+                "/users/{id}/delete": {"$ref": "./schemas/users.json#/deleteUser"}
+            }
+        })
+        
+        resolver = OpenAPIResolver(self.test_dir)
+        result = resolver.combine_openapi(str(main_file), str(self.test_path / "combined.json"))
+        
+        self.assertEqual(result["paths"]["/users/{id}/delete"]["delete"]["operationId"], "deleteUser")
+        self.assertEqual(resolver.documents.summary(), {"files": 2, "loads": 2, "reloads": 0})
+    
+    def test_repeated_ref_same_file_resolved(self):
+        """Test a schema referenced twice from one file is resolved at both sites."""
+        self.create_test_file("schemas/types.json", {
+            "Address": {
+                "type": "object",
+                "properties": {"street": {"type": "string"}}
+            }
+        })
+        self.create_test_file("schemas/customer.json", {
+            "Customer": {
+                "type": "object",
+                "properties": {
+                    "address": {"$ref": "./types.json#/Address"},
+                    "mailingAddress": {"$ref": "./types.json#/Address"}
+                }
+            }
+        })
+        openapi_content = {
+            "openapi": "3.0.2",
+            "components": {
+                "schemas": {
+                    "Customer": {"$ref": "./schemas/customer.json#/Customer"},
+                    "Address": {"$ref": "./schemas/types.json#/Address"}
+                }
+            }
+        }
+        main_file = self.create_test_file("openapi.json", openapi_content)
+        
+        combiner = OpenAPICombiner(self.test_dir)
+        result = combiner.combine(str(main_file))
+        
+        properties = result["components"]["schemas"]["Customer"]["properties"]
+        self.assertEqual(properties["address"]["type"], "object")
+        self.assertEqual(properties["mailingAddress"]["type"], "object")
+        
+        # Every use site shares the single resolved subtree
+        self.assertIs(properties["address"], properties["mailingAddress"])
+        self.assertIs(properties["address"], result["components"]["schemas"]["Address"])
+    
+    def test_self_referencing_schema_terminates(self):
+        """Test a recursive schema does not loop forever."""
+        self.create_test_file("schemas/tree.json", {
+            "Node": {
+                "type": "object",
+                "properties": {
+                    "children": {
+                        "type": "array",
+                        "items": {"$ref": "#/Node"}
+                    }
+                }
+            }
+        })
+        openapi_content = {
+            "openapi": "3.0.2",
+            "components": {
+                "schemas": {
+                    "Node": {"$ref": "./schemas/tree.json#/Node"}
+                }
+            }
+        }
+        main_file = self.create_test_file("openapi.json", openapi_content)
+        
+        combiner = OpenAPICombiner(self.test_dir)
+        result = combiner.combine(str(main_file))
+        
+        node = result["components"]["schemas"]["Node"]
+        self.assertEqual(node["type"], "object")
+        self.assertEqual(node["properties"]["children"]["items"], {"$ref": "#/components/schemas/Node"})
+    
+    def test_mutually_recursive_schemas_are_hoisted(self):
+        """Test schemas on a reference cycle become components with local refs."""
+        self.create_test_file("schemas/person.json", {
+            "Person": {
+                "type": "object",
+                "properties": {"employer": {"$ref": "./company.json#/Company"}}
+            }
+        })
+        self.create_test_file("schemas/company.json", {
+            "Company": {
+                "type": "object",
+                "properties": {"employees": {"type": "array", "items": {"$ref": "./person.json#/Person"}}}
+            }
+        })
+        openapi_content = {
+            "openapi": "3.0.2",
+            "paths": {
+                "/people": {
+                    "get": {"responses": {"200": {"content": {"application/json": {
+                        "schema": {"type": "array", "items": {"$ref": "./schemas/person.json#/Person"}}
+                    }}}}}
+                }
+            }
+        }
+        main_file = self.create_test_file("openapi.json", openapi_content)
+        
+        combiner = OpenAPICombiner(self.test_dir)
+        result = combiner.combine(str(main_file))
+        
+        schema = result["paths"]["/people"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        self.assertEqual(schema["items"], {"$ref": "#/components/schemas/Person"})
+        schemas = result["components"]["schemas"]
+        self.assertEqual(list(schemas), ["Company", "Person"])
+        self.assertEqual(schemas["Person"]["properties"]["employer"], {"$ref": "#/components/schemas/Company"})
+        self.assertEqual(schemas["Company"]["properties"]["employees"]["items"],
+                         {"$ref": "#/components/schemas/Person"})
+        
+        # Streaming writes the same document
+        output_file = Path(self.test_dir) / "streamed.json"
+        OpenAPICombiner(self.test_dir).combine(str(main_file), str(output_file), stream=True)
+        with open(output_file) as f:
+            self.assertEqual(f.read(), json.dumps(result, indent=2))
+    
     def test_preserves_non_ref_content(self):
         """Test that content without $ref is preserved as-is."""
         openapi_content = {
@@ -471,6 +619,761 @@ class TestOpenAPICombiner(unittest.TestCase):
             "Get application"
         )
 
+    
+    def test_streaming_output_matches_json_dump(self):
+        """Test streamed output is byte-identical to the in-memory output."""
+        self.create_test_file("schemas/paths.json", {
+            "application": {
+                "get": {"summary": "Get application", "tags": ["applications"]}
+            }
+        })
+        openapi_content = {
+            "openapi": "3.0.2",
+            "info": {"title": "Test API \u00e9", "version": "1.0.0"},
+            "servers": [{"url": "https://api.example.com"}],
+            "paths": {
+                "/applications/{id}": {"$ref": "./schemas/paths.json#/application"},
+                "/health": {"get": {"responses": {}}}
+            },
+            "components": {}
+        }
+        main_file = self.create_test_file("openapi.json", openapi_content)
+        
+        for minify in (False, True):
+            expected_file = self.test_path / "expected.json"
+            streamed_file = self.test_path / "streamed.json"
+            OpenAPICombiner(self.test_dir).combine(str(main_file), str(expected_file), minify=minify)
+            result = OpenAPICombiner(self.test_dir).combine(
+                str(main_file), str(streamed_file), stream=True, minify=minify
+            )
+            
+            self.assertIsNone(result)
+            self.assertEqual(streamed_file.read_bytes(), expected_file.read_bytes())
+    
+    def test_streaming_drops_files_after_their_last_use(self):
+        """Test streaming releases each file and its resolved targets once no later path needs them."""
+        self.create_test_file("schemas/types.json", {"Id": {"type": "string"}})
+        for name in ("a", "b", "c"):
+            self.create_test_file(f"schemas/{name}.json", {"item": {"get": {"parameters": [
+                {"schema": {"$ref": "./types.json#/Id"}} if name != "b" else {"name": "b"}
+            ]}}})
+        main_file = self.create_test_file("openapi.json", {
+            "openapi": "3.0.2",
+            "paths": {f"/{name}": {"$ref": f"./schemas/{name}.json#/item"} for name in ("a", "b", "c")}
+        })
+        expected_file = self.test_path / "expected.json"
+        streamed_file = self.test_path / "streamed.json"
+        in_memory = OpenAPICombiner(self.test_dir)
+        in_memory.combine(str(main_file), str(expected_file))
+        
+        combiner = OpenAPICombiner(self.test_dir)
+        released = []
+        release_file = combiner.release_file
+        
+        def record(file_key):
+            released.append((Path(file_key).name, len(combiner.resolved_refs)))
+            release_file(file_key)
+        
+        with mock.patch.object(combiner, "release_file", record):
+            combiner.combine(str(main_file), str(streamed_file), stream=True)
+        
+        self.assertEqual(streamed_file.read_bytes(), expected_file.read_bytes())
+        self.assertEqual([name for name, _ in released], ["a.json", "b.json", "c.json", "types.json"])
+        self.assertEqual(released[0][1], 2)
+        self.assertEqual((len(combiner.resolved_refs), len(in_memory.resolved_refs)), (0, 4))
+        self.assertEqual(list(combiner.documents.files), [str(main_file.resolve())])
+    
+    def test_prefetch_loads_reachable_files(self):
+        """Test the prefetch pass loads every transitively referenced file."""
+        self.create_test_file("schemas/types.json", {"Id": {"type": "string"}})
+        self.create_test_file("schemas/paths.json", {
+            "user": {"get": {"parameters": [{"schema": {"$ref": "./types.json#/Id"}}]}}
+        })
+        self.create_test_file("schemas/unused.json", {"Unused": {"type": "string"}})
+        main_file = self.create_test_file("openapi.json", {
+            "openapi": "3.0.2",
+            "paths": {"/users/{id}": {"$ref": "./schemas/paths.json#/user"}}
+        })
+        
+        combiner = OpenAPICombiner(self.test_dir)
+        reached = combiner.prefetch(main_file, max_workers=4)
+        
+        self.assertEqual(reached, 3)
+        self.assertEqual(len(combiner.loaded_files), 3)
+        self.assertNotIn(str((self.test_path / "schemas/unused.json").resolve()), combiner.loaded_files)
+        
+        result = combiner.combine(str(main_file), jobs=4)
+        schema = result["paths"]["/users/{id}"]["get"]["parameters"][0]["schema"]
+        self.assertEqual(schema, {"type": "string"})
+    
+    def test_recombine_updates_only_dependent_sections(self):
+        """Test an incremental re-combine patches just the affected paths."""
+        self.create_test_file("schemas/payment.json", {
+            "Payment": {"type": "object", "description": "v1"}
+        })
+        self.create_test_file("schemas/paths.json", {
+            "payment": {"get": {"responses": {"200": {"schema": {"$ref": "./payment.json#/Payment"}}}}},
+            "health": {"get": {"summary": "Health check"}}
+        })
+        main_file = self.create_test_file("openapi.json", {
+            "openapi": "3.0.2",
+            "paths": {
+                "/payments/{id}": {"$ref": "./schemas/paths.json#/payment"},
+                "/health": {"$ref": "./schemas/paths.json#/health"}
+            }
+        })
+        
+        combiner = OpenAPICombiner(self.test_dir)
+        result = combiner.combine(str(main_file))
+        health = result["paths"]["/health"]
+        
+        changed = self.create_test_file("schemas/payment.json", {
+            "Payment": {"type": "object", "description": "v2"}
+        })
+        updated = combiner.recombine([changed])
+        
+        self.assertEqual(updated, 1)
+        schema = combiner.combined["paths"]["/payments/{id}"]["get"]["responses"]["200"]["schema"]
+        self.assertEqual(schema["description"], "v2")
+        self.assertIs(combiner.combined["paths"]["/health"], health)
+        self.assertEqual(combiner.combined, OpenAPICombiner(self.test_dir).combine(str(main_file)))
+    
+    def test_watch_survives_failed_runs(self):
+        """Test watch mode reports broken saves, keeps the last good output and recovers on the next change."""
+        main_file = self.test_path / "openapi.json"
+        main_file.write_text('{"openapi": "3.0.2", "paths": {')
+        output_file = self.test_path / "combined.json"
+        saves = iter([
+            '{"openapi": "3.0.2", "paths": {"/v1": {}}}',
+            '{"openapi": "3.0.2", "paths": {',
+            '{"openapi": "3.0.2", "paths": {"/v2": {}}}',
+        ])
+        outputs = []
+        
+        def next_save(interval):
+            outputs.append(json.loads(output_file.read_text()) if output_file.exists() else None)
+            content = next(saves, None)
+            if content is None:
+                raise KeyboardInterrupt
+            main_file.write_text(content)
+            # Distinct mtimes however coarse the file system's clock
+            mtime = os.stat(main_file).st_mtime_ns + len(outputs) * 10 ** 9
+            os.utime(main_file, ns=(mtime, mtime))
+        
+        with mock.patch("time.sleep", next_save), mock.patch("sys.stdout"):
+            OpenAPICombiner(self.test_dir).watch(str(main_file), str(output_file))
+        
+        self.assertEqual([output and list(output["paths"]) for output in outputs],
+                         [None, ["/v1"], ["/v1"], ["/v2"]])
+    
+    def test_deeply_nested_document(self):
+        """Test resolution does not depend on the Python recursion limit."""
+        self.create_test_file("schemas/types.json", {"Id": {"type": "string"}})
+        root = node = {}
+        for _ in range(sys.getrecursionlimit() * 2):
+            child = {}
+            node["properties"] = {"child": child}
+            node = child
+        node["id"] = {"$ref": "./schemas/types.json#/Id"}
+        
+        combiner = OpenAPICombiner(self.test_dir)
+        result = combiner.resolve_refs_recursive(root, self.test_path / "openapi.json")
+        
+        while "properties" in result:
+            result = result["properties"]["child"]
+        self.assertEqual(result["id"], {"type": "string"})
+    
+    def test_dedupe_emits_shared_schema_once(self):
+        """Test dedupe mode replaces repeated inlined schemas with local refs."""
+        address = {
+            "title": "Postal address",
+            "type": "object",
+            "properties": {
+                "street": {"type": "string"},
+                "city": {"type": "string"},
+                "postalCode": {"type": "string"}
+            }
+        }
+        self.create_test_file("schemas/types.json", {"Address": address})
+        self.create_test_file("schemas/paths.json", {
+            "customer": {"get": {"responses": {"200": {"content": {"application/json": {
+                "schema": {"type": "object", "properties": {"address": {"$ref": "./types.json#/Address"}}}
+            }}}}}},
+            "store": {"get": {"responses": {"200": {"content": {"application/json": {
+                "schema": {"$ref": "./types.json#/Address"}
+            }}}}}}
+        })
+        main_file = self.create_test_file("openapi.json", {
+            "openapi": "3.0.2",
+            "paths": {
+                "/customer": {"$ref": "./schemas/paths.json#/customer"},
+                "/store": {"$ref": "./schemas/paths.json#/store"}
+            }
+        })
+        
+        result = OpenAPICombiner(self.test_dir).combine(str(main_file), dedupe=True)
+        
+        self.assertEqual(result["components"]["schemas"], {"PostalAddress": address})
+        ref = {"$ref": "#/components/schemas/PostalAddress"}
+        customer = result["paths"]["/customer"]["get"]["responses"]["200"]["content"]["application/json"]
+        store = result["paths"]["/store"]["get"]["responses"]["200"]["content"]["application/json"]
+        self.assertEqual(customer["schema"]["properties"]["address"], ref)
+        self.assertEqual(store["schema"], ref)
+    
+    def test_flatten_merges_allof_and_sibling_refs(self):
+        """Test flatten mode merges each shared allOf composition once and applies sibling keywords."""
+        self.create_test_file("schemas/payment.json", {
+            "PaymentRelationships": {
+                "type": "object", "required": ["account"],
+                "properties": {"account": {"type": "string"}}
+            },
+            "AchPaymentRelationships": {"allOf": [
+                {"title": "ACH payment relationships"},
+                {"$ref": "#/PaymentRelationships"},
+                {"required": ["counterparty"], "properties": {"counterparty": {"type": "string"}}}
+            ]}
+        })
+        self.create_test_file("schemas/paths.json", {
+            "create": {"post": {"requestBody": {"content": {"application/json": {
+                "schema": {"$ref": "./payment.json#/AchPaymentRelationships"}
+            }}}}},
+            "update": {"patch": {"requestBody": {"content": {"application/json": {
+                "schema": {"$ref": "./payment.json#/AchPaymentRelationships", "nullable": True}
+            }}}}}
+        })
+        main_file = self.create_test_file("openapi.json", {
+            "openapi": "3.0.2",
+            "paths": {
+                "/payments": {"$ref": "./schemas/paths.json#/create"},
+                "/payments/{id}": {"$ref": "./schemas/paths.json#/update"}
+            }
+        })
+        
+        combiner = OpenAPICombiner(self.test_dir)
+        result = combiner.combine(str(main_file), flatten=True)
+        
+        merged = {
+            "title": "ACH payment relationships",
+            "type": "object", "required": ["account", "counterparty"],
+            "properties": {"account": {"type": "string"}, "counterparty": {"type": "string"}}
+        }
+        create = result["paths"]["/payments"]["post"]["requestBody"]["content"]["application/json"]
+        update = result["paths"]["/payments/{id}"]["patch"]["requestBody"]["content"]["application/json"]
+        self.assertEqual(create["schema"], merged)
+        self.assertEqual(update["schema"], {"nullable": True, **merged})
+        self.assertEqual(combiner.flattener.stats["allof_merged"], 1)
+        self.assertEqual(combiner.flattener.stats["sibling_refs_merged"], 1)
+        
+        combiner.flattener.clear()
+        self.assertEqual((combiner.flattener.flattened, combiner.flattener.merged_refs), ({}, {}))
+        self.assertEqual(combiner.flattener.stats["allof_merged"], 0)
+    
+    def test_flatten_schemas_follows_local_components_and_keeps_conflicts(self):
+        """Test flatten_schemas resolves local component members and keeps conflicting compositions."""
+        spec = {
+            "openapi": "3.0.2",
+            "paths": {"/things": {"get": {"responses": {"200": {"content": {"application/json": {
+                "schema": {"$ref": "#/components/schemas/Named"}
+            }}}}}}},
+            "components": {"schemas": {
+                "Base": {"type": "object", "properties": {"id": {"type": "string", "maxLength": 64}}},
+                "Named": {"allOf": [
+                    {"$ref": "#/components/schemas/Base"},
+                    {"properties": {"id": {"maxLength": 32}, "name": {"type": "string"}}}
+                ]},
+                "Broken": {"allOf": [{"type": "string"}, {"type": "integer"}]},
+                "Closed": {"type": "object", "additionalProperties": False, "properties": {"id": {"type": "string"}}},
+                "Extended": {"allOf": [
+                    {"$ref": "#/components/schemas/Closed"},
+                    {"properties": {"name": {"type": "string"}}}
+                ]},
+                "Narrowed": {"allOf": [
+                    {"$ref": "#/components/schemas/Closed"},
+                    {"properties": {"id": {"maxLength": 16}}}
+                ]},
+                "NullableBase": {"allOf": [{"nullable": True}, {"$ref": "#/components/schemas/Base"}]},
+                "NullableBoth": {"allOf": [{"nullable": True}, {"type": "object", "nullable": True}]}
+            }}
+        }
+        
+        result, stats = flatten_schemas(spec)
+        
+        schemas = result["components"]["schemas"]
+        self.assertEqual(schemas["Named"], {"type": "object", "properties": {
+            "id": {"type": "string", "maxLength": 32}, "name": {"type": "string"}
+        }})
+        self.assertEqual(schemas["Broken"], spec["components"]["schemas"]["Broken"])
+        # Merging would accept the name that Closed rejects
+        self.assertEqual(schemas["Extended"], spec["components"]["schemas"]["Extended"])
+        self.assertEqual(schemas["Narrowed"], {"type": "object", "additionalProperties": False, "properties": {
+            "id": {"type": "string", "maxLength": 16}
+        }})
+        # null passes only if every member accepts it
+        self.assertFalse(schemas["NullableBase"]["nullable"])
+        self.assertEqual(schemas["NullableBoth"], {"nullable": True, "type": "object"})
+        self.assertEqual(result["paths"], spec["paths"])
+        self.assertEqual((stats["allof_merged"], stats["conflicts"]), (4, 2))
+    
+    def test_flatten_schemas_drops_memos_made_without_components(self):
+        """Test a flattener reused by flatten_schemas merges local members it could not follow before."""
+        named = {"allOf": [{"$ref": "#/components/schemas/Base"}, {"properties": {"name": {"type": "string"}}}]}
+        spec = {"components": {"schemas": {"Base": {"type": "object"}, "Named": named}}}
+        flattener = SchemaFlattener()
+        self.assertIs(flattener.flatten(named), named)
+        
+        result, _ = flatten_schemas(spec, flattener)
+        
+        self.assertEqual(result["components"]["schemas"]["Named"],
+                         {"type": "object", "properties": {"name": {"type": "string"}}})
+    
+    def test_source_map_points_back_to_sources(self):
+        """Test the source map finds the file and pointer of inlined nodes, streamed or not."""
+        self.create_test_file("schemas/types.json", {"components": {"schemas": {
+            "Amount": {"type": "integer", "format": "int64"},
+            "Payment": {"type": "object", "properties": {"amount": {"$ref": "#/components/schemas/Amount"}}}
+        }}})
+        self.create_test_file("schemas/paths.json", {
+            "payments": {"get": {"responses": {"200": {"content": {"application/json": {
+                "schema": {"type": "array", "items": {"$ref": "./types.json#/components/schemas/Payment"}}
+            }}}}}}
+        })
+        main_file = self.create_test_file("openapi.json", {
+            "openapi": "3.0.2",
+            "info": {"title": "Payments", "version": "1.0"},
+            "paths": {"/payments": {"$ref": "./schemas/paths.json#/payments"}}
+        })
+        output = self.test_path / "combined.json"
+        
+        maps = []
+        for stream in (False, True):
+            OpenAPICombiner(self.test_dir).combine(str(main_file), str(output), stream=stream,
+                                                   source_map_file=str(self.test_path / "combined.map.json"))
+            maps.append(SourceMap.load(str(self.test_path / "combined.map.json")))
+        
+        self.assertEqual(list(maps[0]), list(maps[1]))
+        source_map = maps[0]
+        schema = "/paths/~1payments/get/responses/200/content/application~1json/schema"
+        self.assertEqual(source_map.lookup("/info/title"), ("openapi.json", "#/info/title"))
+        self.assertEqual(source_map.lookup("/paths/~1payments/get"), ("schemas/paths.json", "#/payments/get"))
+        self.assertEqual(source_map.lookup(schema + "/items/type"),
+                         ("schemas/types.json", "#/components/schemas/Payment/type"))
+        self.assertEqual(source_map.lookup(schema + "/items/properties/amount/format"),
+                         ("schemas/types.json", "#/components/schemas/Amount/format"))
+    
+    def test_schema_directory_scan_is_path_ordered(self):
+        """Test the schemas directory scan keeps the first path's definition and reports duplicates."""
+        self.create_test_file("schemas/b/payment.json", {"components": {"schemas": {
+            "Payment": {"type": "object", "title": "b"}, "Amount": {"type": "integer"}
+        }}})
+        self.create_test_file("schemas/a/payment.json", {"components": {"schemas": {
+            "Payment": {"type": "object", "title": "a"}, "Amount": {"type": "integer"}
+        }}})
+        self.create_test_file("schemas/a/status.json", {"type": "string", "enum": ["Sent"]})
+        (self.test_path / "schemas" / "broken.json").write_text("{")
+        
+        results = []
+        with mock.patch.object(bundle_schemas, "PARALLEL_MIN_FILES", 1):
+            for jobs in (1, 2):
+                results.append(bundle_schemas.collect_schemas_from_directory(self.test_path / "schemas", jobs=jobs))
+        
+        self.assertEqual(results[0], results[1])
+        schemas, report = results[0]
+        self.assertEqual(list(schemas), ["Payment", "Amount", "status"])
+        self.assertEqual(schemas["Payment"]["title"], "a")
+        self.assertEqual(report["files"], 4)
+        self.assertEqual(report["duplicates"], [
+            {"schema": "Payment", "kept": "a/payment.json", "ignored": ["b/payment.json"], "identical": False},
+            {"schema": "Amount", "kept": "a/payment.json", "ignored": ["b/payment.json"], "identical": True}
+        ])
+        self.assertEqual([error["file"] for error in report["errors"]], ["broken.json"])
+    
+    def test_incremental_schema_bundle_matches_full_rebuild(self):
+        """Test re-bundling rereads only changed files and writes what a full rebuild would."""
+        main_file = self.create_test_file("openapi.json", {"openapi": "3.0.2", "components": {"schemas": {
+            "Payment": {"type": "object", "title": "main"}, "Limit": {"type": "integer"}
+        }}})
+        self.create_test_file("schemas/b.json", {"components": {"schemas": {"Payment": {"title": "b"}}}})
+        self.create_test_file("schemas/c.json", {"type": "string"})
+        output = self.test_path / "schemas.json"
+        full_output = self.test_path / "full.json"
+        
+        def bundle():
+            with mock.patch("sys.stdout"):
+                report = bundle_schemas.create_bundled_schemas(main_file, self.test_path / "schemas", output)
+                bundle_schemas.create_bundled_schemas(main_file, self.test_path / "schemas", full_output,
+                                                      incremental=False)
+            self.assertEqual(output.read_text(), full_output.read_text())
+            return report
+        
+        bundle()
+        with mock.patch("sys.stdout"), mock.patch.object(bundle_schemas, "read_schema_file", side_effect=AssertionError):
+            report = bundle_schemas.create_bundled_schemas(main_file, self.test_path / "schemas", output)
+        self.assertEqual((report["added"], report["changed"], report["removed"]), ([], [], []))
+        
+        self.create_test_file("schemas/a.json", {"components": {"schemas": {"Payment": {"title": "a"}}}})
+        report = bundle()
+        self.assertEqual(report["added"], ["a.json"])
+        self.assertEqual(report["duplicates"][0]["kept"], "a.json")
+        
+        (self.test_path / "schemas" / "a.json").unlink()
+        self.create_test_file("schemas/c.json", {"type": "string", "maxLength": 8})
+        report = bundle()
+        self.assertEqual((report["changed"], report["removed"]), (["c.json"], ["a.json"]))
+        self.assertEqual(json.loads(output.read_text())["components"]["schemas"]["Payment"], {"title": "b"})
+        
+        # A file that cannot be checked drops its schemas until it can again
+        check_source = bundle_schemas.check_source
+        
+        def failing(error):
+            def check(file_path, entry):
+                if Path(file_path).name == "b.json":
+                    raise error
+                return check_source(file_path, entry)
+            return mock.patch.object(bundle_schemas, "check_source", side_effect=check)
+        
+        with failing(PermissionError("denied")):
+            report = bundle()
+            self.assertEqual(report["changed"], ["b.json"])
+            self.assertEqual(json.loads(output.read_text())["components"]["schemas"]["Payment"]["title"], "main")
+            self.assertEqual(bundle()["changed"], [])
+        with failing(FileNotFoundError("gone")):
+            self.assertEqual(bundle()["removed"], ["b.json"])
+        self.assertEqual(bundle()["added"], ["b.json"])
+        self.assertEqual(json.loads(output.read_text())["components"]["schemas"]["Payment"], {"title": "b"})
+    
+    def test_schema_bundle_dedupe_aliases_identical_schemas(self):
+        """Test dedupe keeps one of each identical schema and turns the others into references."""
+        main_file = self.create_test_file("openapi.json", {"openapi": "3.0.2"})
+        shared = {"type": "object", "properties": {"customer": {"$ref": "../types.json#/Customer"}}}
+        local = {"type": "object", "properties": {"customer": {"$ref": "./types.json#/Customer"}}}
+        self.create_test_file("schemas/a/fee.json", {"components": {"schemas": {"FeeRelationships": shared}}})
+        self.create_test_file("schemas/b/payment.json", {"components": {"schemas": {
+            "PaymentRelationships": shared, "AtmRelationships": local
+        }}})
+        self.create_test_file("schemas/c/check.json", {"components": {"schemas": {"CheckRelationships": local}}})
+        output = self.test_path / "schemas.json"
+        
+        with mock.patch("sys.stdout"):
+            report = bundle_schemas.create_bundled_schemas(main_file, self.test_path / "schemas", output,
+                                                           dedupe=True)
+        
+        schemas = json.loads(output.read_text())["components"]["schemas"]
+        self.assertEqual(schemas["FeeRelationships"], shared)
+        self.assertEqual(schemas["PaymentRelationships"], {"$ref": "#/components/schemas/FeeRelationships"})
+        # ./types.json means b/types.json and c/types.json: not the same schema
+        self.assertEqual(schemas["AtmRelationships"], local)
+        self.assertEqual(schemas["CheckRelationships"], local)
+        self.assertEqual(report["aliases"], [{"schema": "PaymentRelationships", "canonical": "FeeRelationships"}])
+    
+    def test_prune_unreachable_schemas_follows_files_and_mappings(self):
+        """Test pruning keeps schemas reached through path files and discriminator mappings only."""
+        self.create_test_file("schemas/paths.json", {"payments": {"get": {"responses": {"200": {"content": {
+            "application/json": {"schema": {"$ref": "./payment.json#/components/schemas/Payment"}}
+        }}}}}})
+        main_file = self.create_test_file("openapi.json", {
+            "openapi": "3.0.2",
+            "paths": {"/payments": {"$ref": "./schemas/paths.json#/payments"}}
+        })
+        bundle = {
+            "openapi": "3.0.2",
+            "paths": {"/payments": {"$ref": "./schemas/paths.json#/payments"}},
+            "components": {"schemas": {
+                "Payment": {"discriminator": {"propertyName": "type", "mapping": {
+                    "ach": "#/components/schemas/AchPayment", "book": "BookPayment"
+                }}},
+                "AchPayment": {"properties": {"amount": {"$ref": "../types.json#/components/schemas/Amount"}}},
+                "BookPayment": {"type": "object"},
+                "Amount": {"type": "integer"},
+                "Unused": {"properties": {"amount": {"$ref": "#/components/schemas/Amount"}}}
+            }}
+        }
+        
+        pruned, report = prune_unreachable_schemas(bundle, str(main_file))
+        
+        self.assertEqual(list(pruned["components"]["schemas"]), ["Payment", "AchPayment", "BookPayment", "Amount"])
+        self.assertEqual((report["kept"], report["removed"]), (4, ["Unused"]))
+        self.assertIn("Unused", bundle["components"]["schemas"])
+        
+        bundle["paths"]["/refunds"] = {"$ref": "./schemas/missing.json#/refunds"}
+        pruned, report = prune_unreachable_schemas(bundle, str(main_file))
+        self.assertIs(pruned, bundle)
+        self.assertEqual(len(report["unresolved"]), 1)
+    
+    def test_shards_carry_their_schema_closure(self):
+        """Test sharded bundles inline path files, carry the schemas they need and index operations."""
+        def operation(operation_id, schema):
+            return {"operationId": operation_id, "responses": {"200": {"content": {
+                "application/json": {"schema": schema}
+            }}}}
+        self.create_test_file("schemas/payment/paymentPaths.json", {
+            "payments": {"get": operation("listPayments", {"$ref": "./payment.json#/components/schemas/Payment"})}
+        })
+        main_file = self.create_test_file("openapi.json", {"openapi": "3.0.2"})
+        bundle = {
+            "openapi": "3.0.2",
+            "info": {"title": "Unit", "version": "1.0"},
+            "paths": {
+                "/payments": {"$ref": "./schemas/payment/paymentPaths.json#/payments"},
+                "/accounts/{id}": {"get": operation("getAccount", {"$ref": "#/components/schemas/Account"})}
+            },
+            "components": {"schemas": {
+                "Account": {"properties": {"id": {"$ref": "../types.json#/components/schemas/Id"}}},
+                "Payment": {"properties": {"amount": {"$ref": "#/components/schemas/Amount"}}},
+                "Amount": {"type": "integer"},
+                "Id": {"type": "string"}
+            }}
+        }
+        shard_dir = self.test_path / "shards"
+        
+        index = write_shards(bundle, str(shard_dir), str(main_file))
+        self.assertEqual(index["over_budget"], [])
+        for name, shard in index["shards"].items():
+            self.assertEqual(shard["bytes"], (shard_dir / name).stat().st_size)
+        
+        self.assertEqual(index["paths"], {"/payments": "payments.json", "/accounts/{id}": "accounts.json"})
+        shards = ShardIndex(str(shard_dir / "index.json"))
+        shard, found = shards.operation("listPayments")
+        self.assertEqual(list(shard["paths"]), ["/payments"])
+        self.assertEqual(found["operationId"], "listPayments")
+        self.assertEqual(list(shard["components"]["schemas"]), ["Payment", "Amount"])
+        self.assertEqual(list(shards.loaded), ["payments.json"])
+        shard, _ = shards.path("/accounts/{id}")
+        self.assertEqual(shard["components"]["schemas"]["Account"]["properties"]["id"],
+                         {"$ref": "#/components/schemas/Id"})
+        self.assertEqual(list(shard["components"]["schemas"]), ["Account", "Id"])
+        
+        # Over the budget, every path gets a shard of its own
+        index = write_shards(bundle, str(shard_dir), str(main_file), shard_by="tag", max_bytes=1)
+        self.assertEqual(sorted(index["shards"]), ["untagged-2.json", "untagged.json"])
+        self.assertEqual(sorted(index["over_budget"]), ["untagged-2.json", "untagged.json"])
+        self.assertEqual(sorted(path.name for path in shard_dir.iterdir()),
+                         ["index.json", "untagged-2.json", "untagged.json"])
+    
+    def test_llm_bundle_rewrites_ref_prefixes(self):
+        """Test the LLM bundle localizes the default and any configured ref prefixes."""
+        openapi_file = self.create_test_file("openapi.json", {"openapi": "3.0.2", "paths": {"/things": {"get": {
+            "responses": {"200": {"content": {"application/json": {"schema": {
+                "type": "array", "items": {"$ref": "./schemas.json#/components/schemas/Thing"}
+            }}}}}
+        }}}})
+        schemas_file = self.create_test_file("schemas.json", {"components": {"schemas": {
+            "Thing": {"properties": {"id": {"$ref": "../types.json#/components/schemas/Id"},
+                                     "self": {"$ref": "./schemas.json#/components/schemas/Thing"}}},
+            "Id": {"type": "string"}
+        }}})
+        output = self.test_path / "bundled.json"
+        
+        with mock.patch("sys.stdout"):
+            create_llm_bundle(openapi_file, schemas_file, output)
+        bundled = json.loads(output.read_text())
+        schema = bundled["paths"]["/things"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        self.assertEqual(schema["items"], {"$ref": "#/components/schemas/Thing"})
+        thing = bundled["components"]["schemas"]["Thing"]
+        self.assertEqual(thing["properties"]["self"], {"$ref": "#/components/schemas/Thing"})
+        self.assertEqual(thing["properties"]["id"], {"$ref": "../types.json#/components/schemas/Id"})
+        
+        with mock.patch("sys.stdout"):
+            create_llm_bundle(openapi_file, schemas_file, output,
+                              ref_prefixes={"./schemas.json#/": "#/", "../types.json#/": "#/"})
+        thing = json.loads(output.read_text())["components"]["schemas"]["Thing"]
+        self.assertEqual(thing["properties"]["id"], {"$ref": "#/components/schemas/Id"})
+    
+    def test_spec_slice_keeps_component_closure(self):
+        """Test a slice keeps its operations' components, transitively, and nothing else."""
+        pet = {"$ref": "#/components/schemas/Pet"}
+        spec = {
+            "openapi": "3.0.2", "info": {"title": "Pets", "version": "1"},
+            "tags": [{"name": "pets"}, {"name": "stores"}],
+            "paths": {
+                "/pets": {
+                    "parameters": [{"$ref": "#/components/parameters/Limit"}],
+                    "get": {"operationId": "listPets", "tags": ["pets"],
+                            "responses": {"200": {"$ref": "#/components/responses/Pets"}}},
+                    "post": {"operationId": "createPet", "tags": ["pets"], "security": [{"apiKey": []}],
+                             "responses": {"201": {"content": {"application/json": {"schema": pet}}}}}
+                },
+                "/stores": {"get": {"operationId": "listStores", "tags": ["stores"], "responses": {
+                    "200": {"content": {"application/json": {"schema": {"$ref": "#/components/schemas/Store"}}}}
+                }}}
+            },
+            "components": {
+                "schemas": {
+                    "Pet": {"oneOf": [{"$ref": "#/components/schemas/Cat"}],
+                            "discriminator": {"propertyName": "kind", "mapping": {"dog": "Dog"}}},
+                    "Cat": {"properties": {"friends": {"type": "array", "items": pet}}},
+                    "Dog": {"type": "object"},
+                    "Store": {"properties": {"id": {"type": "string"}}}
+                },
+                "parameters": {"Limit": {"name": "limit", "in": "query", "schema": {"type": "integer"}}},
+                "responses": {"Pets": {"description": "Pets", "content": {"application/json": {
+                    "schema": {"type": "array", "items": {"$ref": "#/components/schemas/Pet/oneOf/0"}}
+                }}}},
+                "securitySchemes": {"apiKey": {"type": "apiKey", "in": "header", "name": "key"},
+                                    "oauth": {"type": "oauth2", "flows": {}}}
+            }
+        }
+        slicer = SpecSlicer(spec)
+        
+        sliced = slicer.slice(["createPet"])
+        self.assertEqual(list(sliced["paths"]["/pets"]), ["parameters", "post"])
+        self.assertEqual(sliced["tags"], [{"name": "pets"}])
+        self.assertEqual(list(sliced["components"]["schemas"]), ["Pet", "Cat", "Dog"])
+        self.assertEqual(list(sliced["components"]["securitySchemes"]), ["apiKey"])
+        self.assertEqual(list(sliced["components"]["parameters"]), ["Limit"])
+        self.assertNotIn("responses", sliced["components"])
+        self.assertEqual(slicer.closures[("schemas", "Pet")],
+                         {("schemas", "Pet"), ("schemas", "Cat"), ("schemas", "Dog")})
+        
+        sliced = slicer.slice(["/stores", "list*"])
+        self.assertEqual(list(sliced["paths"]), ["/pets", "/stores"])
+        self.assertEqual(list(sliced["paths"]["/pets"]), ["parameters", "get"])
+        self.assertEqual(list(sliced["components"]["schemas"]), ["Pet", "Cat", "Dog", "Store"])
+        self.assertNotIn("securitySchemes", sliced["components"])
+        self.assertEqual(spec["components"]["schemas"].keys(), {"Pet", "Cat", "Dog", "Store"})
+        
+        with self.assertRaises(ValueError):
+            slicer.slice(["deletePet"])
+    
+    def test_stats_report(self):
+        """Test the stats report counts references and cache hits per target."""
+        self.create_test_file("schemas/types.json", {"Id": {"type": "string"}})
+        main_file = self.create_test_file("openapi.json", {
+            "openapi": "3.0.2",
+            "components": {"schemas": {
+                "A": {"type": "object", "properties": {"id": {"$ref": "./schemas/types.json#/Id"}}},
+                "B": {"type": "object", "properties": {"id": {"$ref": "./schemas/types.json#/Id"}}}
+            }}
+        })
+        stats_file = self.test_path / "combined.stats.json"
+        
+        OpenAPICombiner(self.test_dir).combine(str(main_file), stats_file=str(stats_file))
+        
+        with open(stats_file) as f:
+            report = json.load(f)
+        self.assertEqual(report["files"]["count"], 2)
+        self.assertEqual(report["resolution"]["references"], 2)
+        self.assertEqual(report["resolution"]["cache_hits"], 1)
+        self.assertEqual(report["hottest_pointers"], [{"target": "schemas/types.json#/Id", "references": 2}])
+        self.assertEqual(report["largest_subtrees"][0]["bytes"], len('{"type":"string"}'))
+        self.assertGreater(report["peak_memory_bytes"], 0)
+    
+    def test_stats_are_per_run_and_released_on_failure(self):
+        """Test a failed run stops its memory trace, and parse cache counts cover one run."""
+        import tracemalloc
+        main_file = self.create_test_file("openapi.json", {"openapi": "3.0.2", "paths": {}})
+        stats_file = self.test_path / "combined.stats.json"
+        combiner = OpenAPICombiner(self.test_dir, cache=ParseCache(self.test_path / "cache"))
+        
+        with mock.patch("sys.stdout"):
+            with self.assertRaises(ValueError):
+                combiner.combine(str(self.test_path / "missing.json"), stats_file=str(stats_file))
+            self.assertFalse(tracemalloc.is_tracing())
+            self.assertIsNone(combiner.stats)
+            
+            combiner.combine(str(main_file), stats_file=str(stats_file))
+            combiner.reset()
+            combiner.combine(str(main_file), stats_file=str(stats_file))
+        
+        with open(stats_file) as f:
+            report = json.load(f)
+        self.assertEqual(report["parse_cache"], {"hits": 1, "misses": 0, "hit_ratio": 1.0})
+    
+    def test_yaml_and_json_ref_tree(self):
+        """Test YAML files and mixed YAML/JSON references are combined natively."""
+        self.create_test_file("schemas/types.json", {"Id": {"type": "string"}})
+        schema_path = self.test_path / "schemas" / "payment.yaml"
+        schema_path.write_text(
+            "Payment:\n"
+            "  type: object\n"
+            "  properties:\n"
+            "    id:\n"
+            "      $ref: './types.json#/Id'\n"
+            "  example:\n"
+            "    createdAt: 2024-01-31\n"
+        )
+        main_file = self.test_path / "openapi.yaml"
+        main_file.write_text(
+            "openapi: 3.0.2\n"
+            "paths:\n"
+            "  /payments:\n"
+            "    get:\n"
+            "      responses:\n"
+            "        200:\n"
+            "          content:\n"
+            "            application/json:\n"
+            "              schema:\n"
+            "                $ref: './schemas/payment.yaml#/Payment'\n"
+        )
+        
+        result = OpenAPICombiner(self.test_dir).combine(str(main_file))
+        
+        # Unquoted status codes become string keys and dates stay strings, as in JSON
+        schema = result["paths"]["/payments"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        self.assertEqual(schema["properties"]["id"], {"type": "string"})
+        self.assertEqual(schema["example"], {"createdAt": "2024-01-31"})
+        json.dumps(result)
+    
+    def test_manifest_batch_combine(self):
+        """Test a manifest combines several specs and reports failures per spec."""
+        self.create_test_file("a/types.json", {"Id": {"type": "string"}})
+        self.create_test_file("a/openapi.json", {
+            "openapi": "3.0.2",
+            "components": {"schemas": {"Id": {"$ref": "./types.json#/Id"}}}
+        })
+        self.create_test_file("b/openapi.json", {"openapi": "3.1.0", "paths": {}})
+        manifest = self.test_path / "specs.toml"
+        manifest.write_text(
+            '[defaults]\nminify = true\n\n'
+            '[[spec]]\nname = "a"\ninput = "a/openapi.json"\noutput = "out/a.json"\n\n'
+            '[[spec]]\ninput = "b/openapi.json"\n\n'
+            '[[spec]]\nname = "missing"\ninput = "c/openapi.json"\n'
+        )
+        
+        with mock.patch.dict(os.environ, {"SPEC_CACHE_DIR": ""}):
+            results = combine_manifest(str(manifest))
+        
+        self.assertEqual([(r["name"], r["ok"]) for r in results],
+                         [("a", True), ("openapi", True), ("missing", False)])
+        with open(self.test_path / "out" / "a.json") as f:
+            self.assertEqual(f.read(), '{"openapi":"3.0.2","components":{"schemas":{"Id":{"type":"string"}}}}')
+        self.assertTrue((self.test_path / "openapi-combined.json").exists())
+        self.assertIn("Could not load OpenAPI file", results[2]["error"])
+    
+    def test_combiners_defer_heavy_imports(self):
+        """Test importing a combiner loads neither PyYAML, multiprocessing, thread pools nor the other combiner."""
+        heavy = {"combine_openapi": ["yaml", "multiprocessing", "concurrent.futures", "openapi_combiner"],
+                 "openapi_combiner": ["yaml", "multiprocessing", "concurrent.futures"]}
+        for module, names in heavy.items():
+            with self.subTest(module=module):
+                result = subprocess.run(
+                    [sys.executable, "-c", f"import sys, {module}; print([n for n in {names!r} if n in sys.modules])"],
+                    cwd=Path(__file__).resolve().parent, capture_output=True, text=True, check=True
+                )
+                self.assertEqual(result.stdout.strip(), "[]")
+    
+    def test_memory_budget_evicts_and_reloads(self):
+        """Test a tiny memory budget evicts caches without changing the output."""
+        self.create_test_file("schemas/types.json", {"Id": {"type": "string"}, "Amount": {"type": "integer"}})
+        self.create_test_file("schemas/paths.json", {
+            "payment": {"get": {"parameters": [{"schema": {"$ref": "./types.json#/Id"}}],
+                                "responses": {"200": {"schema": {"$ref": "./types.json#/Amount"}}}}},
+            "refund": {"get": {"parameters": [{"schema": {"$ref": "./types.json#/Id"}}]}}
+        })
+        main_file = self.create_test_file("openapi.json", {
+            "openapi": "3.0.2",
+            "paths": {
+                "/payments": {"$ref": "./schemas/paths.json#/payment"},
+                "/refunds": {"$ref": "./schemas/paths.json#/refund"}
+            }
+        })
+        
+        expected = OpenAPICombiner(self.test_dir).combine(str(main_file))
+        combiner = OpenAPICombiner(self.test_dir, memory_budget=2)
+        
+        self.assertEqual(combiner.combine(str(main_file)), expected)
+        self.assertEqual(len(combiner.loaded_files), 1)
+        self.assertEqual(len(combiner.resolved_refs), 1)
+        self.assertGreater(combiner.loaded_files.evictions, 0)
 
 class TestRealWorldScenarios(unittest.TestCase):
     """Test real-world scenarios and edge cases."""
@@ -559,6 +1462,250 @@ class TestRealWorldScenarios(unittest.TestCase):
         self.assertIn("name", user_schema["properties"])
 
 
+
+class TestLazySpec(unittest.TestCase):
+    """Test on-demand resolution through the lazy spec proxy."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.test_dir = tempfile.mkdtemp()
+        self.test_path = Path(self.test_dir)
+    
+    def tearDown(self):
+        """Clean up."""
+        import shutil
+        shutil.rmtree(self.test_dir)
+    
+    def create_test_file(self, filename: str, content: dict) -> Path:
+        """Helper to create a test JSON file."""
+        file_path = self.test_path / filename
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(file_path, 'w') as f:
+            json.dump(content, f, indent=2)
+        return file_path
+    
+    def test_loads_only_accessed_closure(self):
+        """Test accessing one operation loads only the files it references."""
+        self.create_test_file("schemas/payment.json", {
+            "CreatePayment": {"type": "object", "properties": {"amount": {"type": "integer"}}}
+        })
+        self.create_test_file("schemas/paymentPaths.json", {
+            "payments": {
+                "get": {"operationId": "listPayments"},
+                "post": {
+                    "operationId": "createPayment",
+                    "requestBody": {"schema": {"$ref": "./payment.json#/CreatePayment"}}
+                }
+            }
+        })
+        self.create_test_file("schemas/accountPaths.json", {
+            "accounts": {"get": {"operationId": "listAccounts"}}
+        })
+        main_file = self.create_test_file("openapi.json", {
+            "openapi": "3.0.2",
+            "paths": {
+                "/payments": {"$ref": "./schemas/paymentPaths.json#/payments"},
+                "/accounts": {"$ref": "./schemas/accountPaths.json#/accounts"}
+            }
+        })
+        
+        spec = LazySpec(str(main_file))
+        post = spec.root.paths['/payments'].post
+        
+        self.assertEqual(post.operationId, "createPayment")
+        self.assertEqual(spec.root.paths['/payments'].get.operationId, "listPayments")
+        self.assertEqual(post.requestBody.schema.properties.amount["type"], "integer")
+        self.assertEqual(len(spec.combiner.loaded_files), 3)
+        
+        combined = OpenAPICombiner(self.test_dir).combine(str(main_file))
+        self.assertEqual(post.resolve(), combined["paths"]["/payments"]["post"])
+        self.assertIs(spec.root.paths['/payments'], spec.root.paths['/payments'])
+    
+    def test_resolve_plans_reference_cycles(self):
+        """Test resolving a node inside a reference cycle matches the eager combine."""
+        self.create_test_file("schemas/tree.json", {
+            "Node": {"type": "object", "properties": {"edge": {"$ref": "#/Edge"}}},
+            "Edge": {"type": "object", "properties": {"node": {"$ref": "#/Node"}, "id": {"$ref": "./types.json#/Id"}}}
+        })
+        self.create_test_file("schemas/types.json", {"Id": {"type": "string"}})
+        self.create_test_file("schemas/paths.json", {
+            "edges": {"get": {"responses": {"200": {"schema": {"$ref": "./tree.json#/Edge"}}}}},
+            "nodes": {"get": {"responses": {"200": {"schema": {"$ref": "./tree.json#/Node"}}}}}
+        })
+        main_file = self.create_test_file("openapi.json", {
+            "openapi": "3.0.2",
+            "paths": {
+                "/nodes": {"$ref": "./schemas/paths.json#/nodes"},
+                "/edges": {"$ref": "./schemas/paths.json#/edges"}
+            },
+            "components": {"schemas": {"Node": {"$ref": "./schemas/tree.json#/Node"}}}
+        })
+        combined = OpenAPICombiner(self.test_dir).combine(str(main_file))
+        
+        spec = LazySpec(str(main_file))
+        # Resolve inside the cycle first, then other nodes reusing its cached targets
+        self.assertEqual(spec.root.paths['/edges'].resolve(), combined["paths"]["/edges"])
+        self.assertEqual(spec.root.paths['/nodes'].resolve(), combined["paths"]["/nodes"])
+        self.assertEqual(spec.root.components.resolve(), {"schemas": {"Node": {"$ref": "#/components/schemas/Node"}}})
+        self.assertEqual(spec.recursive_schemas(),
+                         {name: combined["components"]["schemas"][name] for name in ("Edge", "Node")})
+
+class TestParseCache(unittest.TestCase):
+    """Test the persistent parse cache used when loading spec files."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.test_dir = tempfile.mkdtemp()
+        self.test_path = Path(self.test_dir)
+        self.cache_dir = self.test_path / "cache"
+    
+    def tearDown(self):
+        """Clean up."""
+        import shutil
+        shutil.rmtree(self.test_dir)
+    
+    def test_reuses_parsed_document_across_instances(self):
+        """Test a saved cache serves unchanged files without re-parsing."""
+        spec_file = self.test_path / "spec.json"
+        spec_file.write_text(json.dumps({"openapi": "3.0.2", "paths": {}}))
+        
+        cache = ParseCache(self.cache_dir)
+        self.assertEqual(cache.load(spec_file), {"openapi": "3.0.2", "paths": {}})
+        self.assertEqual(cache.misses, 1)
+        cache.save()
+        
+        reopened = ParseCache(self.cache_dir)
+        self.assertEqual(reopened.load(spec_file), {"openapi": "3.0.2", "paths": {}})
+        self.assertEqual((reopened.hits, reopened.misses), (1, 0))
+    
+    def test_changed_content_is_reparsed(self):
+        """Test a file whose content changes is parsed again."""
+        spec_file = self.test_path / "spec.json"
+        spec_file.write_text(json.dumps({"version": 1}))
+        cache = ParseCache(self.cache_dir)
+        cache.load(spec_file)
+        
+        spec_file.write_text(json.dumps({"version": 22}))
+        
+        self.assertEqual(cache.load(spec_file), {"version": 22})
+        self.assertEqual(cache.misses, 2)
+    
+    def test_size_cap_evicts_least_recently_used(self):
+        """Test the size cap drops the oldest cached documents first."""
+        cache = ParseCache(self.cache_dir)
+        digests = []
+        for name in ("a", "b"):
+            spec_file = self.test_path / f"{name}.json"
+            spec_file.write_text(json.dumps({"name": name}))
+            cache.load(spec_file)
+            digests.append(cache.files[os.path.abspath(spec_file)]["hash"])
+        
+        cache.max_bytes = cache.objects[digests[1]]["size"]
+        cache.save()
+        
+        self.assertEqual(list(cache.objects), [digests[1]])
+        self.assertEqual(len(list(cache.objects_dir.iterdir())), 1)
+    
+    def test_cache_key_includes_parser_and_interpreter(self):
+        """Test the same bytes parsed as JSON and as YAML get separate entries, stored per interpreter."""
+        content = '{"limit": 1e3}'
+        json_file = self.test_path / "spec.json"
+        yaml_file = self.test_path / "spec.yaml"
+        json_file.write_text(content)
+        yaml_file.write_text(content)
+        
+        cache = ParseCache(self.cache_dir)
+        self.assertEqual(cache.load(json_file), {"limit": 1000.0})
+        self.assertEqual(cache.load(yaml_file), {"limit": "1e3"})
+        self.assertEqual(cache.misses, 2)
+        cache.save()
+        
+        self.assertEqual(cache.index_file.parent.parent, self.cache_dir)
+        self.assertIn(f"py{sys.version_info[0]}.{sys.version_info[1]}", cache.index_file.parent.name)
+        self.assertEqual(ParseCache(self.cache_dir).load(yaml_file), {"limit": "1e3"})
+    
+    def test_parallel_schema_reads_share_the_index(self):
+        """Test workers parse uncached files into one shared index and the parent only loads them from it."""
+        files = []
+        for index in range(bundle_schemas.PARALLEL_MIN_FILES + 16):
+            spec_file = self.test_path / f"schema{index}.json"
+            spec_file.write_text(json.dumps({"components": {"schemas": {f"S{index}": {"type": "string"}}}}))
+            files.append(spec_file)
+        expected = [{f"S{index}": {"type": "string"}} for index in range(len(files))]
+        cache = ParseCache(self.cache_dir)
+        
+        results = bundle_schemas.read_schema_paths(files, cache, jobs=2)
+        
+        self.assertEqual([schemas for schemas, error in results], expected)
+        self.assertEqual(cache.misses, 0)
+        self.assertEqual(len(ParseCache(self.cache_dir).files), len(files))
+        
+        # Cached files, or no cache at all, never start a worker pool
+        with mock.patch.object(bundle_schemas, "ProcessPoolExecutor", side_effect=AssertionError):
+            for reader in (cache, ParseCache(self.cache_dir), None):
+                results = bundle_schemas.read_schema_paths(files, reader, jobs=2)
+                self.assertEqual([schemas for schemas, error in results], expected)
+    
+    def test_bounded_cache_evicts_least_recently_used(self):
+        """Test BoundedCache keeps the most recently used entries within its budget."""
+        evicted = []
+        cache = BoundedCache(10, lambda key, value: value, on_evict=evicted.append)
+        cache["a"] = 4
+        cache["b"] = 4
+        self.assertEqual(cache["a"], 4)
+        cache["c"] = 4
+        
+        self.assertEqual(evicted, ["b"])
+        self.assertEqual(sorted(cache), ["a", "c"])
+        self.assertEqual(cache.bytes, 8)
+        self.assertIsNone(cache.get("b"))
+        
+        # The newest entry is kept even when it alone exceeds the budget
+        cache["big"] = 50
+        self.assertEqual(list(cache), ["big"])
+
+
+class TestPointerIndex(unittest.TestCase):
+    """Test the per-document JSON pointer index."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.document = {
+            "components": {
+                "schemas": {
+                    "Address": {"type": "object"},
+                    "a/b~c": {"type": "string"}
+                }
+            },
+            "tags": [{"name": "payments"}]
+        }
+    
+    def test_lookup_indexes_prefixes(self):
+        """Test a lookup records every prefix it walks through."""
+        index = PointerIndex(self.document)
+        
+        self.assertEqual(index.lookup("#/components/schemas/Address"), {"type": "object"})
+        self.assertIs(index.nodes["#/components/schemas"], self.document["components"]["schemas"])
+        self.assertIs(index.lookup("#/components/schemas/Address"),
+                      self.document["components"]["schemas"]["Address"])
+    
+    def test_escaped_tokens_and_array_indexes(self):
+        """Test RFC 6901 escapes and array indexes."""
+        index = PointerIndex(self.document)
+        
+        self.assertEqual(index.lookup("#/components/schemas/a~1b~0c"), {"type": "string"})
+        self.assertEqual(index.lookup("#/tags/0/name"), "payments")
+        self.assertIs(index.lookup("#"), self.document)
+    
+    def test_missing_pointer_raises(self):
+        """Test an unknown pointer raises PointerError, a KeyError."""
+        index = PointerIndex(self.document)
+        
+        with self.assertRaises(PointerError):
+            index.lookup("#/components/schemas/Missing")
+        with self.assertRaises(KeyError):
+            index.lookup("#/tags/5")
+
 def run_tests():
     """Run all tests and provide a summary."""
     # Create test suite
@@ -568,6 +1715,9 @@ def run_tests():
     # Add all test cases
     suite.addTests(loader.loadTestsFromTestCase(TestOpenAPICombiner))
     suite.addTests(loader.loadTestsFromTestCase(TestRealWorldScenarios))
+    suite.addTests(loader.loadTestsFromTestCase(TestLazySpec))
+    suite.addTests(loader.loadTestsFromTestCase(TestParseCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestPointerIndex))
     
     # Run tests with verbose output
     runner = unittest.TextTestRunner(verbosity=2)